@@ -1,5 +1,7 @@
 from __future__ import absolute_import
 from .port import (Leaderboard as PortLeaderboard, 
+    LeaderEntry,
+    LeaderColumns,
     teardown,
     VERSION,
     get_version)
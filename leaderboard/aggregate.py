@@ -0,0 +1,153 @@
+"""
+  A board aggregating several source boards, kept fresh write by write
+    instead of by periodic ZUNIONSTOREs.
+
+      global_lb = AggregateLeaderboard('global', ['us', 'eu', 'apac'],
+          aggregate='max')
+      global_lb.rank_member_in('eu', 'david', 120)
+      global_lb.leaders(1)
+
+  Writes go to a source through the *_in methods, and one script applies
+    the write and recomputes each touched member's aggregate score from
+    all the sources.  Max and min come out as ZUNIONSTORE's would; sums
+    are added up in source order while ZUNIONSTORE goes smallest source
+    first, so the two can differ in the last bits of a float.  The
+    aggregate is its own board name, so the plain read methods read it
+    and the *_in ones read a source.
+
+  Sources written to other than through this board leave the aggregate
+    behind; rebuild() recomputes it wholesale with ZUNIONSTORE.  Removing
+    a score range (or deleting) a source recomputes every member it held,
+    in one script call.
+"""
+from itertools import islice
+
+from .port import (Leaderboard as PortLeaderboard,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CHUNKS_PER_PIPELINE)
+from . import scripts
+
+AGGREGATES = ('sum', 'max', 'min')
+
+class AggregateLeaderboard(PortLeaderboard):
+    def __init__(self, name, sources,
+        aggregate='sum',
+        page_size=DEFAULT_PAGE_SIZE,
+        redis=None,
+        **kwargs):
+        super(AggregateLeaderboard, self).__init__(name,
+            page_size,
+            redis,
+            **kwargs)
+        if aggregate not in AGGREGATES:
+            raise ValueError("Unknown aggregate %r" % aggregate)
+        if not sources or name in sources:
+            raise ValueError("An aggregate needs sources other than itself")
+        if self._scripted_writes:
+            raise ValueError("Aggregate boards keep no indexes or cap")
+        self.sources = list(sources)
+        self.aggregate = aggregate
+
+    def _keys_for(self, name):
+        if name not in self.sources:
+            raise ValueError("%r isn't a source of %r" % (name, self.name))
+        return [self.name, name] + self.sources
+
+    def _write(self, name, mode, pairs, floor=None,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE):
+        # Returns a list of (applied, score) pairs per script call; pairs
+        #  are read chunks_per_pipeline chunks at a time.
+        keys = self._keys_for(name)
+        if floor is None:
+            floor = ''
+        pairs = iter(pairs)
+        written = []
+        while True:
+            calls = []
+            for i in range(chunks_per_pipeline):
+                chunk = list(islice(pairs, chunk_size))
+                if not chunk:
+                    break
+                args = [self.aggregate, mode, floor]
+                for member, value in chunk:
+                    args.extend([member, value])
+                calls.append((keys, args))
+            if not calls:
+                break
+            written.extend(list(zip(reply[0::2], reply[1::2]))
+                for reply in scripts.AGGREGATE_WRITE.call_many(self.redis,
+                    calls))
+            if len(calls) < chunks_per_pipeline:
+                break
+        self._invalidate(name)
+        self._invalidate(self.name)
+        return written
+
+    def rank_member_in(self, name, member, score):
+        self._write(name, 'set', [(member, score)])
+
+    def rank_member_if_higher_in(self, name, member, score):
+        [[(ranked, new_score)]] = self._write(name,
+            'set_if_higher',
+            [(member, score)])
+        return bool(ranked)
+
+    def rank_members_in(self, name, members_and_scores,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE):
+        if chunk_size < 1:
+            chunk_size = DEFAULT_CHUNK_SIZE
+        if chunks_per_pipeline < 1:
+            chunks_per_pipeline = DEFAULT_CHUNKS_PER_PIPELINE
+        return [sum(applied for applied, score in results)
+            for results in self._write(name,
+                'set',
+                members_and_scores,
+                chunk_size=chunk_size,
+                chunks_per_pipeline=chunks_per_pipeline)]
+
+    def remove_member_from(self, name, member):
+        self._write(name, 'remove', [(member, '')])
+
+    def change_score_for_member_in(self, name, member, delta, floor=None):
+        [[(applied, score)]] = self._write(name,
+            'incr',
+            [(member, delta)],
+            floor=floor)
+        score = float(score)
+        if not applied:
+            raise ValueError(
+                "Invalid change resulted in final value %s" % score)
+        return score
+
+    def change_scores_for_members_in(self, name, deltas, floor=None):
+        return [float(score)
+            for results in self._write(name, 'incr', deltas, floor=floor)
+            for applied, score in results]
+
+    def remove_members_in_score_range_in(self, name, min_score, max_score):
+        removed = scripts.AGGREGATE_REMOVE_RANGE(self.redis,
+            keys=self._keys_for(name),
+            args=[self.aggregate, min_score, max_score])
+        self._invalidate(name)
+        self._invalidate(self.name)
+        return removed
+
+    def delete_leaderboard_named(self, name):
+        if name == self.name:
+            super(AggregateLeaderboard, self).delete_leaderboard_named(name)
+        else:
+            self.remove_members_in_score_range_in(name, '-inf', '+inf')
+
+    def rebuild(self):
+        """
+        Recomputes the aggregate from the sources with one ZUNIONSTORE; the
+          repair path for sources written around this board.
+        """
+        total = self.redis.zunionstore(self.name,
+            self.sources,
+            self.aggregate)
+        self._invalidate(self.name)
+        return total
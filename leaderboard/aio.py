@@ -0,0 +1,378 @@
+"""
+  asyncio flavor of port.Leaderboard.
+
+  The same reads and writes, with the same return values, but every method
+    that hits the network is a coroutine, so independent calls can be run
+    concurrently on one event loop:
+
+      weekly, monthly = await asyncio.gather(
+          board.leaders_in('weekly', 1),
+          board.leaders_in('monthly', 1))
+
+  Built on redis.asyncio (redis-py >= 4.2, the 'aio' extra), so this module
+    needs python 3 and is not imported by the package; import leaderboard.aio
+    directly.  Note that redis.asyncio takes the modern redis-py argument
+    order (zadd mappings, zincrby(name, amount, member)).
+
+  AsyncLeaderboard is not a port.Leaderboard: it does its own I/O and keeps
+    a sync board only for argument handling and result shaping, so what
+    isn't here isn't offered.  That leaves out batch() (gather the
+    coroutines instead), indexes (and so ranking='dense'), caps, the rank
+    change feed, replicas, caches and snapshots, walks, dumps and
+    histograms.
+
+  Boards built from connection kwargs share the pool registered for
+    exactly those kwargs, in the same registry as port boards (see
+    pools.py, whose pool options apply here too); close() lets go of a
+    board's, and teardown() disconnects and forgets every asyncio pool.
+"""
+from __future__ import division
+import asyncio
+import math
+
+from itertools import islice
+
+from redis.asyncio import Redis, ConnectionPool, BlockingConnectionPool
+from redis.exceptions import ResponseError
+
+from . import pools, scripts
+from .port import (Leaderboard as PortLeaderboard,
+    LeaderEntry,
+    _LeadersPage,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CHUNKS_PER_PIPELINE)
+
+def connection_pool(blocking=False, **redis_kwargs):
+    """
+    The registered redis.asyncio pool for these connection kwargs, created
+      on first use; replies are decoded unless decode_responses=False is
+      given.  Each call takes a hold on it; see release_pool.
+    """
+    redis_kwargs.setdefault('decode_responses', True)
+    return pools.connection_pool(blocking=blocking,
+        factory=BlockingConnectionPool if blocking else ConnectionPool,
+        **redis_kwargs)
+
+async def release_pool(pool):
+    """
+    Gives back one hold on a registered pool; the last one disconnects and
+      forgets it.  Pools that aren't registered are left alone.
+    """
+    if pools._release(pool):
+        await pool.disconnect()
+
+async def teardown():
+    """
+    Disconnects and forgets every registered asyncio pool; boards still
+      holding one reconnect on next use.
+    """
+    for pool in pools._forget_pools(ConnectionPool, BlockingConnectionPool):
+        await pool.disconnect()
+
+async def run_script(redis, script, keys=(), args=()):
+    # Async counterpart of scripts.Script.__call__.
+    keys_and_args = list(keys) + list(args)
+    try:
+        return await redis.evalsha(script.sha, len(keys), *keys_and_args)
+    except ResponseError as e:
+        if not scripts._is_noscript(e):
+            raise
+    return await redis.eval(script.source, len(keys), *keys_and_args)
+
+class AsyncLeaderboard(object):
+    def __init__(self, name,
+        page_size=DEFAULT_PAGE_SIZE,
+        redis=None,
+        pool=None,
+        **redis_kwargs):
+        """
+        The connection is, in order of preference: the redis.asyncio client
+          given, a client on the given pool, or one on the pool registered
+          for redis_kwargs.
+        """
+        # The registered pool this board holds, if it took one; clients
+        #  and pools passed in belong to the caller.
+        self._registered_pool = None
+        if redis is None:
+            if pool is None:
+                pool = self._registered_pool = connection_pool(**redis_kwargs)
+            redis = Redis(connection_pool=pool)
+        self.redis = redis
+        self.name = name
+        # Never does any I/O; see the module docstring.
+        self._board = PortLeaderboard(name, page_size, redis=redis)
+
+    def _get_page_size(self):
+        return self._board.page_size
+    def _set_page_size(self, value):
+        self._board.page_size = value
+    page_size = property(_get_page_size, _set_page_size)
+
+    async def close(self):
+        """
+        Lets go of the registered pool this board took, disconnecting it if
+          no other board holds it.  A client or pool passed in is left to
+          its owner.
+        """
+        pool, self._registered_pool = self._registered_pool, None
+        if pool is not None:
+            await release_pool(pool)
+
+    async def __aenter__(self):
+        return self
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def delete_leaderboard(self):
+        await self.delete_leaderboard_named(self.name)
+    async def delete_leaderboard_named(self, name):
+        await self.redis.delete(name)
+
+    async def rank_member(self, member, score):
+        await self.rank_member_in(self.name, member, score)
+    async def rank_member_in(self, name, member, score):
+        await self.redis.zadd(name, {member: score})
+
+    async def rank_member_if_higher(self, member, score):
+        return await self.rank_member_if_higher_in(self.name, member, score)
+    async def rank_member_if_higher_in(self, name, member, score):
+        return bool(await run_script(self.redis,
+            scripts.RANK_MEMBER_IF_HIGHER,
+            keys=[name],
+            args=[member, score]))
+
+    async def rank_members(self, members_and_scores,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE):
+        return await self.rank_members_in(self.name,
+            members_and_scores,
+            chunk_size=chunk_size,
+            chunks_per_pipeline=chunks_per_pipeline)
+    async def rank_members_in(self, name, members_and_scores,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE):
+        if chunk_size < 1:
+            chunk_size = DEFAULT_CHUNK_SIZE
+        if chunks_per_pipeline < 1:
+            chunks_per_pipeline = DEFAULT_CHUNKS_PER_PIPELINE
+
+        counts = []
+        pairs = iter(members_and_scores)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            queued = 0
+            while True:
+                chunk = dict(islice(pairs, chunk_size))
+                if not chunk:
+                    break
+                pipe.zadd(name, chunk)
+                queued += 1
+                if queued == chunks_per_pipeline:
+                    counts.extend(await pipe.execute())
+                    queued = 0
+            if queued:
+                counts.extend(await pipe.execute())
+        return counts
+
+    async def remove_member(self, member):
+        await self.remove_member_from(self.name, member)
+    async def remove_member_from(self, name, member):
+        await self.redis.zrem(name, member)
+
+    async def total_members(self):
+        return await self.total_members_in(self.name)
+    async def total_members_in(self, name):
+        return await self.redis.zcard(name)
+
+    async def total_pages(self):
+        return await self.total_pages_in(self.name)
+    async def total_pages_in(self, name, page_size=None):
+        if page_size is None:
+            page_size = self.page_size
+        return int(math.ceil(
+            await self.total_members_in(name) /
+            page_size
+        ))
+
+    async def total_members_in_score_range(self, min_score, max_score):
+        return await self.total_members_in_score_range_in(self.name,
+            min_score,
+            max_score)
+    async def total_members_in_score_range_in(self, name, min_score,
+        max_score):
+        return await self.redis.zcount(name, min_score, max_score)
+
+    async def percentile_for(self, member):
+        return await self.percentile_for_in(self.name, member)
+    async def percentile_for_in(self, name, member):
+        counts = await run_script(self.redis,
+            scripts.PERCENTILE_FOR,
+            keys=[name],
+            args=[member])
+        if counts is None:
+            return None
+        total, below = counts
+        return 100 * below / total
+
+    async def score_at_percentile(self, percentile):
+        return await self.score_at_percentile_in(self.name, percentile)
+    async def score_at_percentile_in(self, name, percentile):
+        if not 0 <= percentile <= 100:
+            raise ValueError("percentile must be between 0 and 100")
+        score = await run_script(self.redis,
+            scripts.SCORE_AT_PERCENTILE,
+            keys=[name],
+            args=[percentile])
+        if score is None:
+            return None
+        return float(score)
+
+    async def change_score_for(self, member, delta, floor=None):
+        return await self.change_score_for_member_in(self.name,
+            member,
+            delta,
+            floor=floor)
+    async def change_score_for_member_in(self, name, member, delta,
+        floor=None):
+        if floor is None:
+            return await self.redis.zincrby(name, delta, member)
+
+        applied, score = await run_script(self.redis,
+            scripts.CHANGE_SCORE_WITH_FLOOR,
+            keys=[name],
+            args=[member, delta, floor])
+        score = float(score)
+        if not applied:
+            raise ValueError(
+                "Invalid change resulted in final value %s" % score)
+        return score
+
+    async def change_scores_for(self, deltas, floor=None):
+        return await self.change_scores_for_members_in(self.name,
+            deltas,
+            floor=floor)
+    async def change_scores_for_members_in(self, name, deltas, floor=None):
+        # As port's: with floor, refused changes come back as the score
+        #  that was refused, and nothing raises.
+        if floor is not None:
+            return [float(score)
+                for applied, score in await asyncio.gather(*[
+                    run_script(self.redis,
+                        scripts.CHANGE_SCORE_WITH_FLOOR,
+                        keys=[name],
+                        args=[member, delta, floor])
+                    for member, delta in deltas])]
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for member, delta in deltas:
+                pipe.zincrby(name, delta, member)
+            return await pipe.execute()
+
+    async def score_and_rank_across(self, names, member,
+        use_zero_index_for_rank=False):
+        return list(await asyncio.gather(*[self.score_and_rank_for_in(name,
+                member,
+                use_zero_index_for_rank=use_zero_index_for_rank)
+            for name in names]))
+
+    async def rank_for(self, member, use_zero_index_for_rank=False,
+        ranking='ordinal'):
+        return await self.rank_for_in(self.name,
+            member,
+            use_zero_index_for_rank=use_zero_index_for_rank,
+            ranking=ranking)
+    async def rank_for_in(self, name, member, use_zero_index_for_rank=False,
+        ranking='ordinal'):
+        board = self._board
+        if board._conform_ranking(ranking=ranking) == 'ordinal':
+            rank = await self.redis.zrevrank(name, member)
+        else:
+            rank, score = await run_script(self.redis,
+                scripts.RANKED_WITH_TIES,
+                keys=[name, board._higher_key(name, ranking)],
+                args=[member])
+        return board._conform_rank(rank, use_zero_index_for_rank)
+
+    async def score_for(self, member):
+        return await self.score_for_in(self.name, member)
+    async def score_for_in(self, name, member):
+        return await self.redis.zscore(name, member)
+
+    async def check_member(self, member):
+        return await self.check_member_in(self.name, member)
+    async def check_member_in(self, name, member):
+        return await self.redis.zscore(name, member) is not None
+
+    async def score_and_rank_for(self, member, use_zero_index_for_rank=False):
+        return await self.score_and_rank_for_in(self.name,
+            member,
+            use_zero_index_for_rank=use_zero_index_for_rank)
+    async def score_and_rank_for_in(self, name, member,
+        use_zero_index_for_rank=False):
+        score, rank = await run_script(self.redis,
+            scripts.SCORE_AND_RANK,
+            keys=[name],
+            args=[member])
+        if score is not None:
+            score = float(score)
+        return LeaderEntry(member,
+            rank=self._board._conform_rank(rank, use_zero_index_for_rank),
+            score=score)
+
+    async def remove_members_in_score_range(self, min_score, max_score):
+        return await self.remove_members_in_score_range_in(self.name,
+            min_score,
+            max_score)
+    async def remove_members_in_score_range_in(self, name, min_score,
+        max_score):
+        return await self.redis.zremrangebyscore(name, min_score, max_score)
+
+    async def leaders(self, current_page, **kwargs):
+        return await self.leaders_in(self.name, current_page, **kwargs)
+    async def leaders_in(self, name, current_page=None, **kwargs):
+        if current_page is None or current_page < 1:
+            current_page = 1
+
+        page = _LeadersPage(self._board, name, current_page, **kwargs)
+        async with self.redis.pipeline() as pipe:
+            pipe.zcard(name)
+            pipe.zrevrange(*page.range_args())
+            total_members, raw_leader_data = await pipe.execute()
+
+        if page.past_end(total_members, raw_leader_data):
+            raw_leader_data = await self.redis.zrevrange(*page.range_args())
+
+        higher_args = page.higher_args(raw_leader_data)
+        higher = None
+        if higher_args is not None:
+            higher = await self.redis.zcount(*higher_args)
+        return page.results(raw_leader_data, higher)
+
+    async def around_me(self, member, **kwargs):
+        return await self.around_me_in(self.name, member, **kwargs)
+    async def around_me_in(self, name, member, **kwargs):
+        keys, args = self._board._around_me_call(name, member, **kwargs)
+        reply = await run_script(self.redis, scripts.AROUND_ME, keys, args)
+        return self._board._around_me_results(reply, **kwargs)
+
+    async def ranked_in_list(self, members, **kwargs):
+        return await self.ranked_in_list_in(self.name, members, **kwargs)
+    async def ranked_in_list_in(self, name, members, **kwargs):
+        members = list(members)
+        script, calls = self._board._ranked_in_list_calls(name, members,
+            **kwargs)
+        replies = await asyncio.gather(*[run_script(self.redis,
+                script,
+                keys=keys,
+                args=args)
+            for keys, args in calls])
+        return self._board._ranked_in_list_results(members, replies, **kwargs)
+
+    async def merge_leaderboards(self, destination, keys, aggregate="sum"):
+        return await self.redis.zunionstore(destination,
+            keys + [self.name], aggregate)
+
+    async def intersect_leaderboards(self, destination, keys,
+        aggregate="sum"):
+        return await self.redis.zinterstore(destination,
+            keys + [self.name], aggregate)
@@ -0,0 +1,198 @@
+"""
+  Benchmarks for the common leaderboard operations.
+
+      python -m leaderboard.bench
+      python -m leaderboard.bench --backend memory --sizes 1000,1000000
+      python -m leaderboard.bench --json after.json --baseline before.json
+
+  Each board size gets a fresh board (keys are prefixed bench:, and deleted
+    afterwards, nothing else in the db is touched), which is filled with
+    rank_members and then timed on single and bulk inserts, incr, leaders at
+    the head/middle/tail pages, around_me, ranked_in_list and a merge.
+  Latencies are per call; ops/s counts members written or looked up, so a
+    bulk insert of 1000 members is 1000 ops.
+
+  --json writes the results (with the leaderboard version) for keeping
+    alongside a release; --baseline compares p50s against such a file and
+    exits non-zero on a regression past --threshold.
+"""
+from __future__ import division, print_function
+import optparse
+import random
+import sys
+import time
+
+from anyjson import loads, dumps
+
+from . import get_version
+from .memory import MemoryRedis
+from .port import Leaderboard
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_SAMPLES = 200
+DEFAULT_THRESHOLD = 0.2
+RANKED_IN_LIST_SIZES = (10, 100, 1000)
+BULK_SIZE = 1000
+
+def percentile(samples, p):
+    # Nearest-rank percentile of an already sorted list.
+    if not samples:
+        return None
+    index = int(round(p / 100 * (len(samples) - 1)))
+    return samples[index]
+
+def summarize(backend, size, operation, samples, ops_per_call=1):
+    samples = sorted(samples)
+    total = sum(samples)
+    return {
+        'backend': backend,
+        'size': size,
+        'operation': operation,
+        'calls': len(samples),
+        'p50': percentile(samples, 50),
+        'p99': percentile(samples, 99),
+        'mean': total / len(samples),
+        'ops_per_sec': len(samples) * ops_per_call / total if total else None
+    }
+
+def timed(fn, samples):
+    timings = []
+    for i in range(samples):
+        start = time.time()
+        fn(i)
+        timings.append(time.time() - start)
+    return timings
+
+def make_board(backend, name):
+    if backend == 'memory':
+        return Leaderboard(name, redis=MemoryRedis())
+    return Leaderboard(name)
+
+def fill(board, size):
+    board.rank_members(("member_%d" % i, i) for i in range(size))
+
+def bench_size(backend, size, samples=DEFAULT_SAMPLES, rand=random):
+    """
+    Results for one board of `size` members on `backend`.
+    """
+    board = make_board(backend, "bench:%d" % size)
+    other = "bench:%d:other" % size
+    merged = "bench:%d:merged" % size
+    results = []
+    def record(operation, timings, ops_per_call=1):
+        results.append(summarize(backend, size, operation, timings,
+            ops_per_call))
+
+    try:
+        start = time.time()
+        fill(board, size)
+        record('fill', [time.time() - start], size)
+
+        record('rank_member', timed(lambda i: board.rank_member(
+            "new_%d" % i, rand.random() * size), samples))
+        record('rank_members', timed(lambda i: board.rank_members(
+            ("bulk_%d_%d" % (i, j), rand.random() * size)
+                for j in range(BULK_SIZE)), max(samples // 20, 1)),
+            BULK_SIZE)
+        record('change_score_for', timed(lambda i: board.change_score_for(
+            "member_%d" % rand.randrange(size), 1), samples))
+
+        total_pages = board.total_pages()
+        for label, page in (('head', 1),
+            ('middle', max(total_pages // 2, 1)),
+            ('tail', total_pages)):
+            record('leaders:%s' % label,
+                timed(lambda i: board.leaders(page), samples),
+                board.page_size)
+
+        record('around_me', timed(lambda i: board.around_me(
+            "member_%d" % rand.randrange(size)), samples), board.page_size)
+
+        for count in RANKED_IN_LIST_SIZES:
+            members = ["member_%d" % rand.randrange(size)
+                for i in range(count)]
+            record('ranked_in_list:%d' % count, timed(
+                lambda i: board.ranked_in_list(members), samples), count)
+
+        board.rank_members_in(other,
+            [("member_%d" % i, i) for i in range(0, size, 2)])
+        record('merge_leaderboards', timed(
+            lambda i: board.merge_leaderboards(merged, [other]),
+            max(samples // 20, 1)), size)
+    finally:
+        for name in (board.name, other, merged):
+            board.delete_leaderboard_named(name)
+    return results
+
+def run(backends, sizes, samples=DEFAULT_SAMPLES):
+    results = []
+    for size in sizes:
+        for backend in backends:
+            results.extend(bench_size(backend, size, samples))
+    return results
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD):
+    """
+    (result, baseline p50) for each result whose p50 is more than
+      `threshold` slower than the matching baseline result.
+    """
+    before = dict(((r['backend'], r['size'], r['operation']), r['p50'])
+        for r in baseline)
+    regressions = []
+    for result in results:
+        old = before.get(
+            (result['backend'], result['size'], result['operation']))
+        if old and result['p50'] > old * (1 + threshold):
+            regressions.append((result, old))
+    return regressions
+
+def report(results, out=sys.stdout):
+    print("%-8s %9s %-22s %10s %10s %12s" % ('backend', 'size',
+        'operation', 'p50 ms', 'p99 ms', 'ops/s'), file=out)
+    for r in results:
+        print("%-8s %9d %-22s %10.3f %10.3f %12.0f" % (r['backend'],
+            r['size'], r['operation'], r['p50'] * 1000, r['p99'] * 1000,
+            r['ops_per_sec'] or 0), file=out)
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage="python -m leaderboard.bench")
+    parser.add_option('--backend', action='append', dest='backends',
+        choices=('redis', 'memory'),
+        help="redis or memory; repeat to compare (default: both)")
+    parser.add_option('--sizes',
+        default=','.join(str(size) for size in DEFAULT_SIZES),
+        help="comma separated board sizes (default: %default)")
+    parser.add_option('--samples', type='int', default=DEFAULT_SAMPLES,
+        help="calls timed per operation (default: %default)")
+    parser.add_option('--json', help="write results to this file")
+    parser.add_option('--baseline', help="results file to compare against")
+    parser.add_option('--threshold', type='float', default=DEFAULT_THRESHOLD,
+        help="p50 slowdown counted as a regression (default: %default)")
+    options, args = parser.parse_args(argv)
+
+    backends = options.backends or ['redis', 'memory']
+    sizes = [int(size) for size in options.sizes.split(',')]
+    results = run(backends, sizes, options.samples)
+    report(results)
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            f.write(dumps({
+                'version': get_version(),
+                'results': results
+            }))
+
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = loads(f.read())['results']
+        regressions = compare(baseline, results, options.threshold)
+        for result, old in regressions:
+            print("REGRESSION %s %d %s: p50 %.3fms -> %.3fms" % (
+                result['backend'], result['size'], result['operation'],
+                old * 1000, result['p50'] * 1000))
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
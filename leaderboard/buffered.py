@@ -0,0 +1,156 @@
+"""
+  Write-coalescing wrapper for the idiom Leaderboard.
+
+  incr/decr calls are summed per member in process and written out as a 
+    single pipelined batch of ZINCRBYs, trading bounded staleness for far 
+    fewer redis commands on hot members.  A flush happens when:
+      * max_pending distinct members have buffered deltas,
+      * every flush_interval seconds (if given), from a daemon thread, or
+      * flush() / close() is called explicitly.
+  A flush goes out as one MULTI/EXEC, so it is applied whole or not at 
+    all; one that fails puts its deltas back for the next one.
+"""
+import logging
+import threading
+
+DEFAULT_MAX_PENDING = 1000
+
+log = logging.getLogger(__name__)
+
+class BufferedLeaderboard(object):
+    def __init__(self, leaderboard, 
+        max_pending=DEFAULT_MAX_PENDING, 
+        flush_interval=None, 
+        include_pending=False):
+        self.leaderboard = leaderboard
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.include_pending = include_pending
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically)
+            self._flusher.daemon = True
+            self._flusher.start()
+
+    def __getattr__(self, attr):
+        # Anything not buffered goes straight to the wrapped leaderboard.
+        return getattr(self.leaderboard, attr)
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def incr(self, member, delta=1):
+        member = self.leaderboard._conform_key(member)
+        with self._lock:
+            self._pending[member] = self._pending.get(member, 0) + delta
+            full = len(self._pending) >= self.max_pending
+        if full:
+            # Only this member's refusal is the caller's to hear about.
+            results, refused = self._flush()
+            if member in refused:
+                raise ValueError(
+                    "Invalid decrement resulted in negative value for %s" % 
+                    member)
+            _log_refused(refused)
+    def decr(self, member, delta=1):
+        self.incr(member, -1*delta)
+
+    def pending_delta(self, member):
+        with self._lock:
+            return self._pending.get(
+                self.leaderboard._conform_key(member), 0)
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        deltas = [(member, delta) 
+            for member, delta in pending.items() if delta]
+        if not deltas:
+            return {}, []
+
+        # Same floor as the idiom decr, checked server-side per member.
+        port = self.leaderboard.port
+        try:
+            scores = port._change_scores(port.name, 
+                deltas, 
+                floor=0, 
+                transaction=True)
+        except Exception:
+            self._restore(deltas)
+            raise
+
+        results = {}
+        refused = []
+        for (member, delta), score in zip(deltas, scores):
+            if score < 0:
+                # Refused; the member kept its score from before.
+                refused.append(member)
+                score -= delta
+            results[member] = score
+        return results, refused
+
+    def _restore(self, deltas):
+        with self._lock:
+            for member, delta in deltas:
+                self._pending[member] = self._pending.get(member, 0) + delta
+
+    def flush(self):
+        """
+        Write out all buffered deltas.  Returns a dict of member -> new score.
+        Raises ValueError (after flushing everything else) if any member's 
+          buffered decrements would have left it below zero.
+        """
+        results, refused = self._flush()
+        if refused:
+            raise ValueError(
+                "Invalid decrement resulted in negative value for %s" % 
+                ", ".join(refused))
+        return results
+
+    def _flush_periodically(self):
+        while True:
+            self._stopped.wait(self.flush_interval)
+            if self._stopped.is_set():
+                break
+            # There is no caller to raise to from here.
+            try:
+                results, refused = self._flush()
+            except Exception:
+                log.exception("Buffered flush failed; retrying in %ss", 
+                    self.flush_interval)
+                continue
+            _log_refused(refused)
+
+    def close(self):
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        return self.flush()
+
+    def get_rank_and_score(self, member):
+        rank, score = self.leaderboard.get_rank_and_score(member)
+        if self.include_pending:
+            # Rank still reflects the last flush; only the score is adjusted.
+            score = (score or 0) + self.pending_delta(member)
+        return rank, score
+    def leaders(self, page=1):
+        leaders = self.leaderboard.leaders(page)
+        if self.include_pending:
+            with self._lock:
+                for leader in leaders:
+                    if 'score' in leader:
+                        leader['score'] += self._pending.get(
+                            leader['member'], 0)
+        return leaders
+
+def _log_refused(refused):
+    if refused:
+        log.warning("Refused decrements resulting in negative values for %s",
+            ", ".join(refused))
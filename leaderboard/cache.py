@@ -0,0 +1,117 @@
+"""
+  In-process read-through cache for leaderboard pages.
+
+  Pass one to a Leaderboard to cache leaders() pages:
+
+    highscore_lb = Leaderboard('highscores', cache=PageCache(ttl=2))
+
+  Entries are keyed by a tuple whose first item is the board name, so writes
+    made through the same Leaderboard can invalidate one board's pages.
+  With stale_while_revalidate, an expired page is still served while a
+    single background thread reloads it, so a hot page never stampedes redis.
+"""
+import threading
+import time
+
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 1.0
+
+class PageCache(object):
+    def __init__(self,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        ttl=DEFAULT_TTL,
+        stale_while_revalidate=False,
+        clock=time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Bumped on invalidate, so loads that straddle a write are dropped.
+        self._generations = {}
+        self._refreshing = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale_hits': self.stale_hits,
+            'evictions': self.evictions,
+            'entries': len(self._entries)
+        }
+
+    def get(self, key, loader):
+        """
+        Cached value for key, calling loader() to fill or refresh it.
+        """
+        refresh = False
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            generation = self._generations.get(key[0], 0)
+            if entry is not None:
+                value, expires = entry
+                self._entries[key] = entry
+                if self.clock() < expires:
+                    self.hits += 1
+                    return value
+                if self.stale_while_revalidate:
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        refresh = True
+                else:
+                    del self._entries[key]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+
+        if entry is None:
+            value = loader()
+            self._store(key, value, generation)
+            return value
+
+        if refresh:
+            refresher = threading.Thread(target=self._refresh,
+                args=(key, loader, generation))
+            refresher.daemon = True
+            refresher.start()
+        return value
+
+    def _store(self, key, value, generation):
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = (value, self.clock() + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _refresh(self, key, loader, generation):
+        try:
+            self._store(key, loader(), generation)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, name):
+        with self._lock:
+            self._generations[name] = self._generations.get(name, 0) + 1
+            for key in [key for key in self._entries if key[0] == name]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            for name in set(key[0] for key in self._entries):
+                self._generations[name] = self._generations.get(name, 0) + 1
+            self._entries.clear()
@@ -0,0 +1,135 @@
+"""
+  Binary dump format for whole boards, written by Leaderboard.dump() and
+    read back by Leaderboard.load().
+
+  Little-endian throughout:
+    magic     b'LBD1'
+    records   uint32 member length, member bytes, float64 score; best first
+    trailer   uint32 0xffffffff, uint64 number of records
+
+  The trailer lets readers tell a complete dump from a truncated one.
+    read() streams a file object in batches; records() walks any buffer
+    (bytes, or an mmap of a dump file) in place, handing back members as
+    memoryview slices of it rather than copies:
+
+      with open('weekly.lbd', 'rb') as f:
+          buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+          for member, score in dumpfile.records(buf):
+              ...
+"""
+import struct
+
+MAGIC = b'LBD1'
+END = 0xffffffff
+
+DEFAULT_BATCH_SIZE = 1000
+# Records buffered between writes to the file.
+DEFAULT_FLUSH_EVERY = 10000
+
+_LENGTH = struct.Struct('<I')
+_SCORE = struct.Struct('<d')
+_COUNT = struct.Struct('<Q')
+
+def _encode(member):
+    if isinstance(member, bytes):
+        return member
+    return member.encode('utf-8')
+
+def write(fileobj, rows, flush_every=DEFAULT_FLUSH_EVERY):
+    """
+    Writes (member, score) rows to fileobj as a dump; returns how many.
+    """
+    fileobj.write(MAGIC)
+    count = 0
+    out = []
+    for member, score in rows:
+        member = _encode(member)
+        out.extend([_LENGTH.pack(len(member)), member, _SCORE.pack(score)])
+        count += 1
+        if count % flush_every == 0:
+            fileobj.write(b''.join(out))
+            del out[:]
+    out.extend([_LENGTH.pack(END), _COUNT.pack(count)])
+    fileobj.write(b''.join(out))
+    return count
+
+def _read_exactly(fileobj, size):
+    data = fileobj.read(size)
+    if len(data) != size:
+        raise ValueError("truncated dump")
+    return data
+
+def _check_magic(magic):
+    if magic != MAGIC:
+        raise ValueError("not a leaderboard dump")
+
+def read(fileobj, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yields lists of up to batch_size (member bytes, score) rows from a dump
+      being read off fileobj.  Raises ValueError on a malformed or
+      truncated dump, before yielding its last batch.
+    """
+    _check_magic(_read_exactly(fileobj, len(MAGIC)))
+    count = 0
+    batch = []
+    while True:
+        length, = _LENGTH.unpack(_read_exactly(fileobj, _LENGTH.size))
+        if length == END:
+            break
+        member = _read_exactly(fileobj, length)
+        score, = _SCORE.unpack(_read_exactly(fileobj, _SCORE.size))
+        batch.append((member, score))
+        count += 1
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    expected, = _COUNT.unpack(_read_exactly(fileobj, _COUNT.size))
+    if expected != count:
+        raise ValueError("dump holds %d records, trailer says %d" % (count,
+            expected))
+    if batch:
+        yield batch
+
+def _bytes(member):
+    if isinstance(member, memoryview):
+        return member.tobytes()
+    return member
+
+def records(buffer):
+    """
+    Yields (member, score) rows from a dump held in buffer, members as
+      memoryview slices of it (or plain slices, copies, of a python 2 mmap,
+      which memoryview doesn't take).  Raises ValueError on a malformed or
+      truncated dump, once it gets there.
+    """
+    try:
+        view = memoryview(buffer)
+    except TypeError:
+        view = buffer
+    size = len(view)
+    def field(offset, length):
+        if offset + length > size:
+            raise ValueError("truncated dump")
+        return view[offset:offset + length]
+
+    _check_magic(_bytes(field(0, len(MAGIC))))
+    offset = len(MAGIC)
+    count = 0
+    while True:
+        field(offset, _LENGTH.size)
+        length, = _LENGTH.unpack_from(buffer, offset)
+        offset += _LENGTH.size
+        if length == END:
+            break
+        member = field(offset, length)
+        offset += length
+        field(offset, _SCORE.size)
+        score, = _SCORE.unpack_from(buffer, offset)
+        offset += _SCORE.size
+        count += 1
+        yield member, score
+    field(offset, _COUNT.size)
+    expected, = _COUNT.unpack_from(buffer, offset)
+    if expected != count:
+        raise ValueError("dump holds %d records, trailer says %d" % (count,
+            expected))
@@ -0,0 +1,96 @@
+"""
+  Rank change feed: a redis stream (<board>:events) of the rank moves made
+    by writes through a board built with feed_length.
+
+      board = Leaderboard('highscores', feed_length=100000)
+      for change in board.rank_changes():
+          # change.member went from change.old_rank to change.new_rank;
+          #  everyone ranked in between moved one place the other way.
+          ...
+
+  The write script appends an entry whenever a write (or a trim) changes
+    the member's rank, with the old and new ranks read in the same script,
+    so consecutive events always agree.  Entries are capped at about
+    feed_length (MAXLEN ~), so consumers that fall that far behind miss
+    events.  Range removals and writes around the board aren't in the feed.
+"""
+
+class RankChange(object):
+    """
+    One feed entry.  Ranks are None where the member wasn't (or is no
+      longer) ranked, and score None once it has left the board.
+    """
+    __slots__ = ('id', 'member', 'old_rank', 'new_rank', 'score')
+
+    def __init__(self, id, member, old_rank, new_rank, score):
+        self.id = id
+        self.member = member
+        self.old_rank = old_rank
+        self.new_rank = new_rank
+        self.score = score
+
+    def __eq__(self, other):
+        if not isinstance(other, RankChange):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field)
+            for field in self.__slots__)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __repr__(self):
+        return "RankChange(%s)" % ", ".join("%s=%r" % (field,
+            getattr(self, field)) for field in self.__slots__)
+
+def _text(value):
+    if isinstance(value, bytes) and not isinstance(value, str):
+        return value.decode('utf-8')
+    return value
+
+def parse(entry_id, entry, use_zero_index_for_rank=False):
+    """
+    RankChange for a raw XREAD entry (id, [field, value, ...]), or one 
+      redis-py (3.0 on) has already parsed to (id, {field: value}).
+    """
+    if isinstance(entry, dict):
+        pairs = entry.items()
+    else:
+        pairs = zip(entry[0::2], entry[1::2])
+    fields = dict((_text(field), value) for field, value in pairs)
+    def rank(value):
+        if _text(value) == '':
+            return None
+        if use_zero_index_for_rank:
+            return int(value)
+        return int(value) + 1
+    score = fields['s']
+    return RankChange(_text(entry_id),
+        fields['m'],
+        rank(fields['o']),
+        rank(fields['n']),
+        None if _text(score) == '' else float(score))
+
+def latest_id(redis, key):
+    # What '$' means right now, pinned so nothing added between two
+    #  blocking reads is missed.
+    newest = redis.execute_command('XREVRANGE', key, '+', '-', 'COUNT', 1)
+    if not newest:
+        return '0-0'
+    return _text(newest[0][0])
+
+def read(redis, key, last_id, count, block=None):
+    """
+    The entries after last_id, up to count of them, as (id, entry) pairs;
+      waits up to block seconds for some if there are none yet.  Empty on
+      a timeout.
+    """
+    args = ['XREAD', 'COUNT', count]
+    if block is not None:
+        args.extend(['BLOCK', int(block * 1000)])
+    reply = redis.execute_command(*(args + ['STREAMS', key, last_id]))
+    if not reply:
+        return []
+    return [(entry_id, entry) for entry_id, entry in reply[0][1]]
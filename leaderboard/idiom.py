@@ -1,4 +1,6 @@
-from .port import Leaderboard as PortLeaderboard, DEFAULT_PAGE_SIZE
+from .port import (Leaderboard as PortLeaderboard, 
+    DEFAULT_PAGE_SIZE, 
+    DEFAULT_CHUNK_SIZE)
 
 class Leaderboard(object):
     def __init__(self, name, 
@@ -21,6 +23,13 @@ class Leaderboard(object):
             self._conform_key(member), 
             score
         )
+    def set_member_scores(self, members_and_scores, 
+        chunk_size=DEFAULT_CHUNK_SIZE):
+        return self.port.rank_members(
+            ((self._conform_key(member), score) 
+                for member, score in members_and_scores),
+            chunk_size=chunk_size
+        )
     def remove_member(self, member):
         return self.port.remove_member(
             self._conform_key(member)
@@ -35,21 +44,12 @@ class Leaderboard(object):
             delta
         )
     def decr(self, member, delta=1):
-        member = self._conform_key(member)
-        result = self.incr(
-            member,
-            -1*delta
-        )
-        if result >= 0:
-            return result
-
-        # well that's weird.
-        # increment it back and raise a ValueError
-        self.incr(
-            member,
-            delta
+        # Refused server-side if it would go negative; raises ValueError.
+        return self.port.change_score_for(
+            self._conform_key(member), 
+            -1*delta,
+            floor=0
         )
-        raise ValueError("Invalid decrement resulted in final value %d" % result)
 
     def get_rank_and_score(self, member):
         result = self.port.score_and_rank_for(
@@ -0,0 +1,996 @@
+"""
+  In-process stand-in for the redis client, for embedded (single process)
+    use and for running the tests and benchmarks without a server.
+
+  MemoryRedis implements the subset of the redis-py client surface that
+    Leaderboard uses, so it can be passed anywhere a connection is taken:
+
+      Leaderboard('highscores', redis=MemoryRedis())
+
+  Sorted sets are kept in an indexable skiplist (the same structure redis
+    uses), so rank, range and count are O(log n) rather than a sort per call.
+  Scripts in leaderboard.scripts are run by python equivalents registered
+    here under the script's SHA; every script needs one.  Nothing here
+    runs the Lua itself, which is why CI also runs the suite against a
+    real redis-server.
+"""
+from __future__ import division
+import math
+import random
+import threading
+import time
+
+from functools import wraps
+
+from redis.exceptions import ResponseError
+
+from . import scripts
+
+SKIPLIST_MAX_LEVEL = 32
+SKIPLIST_P = 0.25
+
+class _Node(object):
+    __slots__ = ('key', 'next', 'span')
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        # span[i]: how many positions next[i] is ahead of this node.
+        self.span = [0] * level
+
+class IndexableSkiplist(object):
+    """
+    Ordered collection of unique keys with O(log n) insert, remove,
+      rank and index lookups.
+    """
+    def __init__(self):
+        self.head = _Node(None, SKIPLIST_MAX_LEVEL)
+        self.level = 1
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _random_level(self):
+        level = 1
+        while level < SKIPLIST_MAX_LEVEL and random.random() < SKIPLIST_P:
+            level += 1
+        return level
+
+    def insert(self, key):
+        update = [None] * SKIPLIST_MAX_LEVEL
+        rank = [0] * SKIPLIST_MAX_LEVEL
+        x = self.head
+        for i in reversed(range(self.level)):
+            if i != self.level - 1:
+                rank[i] = rank[i + 1]
+            while x.next[i] is not None and x.next[i].key < key:
+                rank[i] += x.span[i]
+                x = x.next[i]
+            update[i] = x
+
+        level = self._random_level()
+        if level > self.level:
+            for i in range(self.level, level):
+                rank[i] = 0
+                update[i] = self.head
+                self.head.span[i] = self.size
+            self.level = level
+
+        node = _Node(key, level)
+        for i in range(level):
+            node.next[i] = update[i].next[i]
+            update[i].next[i] = node
+            node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = (rank[0] - rank[i]) + 1
+        for i in range(level, self.level):
+            update[i].span[i] += 1
+        self.size += 1
+
+    def remove(self, key):
+        update = [None] * SKIPLIST_MAX_LEVEL
+        x = self.head
+        for i in reversed(range(self.level)):
+            while x.next[i] is not None and x.next[i].key < key:
+                x = x.next[i]
+            update[i] = x
+
+        x = x.next[0]
+        if x is None or x.key != key:
+            raise KeyError(key)
+        for i in range(self.level):
+            if update[i].next[i] is x:
+                update[i].span[i] += x.span[i] - 1
+                update[i].next[i] = x.next[i]
+            else:
+                update[i].span[i] -= 1
+        while self.level > 1 and self.head.next[self.level - 1] is None:
+            self.level -= 1
+        self.size -= 1
+
+    def rank(self, key):
+        """Zero-based position of key."""
+        traversed = 0
+        x = self.head
+        for i in reversed(range(self.level)):
+            while x.next[i] is not None and x.next[i].key <= key:
+                traversed += x.span[i]
+                x = x.next[i]
+            if x is not self.head and x.key == key:
+                return traversed - 1
+        raise KeyError(key)
+
+    def count_while(self, predicate):
+        """
+        Number of leading keys for which predicate holds; predicate must be
+          true for a prefix of the ordering and false after it.
+        """
+        traversed = 0
+        x = self.head
+        for i in reversed(range(self.level)):
+            while x.next[i] is not None and predicate(x.next[i].key):
+                traversed += x.span[i]
+                x = x.next[i]
+        return traversed
+
+    def _node_at(self, index):
+        traversed = 0
+        target = index + 1
+        x = self.head
+        for i in reversed(range(self.level)):
+            while x.next[i] is not None and traversed + x.span[i] <= target:
+                traversed += x.span[i]
+                x = x.next[i]
+            if traversed == target:
+                return x
+        raise IndexError(index)
+
+    def slice(self, start, stop):
+        """Keys at positions [start, stop), in order."""
+        start = max(start, 0)
+        stop = min(stop, self.size)
+        if start >= stop:
+            return []
+        keys = []
+        x = self._node_at(start)
+        for i in range(stop - start):
+            keys.append(x.key)
+            x = x.next[0]
+        return keys
+
+def _parse_bound(value):
+    # Score bounds as redis takes them: numbers, '-inf'/'+inf', '(5'.
+    if isinstance(value, (int, float)):
+        return float(value), False
+    value = str(value)
+    exclusive = value.startswith('(')
+    if exclusive:
+        value = value[1:]
+    return float(value), exclusive
+
+class SortedSet(object):
+    """
+    Members ordered by (score, member) ascending, as redis orders a ZSET;
+      the reverse (ZREV*) views index from the other end.
+    """
+    def __init__(self):
+        self.scores = {}
+        self.index = IndexableSkiplist()
+
+    def __len__(self):
+        return len(self.scores)
+
+    def add(self, member, score):
+        score = float(score)
+        old = self.scores.get(member)
+        if old is not None:
+            if old == score:
+                return False
+            self.index.remove((old, member))
+        self.index.insert((score, member))
+        self.scores[member] = score
+        return old is None
+
+    def remove(self, member):
+        score = self.scores.pop(member, None)
+        if score is None:
+            return False
+        self.index.remove((score, member))
+        return True
+
+    def revrank(self, member):
+        score = self.scores.get(member)
+        if score is None:
+            return None
+        return len(self) - 1 - self.index.rank((score, member))
+
+    def _conform_range(self, start, end):
+        size = len(self)
+        if start < 0:
+            start += size
+        if end < 0:
+            end += size
+        return max(start, 0), min(end, size - 1)
+
+    def range(self, start, end):
+        start, end = self._conform_range(start, end)
+        return self.index.slice(start, end + 1)
+
+    def revrange(self, start, end):
+        start, end = self._conform_range(start, end)
+        size = len(self)
+        keys = self.index.slice(size - 1 - end, size - start)
+        keys.reverse()
+        return keys
+
+    def _score_span(self, min_score, max_score):
+        # [lo, hi) positions of the members with scores between the bounds.
+        min_score, min_exclusive = _parse_bound(min_score)
+        max_score, max_exclusive = _parse_bound(max_score)
+        if min_exclusive:
+            lo = self.index.count_while(lambda key: key[0] <= min_score)
+        else:
+            lo = self.index.count_while(lambda key: key[0] < min_score)
+        if max_exclusive:
+            hi = self.index.count_while(lambda key: key[0] < max_score)
+        else:
+            hi = self.index.count_while(lambda key: key[0] <= max_score)
+        return lo, max(lo, hi)
+
+    def count(self, min_score, max_score):
+        lo, hi = self._score_span(min_score, max_score)
+        return hi - lo
+
+    def range_by_score(self, min_score, max_score, start=None, num=None):
+        lo, hi = self._score_span(min_score, max_score)
+        if start is not None:
+            lo += start
+            if num is not None and num >= 0:
+                hi = min(hi, lo + num)
+        return self.index.slice(lo, hi)
+
+    def revrange_by_score(self, max_score, min_score, start=None, num=None):
+        lo, hi = self._score_span(min_score, max_score)
+        if start is not None:
+            hi -= start
+            if num is not None and num >= 0:
+                lo = max(lo, hi - num)
+        keys = self.index.slice(lo, hi)
+        keys.reverse()
+        return keys
+
+def _locked(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class MemoryPipeline(object):
+    """
+    Queues calls and runs them back to back under the client's lock, so a
+      pipeline is atomic just like MULTI/EXEC.
+    """
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.reset()
+
+    def __getattr__(self, attr):
+        method = getattr(self.client, attr)
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def reset(self):
+        self.commands = []
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        with self.client._lock:
+            return [method(*args, **kwargs)
+                for method, args, kwargs in commands]
+
+class MemoryRedis(object):
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Signalled on XADD, for blocking XREADs.
+        self._stream_added = threading.Condition(self._lock)
+        self._data = {}
+        self._expires = {}
+
+    def _expire_stale(self, name):
+        # Keys expire lazily, when next touched.
+        expires = self._expires.get(name)
+        if expires is not None and expires <= time.time():
+            self._data.pop(name, None)
+            del self._expires[name]
+
+    def _zset(self, name, create=False):
+        self._expire_stale(name)
+        zset = self._data.get(name)
+        if zset is None and create:
+            zset = self._data[name] = SortedSet()
+        return zset
+
+    def _prune(self, name):
+        # redis drops keys whose value became empty.
+        if not self._data.get(name):
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return MemoryPipeline(self)
+
+    @_locked
+    def flushdb(self):
+        self._data.clear()
+        self._expires.clear()
+        return True
+
+    @_locked
+    def delete(self, *names):
+        for name in names:
+            self._expire_stale(name)
+            self._expires.pop(name, None)
+        return len([name for name in names
+            if self._data.pop(name, None) is not None])
+
+    @_locked
+    def exists(self, name):
+        self._expire_stale(name)
+        return name in self._data
+
+    @_locked
+    def get(self, name):
+        self._expire_stale(name)
+        return self._data.get(name)
+
+    @_locked
+    def set(self, name, value, ex=None, px=None, nx=False):
+        self._expire_stale(name)
+        if nx and name in self._data:
+            return None
+        self._expires.pop(name, None)
+        self._data[name] = value
+        if ex is not None:
+            self._expires[name] = time.time() + ex
+        if px is not None:
+            self._expires[name] = time.time() + px / 1000.0
+        return True
+
+    @_locked
+    def rename(self, src, dst):
+        self._expire_stale(src)
+        if src not in self._data:
+            raise ResponseError("no such key")
+        self._data[dst] = self._data.pop(src)
+        self._expires.pop(dst, None)
+        if src in self._expires:
+            self._expires[dst] = self._expires.pop(src)
+        return True
+
+    def _hash(self, name, create=False):
+        self._expire_stale(name)
+        hash = self._data.get(name)
+        if hash is None and create:
+            hash = self._data[name] = {}
+        return hash
+
+    @_locked
+    def hincrby(self, name, key, amount=1):
+        hash = self._hash(name, create=True)
+        hash[key] = int(hash.get(key, 0)) + int(amount)
+        return hash[key]
+
+    @_locked
+    def hdel(self, name, *keys):
+        hash = self._hash(name) or {}
+        removed = len([key for key in keys if hash.pop(key, None) is not None])
+        self._prune(name)
+        return removed
+
+    @_locked
+    def hgetall(self, name):
+        return dict(self._hash(name) or {})
+
+    def _stream(self, name, create=False):
+        # A list of (id, [field, value, ...]) entries, oldest first.
+        self._expire_stale(name)
+        stream = self._data.get(name)
+        if stream is None and create:
+            stream = self._data[name] = []
+        return stream
+
+    @_locked
+    def xadd(self, name, fields, id='*', maxlen=None, approximate=True):
+        stream = self._stream(name, create=True)
+        now = int(time.time() * 1000)
+        last = _stream_id(stream[-1][0]) if stream else (0, 0)
+        if now > last[0]:
+            entry_id = '%d-0' % now
+        else:
+            entry_id = '%d-%d' % (last[0], last[1] + 1)
+        entry = []
+        for field, value in fields.items():
+            entry.extend([field, str(value)])
+        stream.append((entry_id, entry))
+        if maxlen is not None and len(stream) > maxlen:
+            del stream[:len(stream) - maxlen]
+        self._stream_added.notify_all()
+        return entry_id
+
+    def _xrevrange(self, name, max='+', min='-', *options):
+        count = None
+        if options and options[0].upper() == 'COUNT':
+            count = int(options[1])
+        high, low = _stream_id(max), _stream_id(min)
+        entries = [[entry_id, entry] 
+            for entry_id, entry in reversed(self._stream(name) or [])
+            if low <= _stream_id(entry_id) <= high]
+        return entries[:count]
+
+    def _xread(self, *args):
+        count = block = None
+        i = 0
+        while args[i].upper() != 'STREAMS':
+            if args[i].upper() == 'COUNT':
+                count = int(args[i + 1])
+            elif args[i].upper() == 'BLOCK':
+                block = int(args[i + 1])
+            i += 2
+        streams = args[i + 1:]
+        names, ids = streams[:len(streams) // 2], streams[len(streams) // 2:]
+        # '$' means entries added after this call was made.
+        after = []
+        for name, last in zip(names, ids):
+            if last == '$':
+                stream = self._stream(name) or [('0-0', None)]
+                last = stream[-1][0]
+            after.append(_stream_id(last))
+
+        deadline = None
+        if block:
+            deadline = time.time() + block / 1000
+        while True:
+            reply = []
+            for name, last in zip(names, after):
+                entries = [[entry_id, entry] 
+                    for entry_id, entry in self._stream(name) or []
+                    if _stream_id(entry_id) > last][:count]
+                if entries:
+                    reply.append([name, entries])
+            if reply:
+                return reply
+            if block is None:
+                return None
+            if deadline is None:
+                self._stream_added.wait()
+                continue
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            self._stream_added.wait(remaining)
+
+    @_locked
+    def expireat(self, name, when):
+        if not self.exists(name):
+            return False
+        self._expires[name] = when
+        return True
+
+    @_locked
+    def expire(self, name, time_to_live):
+        return self.expireat(name, time.time() + time_to_live)
+
+    @_locked
+    def zadd(self, name, **pairs):
+        return self._zadd(name, pairs.items())
+
+    def _zadd(self, name, members_and_scores):
+        zset = self._zset(name, create=True)
+        added = 0
+        for member, score in members_and_scores:
+            added += zset.add(member, float(score))
+        self._prune(name)
+        return added
+
+    @_locked
+    def zrem(self, name, *values):
+        zset = self._zset(name)
+        if zset is None:
+            return 0
+        removed = len([value for value in values if zset.remove(value)])
+        self._prune(name)
+        return removed
+
+    @_locked
+    def zcard(self, name):
+        return len(self._zset(name) or ())
+
+    @_locked
+    def zscore(self, name, value):
+        return (self._zset(name) or SortedSet()).scores.get(value)
+
+    @_locked
+    def zrevrank(self, name, value):
+        return (self._zset(name) or SortedSet()).revrank(value)
+
+    def _with_scores(self, keys, withscores, score_cast_func):
+        if withscores:
+            return [(member, score_cast_func(score)) for score, member in keys]
+        return [member for score, member in keys]
+
+    @_locked
+    def zrange(self, name, start, end, desc=False, withscores=False,
+        score_cast_func=float):
+        if desc:
+            return self.zrevrange(name, start, end, withscores,
+                score_cast_func)
+        zset = self._zset(name)
+        if zset is None:
+            return []
+        return self._with_scores(zset.range(start, end),
+            withscores,
+            score_cast_func)
+
+    @_locked
+    def zrevrange(self, name, start, num, withscores=False,
+        score_cast_func=float):
+        zset = self._zset(name)
+        if zset is None:
+            return []
+        return self._with_scores(zset.revrange(start, num),
+            withscores,
+            score_cast_func)
+
+    @_locked
+    def zrangebyscore(self, name, min, max, start=None, num=None,
+        withscores=False, score_cast_func=float):
+        zset = self._zset(name)
+        if zset is None:
+            return []
+        return self._with_scores(zset.range_by_score(min, max, start, num),
+            withscores,
+            score_cast_func)
+
+    @_locked
+    def zrevrangebyscore(self, name, max, min, start=None, num=None,
+        withscores=False, score_cast_func=float):
+        zset = self._zset(name)
+        if zset is None:
+            return []
+        return self._with_scores(zset.revrange_by_score(max, min, start, num),
+            withscores,
+            score_cast_func)
+
+    @_locked
+    def zcount(self, name, min, max):
+        zset = self._zset(name)
+        if zset is None:
+            return 0
+        return zset.count(min, max)
+
+    @_locked
+    def zincrby(self, name, value, amount=1):
+        zset = self._zset(name, create=True)
+        score = zset.scores.get(value, 0.0) + float(amount)
+        zset.add(value, score)
+        return score
+
+    @_locked
+    def zremrangebyscore(self, name, min, max):
+        zset = self._zset(name)
+        if zset is None:
+            return 0
+        lo, hi = zset._score_span(min, max)
+        members = [member for score, member in zset.index.slice(lo, hi)]
+        for member in members:
+            zset.remove(member)
+        self._prune(name)
+        return len(members)
+
+    @_locked
+    def zremrangebyrank(self, name, min, max):
+        zset = self._zset(name)
+        if zset is None:
+            return 0
+        members = [member for score, member in zset.range(min, max)]
+        for member in members:
+            zset.remove(member)
+        self._prune(name)
+        return len(members)
+
+    def _zaggregate(self, dest, keys, aggregate, intersect):
+        if isinstance(keys, dict):
+            weights = keys
+        else:
+            weights = dict((key, 1) for key in keys)
+        aggregate = {
+            'SUM': lambda a, b: a + b,
+            'MIN': min,
+            'MAX': max
+        }[(aggregate or 'SUM').upper()]
+
+        sets = [(self._zset(key) or SortedSet(), weights[key])
+            for key in keys]
+        # Smallest first, as redis does; it matters to float sums.
+        sets.sort(key=lambda zset_weight: len(zset_weight[0].scores))
+        result = {}
+        for zset, weight in sets:
+            for member, score in zset.scores.items():
+                score = score * weight
+                if member in result:
+                    result[member] = aggregate(result[member], score)
+                else:
+                    result[member] = score
+        if intersect:
+            for member in list(result):
+                if not all(member in zset.scores for zset, weight in sets):
+                    del result[member]
+
+        zset = SortedSet()
+        for member, score in result.items():
+            zset.add(member, score)
+        self._data[dest] = zset
+        self._expires.pop(dest, None)
+        self._prune(dest)
+        return len(zset)
+
+    @_locked
+    def zunionstore(self, dest, keys, aggregate=None):
+        return self._zaggregate(dest, keys, aggregate, intersect=False)
+
+    @_locked
+    def zinterstore(self, dest, keys, aggregate=None):
+        return self._zaggregate(dest, keys, aggregate, intersect=True)
+
+    def script_load(self, script):
+        return self.execute_command('SCRIPT', 'LOAD', script)
+
+    @_locked
+    def execute_command(self, *args):
+        command = args[0].upper()
+        if command == 'SCRIPT' and args[1].upper() == 'LOAD':
+            return scripts.Script(args[2]).sha
+        if command == 'XREAD':
+            return self._xread(*args[1:])
+        if command == 'XREVRANGE':
+            return self._xrevrange(*args[1:])
+        # The board's own ZADDs and ZINCRBYs, which go this way to be the 
+        #  same on every redis-py.
+        if command == 'ZADD':
+            return self._zadd(args[1], zip(args[3::2], args[2::2]))
+        if command == 'ZINCRBY':
+            return self.zincrby(args[1], args[3], args[2])
+        if command == 'EVAL':
+            sha = scripts.Script(args[1]).sha
+        elif command == 'EVALSHA':
+            sha = args[1]
+        else:
+            raise NotImplementedError(command)
+        num_keys = int(args[2])
+        keys, script_args = args[3:3 + num_keys], args[3 + num_keys:]
+        return SCRIPTS[sha](self, list(keys), list(script_args))
+
+def _stream_id(entry_id):
+    if entry_id == '-':
+        return (0, 0)
+    if entry_id == '+':
+        return (float('inf'), float('inf'))
+    ms, _, seq = str(entry_id).partition('-')
+    return (int(ms), int(seq or 0))
+
+def _score_reply(score):
+    # Scripts hand scores back as strings; see leaderboard.scripts.
+    if score is None:
+        return None
+    return repr(float(score))
+
+def _change_score_with_floor(client, keys, args):
+    name, (member, delta, floor) = keys[0], args
+    new_score = (client.zscore(name, member) or 0.0) + float(delta)
+    if new_score < float(floor):
+        return [0, _score_reply(new_score)]
+    return [1, _score_reply(client.zincrby(name, member, delta))]
+
+def _score_and_rank(client, keys, args):
+    return [_score_reply(client.zscore(keys[0], args[0])),
+        client.zrevrank(keys[0], args[0])]
+
+def _ranked_in_list(client, keys, args):
+    results = []
+    for member in args:
+        results.append(client.zrevrank(keys[0], member))
+        results.append(_score_reply(client.zscore(keys[0], member)))
+    return results
+
+def _rank_member_if_higher(client, keys, args):
+    name, (member, score) = keys[0], args
+    current = client.zscore(name, member)
+    if current is not None and current >= float(score):
+        return 0
+    client.zadd(name, **{member: score})
+    return 1
+
+def _bucket(score, width):
+    return str(int(math.floor(float(score) / width)))
+
+def _index_options(args):
+    # ARGV[3], ARGV[4] of the index scripts.
+    dense, width = args[2:4]
+    if width == '':
+        return dense == '1', None
+    return dense == '1', float(width)
+
+def _uncount(client, buckets, field):
+    if client.hincrby(buckets, field, -1) <= 0:
+        client.hdel(buckets, field)
+
+def _feed(client, events, feed_length, member, old_rank, new_rank, score):
+    client.xadd(events, {
+        'm': member, 
+        'o': '' if old_rank is None else old_rank, 
+        'n': '' if new_rank is None else new_rank, 
+        's': '' if score is None else score
+    }, maxlen=int(feed_length))
+
+def _indexed_write(client, keys, args):
+    (name, index, buckets, events), (mode, floor) = keys, args[:2]
+    dense, width = _index_options(args)
+    max_members, report, feed_length = args[4:7]
+    pairs = args[7:]
+    results = []
+    for member, value in zip(pairs[0::2], pairs[1::2]):
+        old = _score_reply(client.zscore(name, member))
+        old_rank = client.zrevrank(name, member)
+        applied, written, new = 1, True, old
+        if mode == 'set':
+            applied = client.zadd(name, **{member: value})
+            new = _score_reply(client.zscore(name, member))
+        elif mode == 'set_if_higher':
+            if old is not None and float(old) >= float(value):
+                applied, written = 0, False
+            else:
+                client.zadd(name, **{member: value})
+                new = _score_reply(client.zscore(name, member))
+        elif mode == 'incr':
+            wanted = float(old or 0) + float(value)
+            if floor != '' and wanted < float(floor):
+                applied, written, new = 0, False, _score_reply(wanted)
+            else:
+                new = _score_reply(client.zincrby(name, member, value))
+        else:
+            applied = client.zrem(name, member)
+            new = None
+        if written and dense:
+            if old is not None and old != new and \
+                client.zcount(name, old, old) == 0:
+                client.zrem(index, old)
+            if new is not None:
+                client.zadd(index, **{new: new})
+        if written and width:
+            if old is not None:
+                _uncount(client, buckets, _bucket(old, width))
+            if new is not None:
+                client.hincrby(buckets, _bucket(new, width), 1)
+        if written and feed_length != '':
+            new_rank = client.zrevrank(name, member)
+            if new_rank != old_rank:
+                _feed(client, events, feed_length, member, old_rank, 
+                    new_rank, new)
+        results.extend([applied, new])
+    trimmed = []
+    excess = max_members != '' and client.zcard(name) - int(max_members)
+    if excess and excess > 0:
+        rows = client.zrange(name, 0, excess - 1, withscores=True)
+        total = client.zcard(name)
+        client.zremrangebyrank(name, 0, excess - 1)
+        for i, (member, score) in enumerate(rows):
+            if dense and client.zcount(name, score, score) == 0:
+                client.zrem(index, _score_reply(score))
+            if width:
+                _uncount(client, buckets, _bucket(score, width))
+            if report == '1':
+                trimmed.append(member)
+            if feed_length != '':
+                _feed(client, events, feed_length, member, total - 1 - i, 
+                    None, None)
+    return [results, trimmed]
+
+def _remove_range_indexed(client, keys, args):
+    (name, index, buckets), (min_score, max_score) = keys, args[:2]
+    dense, width = _index_options(args)
+    if width:
+        for member, score in client.zrangebyscore(name, min_score, max_score,
+            withscores=True):
+            _uncount(client, buckets, _bucket(score, width))
+    removed = client.zremrangebyscore(name, min_score, max_score)
+    if dense:
+        client.zremrangebyscore(index, min_score, max_score)
+    return removed
+
+def _add_to_indexes(client, keys, args):
+    (name, index, buckets), (start, stop) = keys, args[:2]
+    dense, width = _index_options(args)
+    rows = client.zrange(name, int(start), int(stop), withscores=True)
+    for member, score in rows:
+        if dense:
+            client.zadd(index, **{_score_reply(score): score})
+        if width:
+            client.hincrby(buckets, _bucket(score, width), 1)
+    return len(rows)
+
+def _around_me(client, keys, args):
+    (name, higher_in), (member, page_size, tied) = keys, args
+    rank = client.zrevrank(name, member)
+    if rank is None:
+        return None
+    start = max(min(rank - int(page_size) // 2, 
+        client.zcard(name) - int(page_size)), 0)
+    rows = []
+    for row_member, score in client.zrevrange(name, start, 
+        start + int(page_size) - 1, withscores=True):
+        rows.extend([row_member, _score_reply(score)])
+    first = None
+    if tied == '1':
+        first = client.zcount(higher_in, '(' + rows[1], '+inf')
+    return [start, first, rows]
+
+def _percentile_for(client, keys, args):
+    name, member = keys[0], args[0]
+    score = client.zscore(name, member)
+    if score is None:
+        return None
+    return [client.zcard(name), client.zcount(name, '-inf', '(%r' % score)]
+
+def _score_at_percentile(client, keys, args):
+    name = keys[0]
+    total = client.zcard(name)
+    if not total:
+        return None
+    index = max(int(math.ceil(float(args[0]) / 100 * total)) - 1, 0)
+    return _score_reply(client.zrange(name, index, index,
+        withscores=True)[0][1])
+
+def _position(client, name, score, member):
+    low = client.zcount(name, '(' + score, '+inf')
+    high = client.zcount(name, score, '+inf')
+    rank = client.zrevrank(name, member)
+    if rank is not None and low <= rank < high:
+        return rank, True
+    while low < high:
+        mid = (low + high) // 2
+        if client.zrevrange(name, mid, mid)[0] < member:
+            high = mid
+        else:
+            low = mid + 1
+    return low, False
+
+def _rows_reply(rows):
+    reply = []
+    for member, score in rows:
+        reply.extend([member, _score_reply(score)])
+    return reply
+
+def _range_after(client, keys, args):
+    name, (score, member, count) = keys[0], args
+    low, present = _position(client, name, score, member)
+    if present:
+        low += 1
+    return _rows_reply(client.zrevrange(name, low, low + int(count) - 1, 
+        withscores=True))
+
+def _ordered_ahead(client, keys, args):
+    return [_position(client, keys[0], score, member)[0]
+        for score, member in zip(args[0::2], args[1::2])]
+
+def _neighbours(client, keys, args):
+    name, (score, member, count) = keys[0], args
+    ahead, present = _position(client, name, score, member)
+    count = int(count)
+    behind = ahead + 1 if present else ahead
+    above, below = [], []
+    if count > 0:
+        if ahead > 0:
+            above = _rows_reply(client.zrevrange(name, 
+                max(ahead - count, 0), ahead - 1, withscores=True))
+        below = _rows_reply(client.zrevrange(name, 
+            behind, behind + count - 1, withscores=True))
+    return [ahead, above, below]
+
+def _ranked_with_ties(client, keys, args):
+    name, higher_in = keys
+    results = []
+    for member in args:
+        score = _score_reply(client.zscore(name, member))
+        if score is None:
+            results.append(None)
+        else:
+            results.append(client.zcount(higher_in, '(' + score, '+inf'))
+        results.append(score)
+    return results
+
+def _aggregate_member(client, keys, aggregate, member):
+    aggregate_key, sources = keys[0], keys[2:]
+    if aggregate == 'sum':
+        client.zrem(aggregate_key, member)
+    best = None
+    for source in sources:
+        score = client.zscore(source, member)
+        if score is not None and aggregate == 'sum':
+            client.zincrby(aggregate_key, member, score)
+        elif score is not None and (best is None or 
+            (score > best if aggregate == 'max' else score < best)):
+            best = score
+    if aggregate != 'sum':
+        if best is not None:
+            client.zadd(aggregate_key, **{member: best})
+        else:
+            client.zrem(aggregate_key, member)
+
+def _aggregate_write(client, keys, args):
+    source, (aggregate, mode, floor), pairs = keys[1], args[:3], args[3:]
+    results = []
+    for member, value in zip(pairs[0::2], pairs[1::2]):
+        old = _score_reply(client.zscore(source, member))
+        applied, new = 1, old
+        if mode == 'set':
+            applied = client.zadd(source, **{member: value})
+            new = _score_reply(client.zscore(source, member))
+        elif mode == 'set_if_higher':
+            if old is not None and float(old) >= float(value):
+                applied = 0
+            else:
+                client.zadd(source, **{member: value})
+                new = _score_reply(client.zscore(source, member))
+        elif mode == 'incr':
+            wanted = float(old or 0) + float(value)
+            if floor != '' and wanted < float(floor):
+                applied, new = 0, _score_reply(wanted)
+            else:
+                new = _score_reply(client.zincrby(source, member, value))
+        else:
+            applied = client.zrem(source, member)
+            new = None
+        if applied or mode == 'set':
+            _aggregate_member(client, keys, aggregate, member)
+        results.extend([applied, new])
+    return results
+
+def _aggregate_remove_range(client, keys, args):
+    source, (aggregate, min_score, max_score) = keys[1], args
+    members = client.zrangebyscore(source, min_score, max_score)
+    client.zremrangebyscore(source, min_score, max_score)
+    for member in members:
+        _aggregate_member(client, keys, aggregate, member)
+    return len(members)
+
+def _release_lease(client, keys, args):
+    if client.get(keys[0]) == args[0]:
+        return client.delete(keys[0])
+    return 0
+
+SCRIPTS = {
+    scripts.CHANGE_SCORE_WITH_FLOOR.sha: _change_score_with_floor,
+    scripts.SCORE_AND_RANK.sha: _score_and_rank,
+    scripts.RANKED_IN_LIST.sha: _ranked_in_list,
+    scripts.RANK_MEMBER_IF_HIGHER.sha: _rank_member_if_higher,
+    scripts.INDEXED_WRITE.sha: _indexed_write,
+    scripts.REMOVE_RANGE_INDEXED.sha: _remove_range_indexed,
+    scripts.RANKED_WITH_TIES.sha: _ranked_with_ties,
+    scripts.ADD_TO_INDEXES.sha: _add_to_indexes,
+    scripts.AROUND_ME.sha: _around_me,
+    scripts.PERCENTILE_FOR.sha: _percentile_for,
+    scripts.SCORE_AT_PERCENTILE.sha: _score_at_percentile,
+    scripts.RANGE_AFTER.sha: _range_after,
+    scripts.ORDERED_AHEAD.sha: _ordered_ahead,
+    scripts.NEIGHBOURS.sha: _neighbours,
+    scripts.AGGREGATE_WRITE.sha: _aggregate_write,
+    scripts.AGGREGATE_REMOVE_RANGE.sha: _aggregate_remove_range,
+    scripts.RELEASE_LEASE.sha: _release_lease,
+}
@@ -0,0 +1,266 @@
+"""
+  Per-call instrumentation for Leaderboard.
+
+  Pass a sink to record every public method call made through a board:
+
+    histogram = Histogram()
+    highscore_lb = Leaderboard('highscores', metrics=histogram)
+    ...
+    histogram.stats()['leaders']
+    # {'calls': 3, 'p50': 0.0004, 'commands': 6, 'round_trips': 3, ...}
+
+  A sink is any callable taking a Sample: the method name, wall time, and
+    the redis commands, round trips and payload bytes (sent and received,
+    as a rough count of argument/reply sizes) it took.  Nested calls
+    (leaders -> leaders_in) are charged to the outermost method only.
+  Boards built without a sink aren't touched at all, so it costs nothing
+    when off.  instrument() only sees calls on the instrumenting thread,
+    so for sharded boards instrument the shards themselves; asyncio boards
+    aren't supported.
+"""
+from __future__ import division
+import inspect
+import threading
+import time
+
+from functools import wraps
+
+# Latency bucket upper bounds, in seconds: 100us doubling up to ~50s.
+DEFAULT_BUCKETS = tuple(0.0001 * 2 ** i for i in range(20))
+
+class Sample(object):
+    __slots__ = ('method', 'seconds', 'commands', 'round_trips',
+        'bytes_sent', 'bytes_received')
+
+    def __init__(self, method):
+        self.method = method
+        self.seconds = 0.0
+        self.commands = 0
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def __repr__(self):
+        return "Sample(%r, seconds=%r, commands=%r, round_trips=%r)" % (
+            self.method, self.seconds, self.commands, self.round_trips)
+
+def payload_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(payload_size(key) + payload_size(item)
+            for key, item in value.items())
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    return len(repr(value))
+
+class _InstrumentedPipeline(object):
+    def __init__(self, pipe, state):
+        self._pipe = pipe
+        self._state = state
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.reset()
+
+    def reset(self):
+        self._pipe.reset()
+
+    def execute(self, *args, **kwargs):
+        replies = self._pipe.execute(*args, **kwargs)
+        sample = getattr(self._state, 'sample', None)
+        if sample is not None:
+            sample.round_trips += 1
+            sample.bytes_received += payload_size(replies)
+        return replies
+
+    def __getattr__(self, attr):
+        method = getattr(self._pipe, attr)
+        if not callable(method):
+            return method
+        def queue(*args, **kwargs):
+            reply = method(*args, **kwargs)
+            sample = getattr(self._state, 'sample', None)
+            if sample is not None:
+                sample.commands += 1
+                sample.bytes_sent += payload_size(args) + \
+                    payload_size(kwargs)
+            if reply is self._pipe:
+                return self
+            return reply
+        return queue
+
+class _InstrumentedClient(object):
+    def __init__(self, client, state):
+        self._client = client
+        self._state = state
+
+    def pipeline(self, *args, **kwargs):
+        return _InstrumentedPipeline(self._client.pipeline(*args, **kwargs),
+            self._state)
+
+    def __getattr__(self, attr):
+        method = getattr(self._client, attr)
+        if not callable(method):
+            return method
+        def call(*args, **kwargs):
+            sample = getattr(self._state, 'sample', None)
+            if sample is None:
+                return method(*args, **kwargs)
+            sample.commands += 1
+            sample.round_trips += 1
+            sample.bytes_sent += payload_size(args) + payload_size(kwargs)
+            reply = method(*args, **kwargs)
+            sample.bytes_received += payload_size(reply)
+            return reply
+        return call
+
+def _timed(name, method, state, sink):
+    @wraps(method)
+    def call(*args, **kwargs):
+        if getattr(state, 'sample', None) is not None:
+            return method(*args, **kwargs)
+        sample = state.sample = Sample(name)
+        start = time.time()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            sample.seconds = time.time() - start
+            state.sample = None
+        # Methods handing back another method's instrumented generator
+        #  (iter_all) leave the reporting to it, under their own name; any
+        #  other generator they hand back goes on being charged to this
+        #  call's sample.
+        if not inspect.isgenerator(result):
+            sink(sample)
+            return result
+        if result.gi_code is _steps.__code__:
+            return result
+        return _steps(result, sample, state, sink)
+    return call
+
+def _timed_generator(name, method, state, sink):
+    @wraps(method)
+    def call(*args, **kwargs):
+        # Named for the outermost method, as for nested calls.
+        outer = getattr(state, 'sample', None)
+        sample = Sample(name if outer is None else outer.method)
+        return _steps(method(*args, **kwargs), sample, state, sink)
+    return call
+
+def _steps(iterator, sample, state, sink):
+    # Charges each step of the generator (not the caller's time between
+    #  steps) to one sample, sent when the generator finishes.
+    try:
+        while True:
+            outer = getattr(state, 'sample', None)
+            if outer is None:
+                state.sample = sample
+            start = time.time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                sample.seconds += time.time() - start
+                if outer is None:
+                    state.sample = None
+            yield item
+    finally:
+        sink(sample)
+
+def instrument(board, sink):
+    """
+    Reports every public method call on board (and the redis traffic it
+      causes) to sink.  Returns the board.
+    """
+    state = threading.local()
+    board.redis = _InstrumentedClient(board.redis, state)
+    board.replicas = [_InstrumentedClient(replica, state)
+        for replica in getattr(board, 'replicas', [])]
+    for name in dir(type(board)):
+        if name.startswith('_') or name == 'batch':
+            continue
+        attr = getattr(type(board), name)
+        if not (inspect.isfunction(attr) or inspect.ismethod(attr)):
+            continue
+        if inspect.isgeneratorfunction(attr):
+            wrapper = _timed_generator
+        else:
+            wrapper = _timed
+        setattr(board, name, wrapper(name, getattr(board, name), state, sink))
+    return board
+
+class Histogram(object):
+    """
+    In-memory sink: a latency histogram per method, plus totals of
+      commands, round trips and payload bytes.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._methods = {}
+
+    def __call__(self, sample):
+        with self._lock:
+            totals = self._methods.get(sample.method)
+            if totals is None:
+                totals = self._methods[sample.method] = {
+                    'calls': 0,
+                    'seconds': 0.0,
+                    'commands': 0,
+                    'round_trips': 0,
+                    'bytes_sent': 0,
+                    'bytes_received': 0,
+                    'counts': [0] * (len(self.buckets) + 1)
+                }
+            totals['calls'] += 1
+            totals['seconds'] += sample.seconds
+            totals['commands'] += sample.commands
+            totals['round_trips'] += sample.round_trips
+            totals['bytes_sent'] += sample.bytes_sent
+            totals['bytes_received'] += sample.bytes_received
+            totals['counts'][self._bucket(sample.seconds)] += 1
+
+    def _bucket(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                return i
+        return len(self.buckets)
+
+    def percentile(self, method, p):
+        """
+        Upper bound of the bucket holding the p'th percentile call
+          (None past the last bucket, or for a method never called).
+        """
+        with self._lock:
+            totals = self._methods.get(method)
+            if totals is None:
+                return None
+            wanted = p / 100 * totals['calls']
+            seen = 0
+            for i, count in enumerate(totals['counts']):
+                seen += count
+                if count and seen >= wanted:
+                    break
+        if i < len(self.buckets):
+            return self.buckets[i]
+        return None
+
+    def stats(self):
+        result = {}
+        for method in list(self._methods):
+            with self._lock:
+                totals = dict(self._methods[method])
+            del totals['counts']
+            totals['p50'] = self.percentile(method, 50)
+            totals['p99'] = self.percentile(method, 99)
+            result[method] = totals
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
@@ -0,0 +1,131 @@
+"""
+  Registry of redis connection pools, one per set of connection parameters.
+
+  Boards built with connection kwargs share the pool registered for exactly
+    those kwargs, so boards on different hosts/dbs get different pools:
+
+      weekly = Leaderboard('weekly', host='redis-a', db=1)
+      monthly = Leaderboard('monthly', host='redis-b', max_connections=20)
+
+  Pool options (taken alongside the redis kwargs):
+    max_connections - cap on open connections (default: unbounded).
+    blocking - when capped, wait up to `timeout` seconds for a free
+      connection instead of raising right away.
+    health_check_interval - ping connections idle longer than this many
+      seconds before reusing them (needs a redis-py that supports it).
+
+  An existing pool can be handed to a board with pool=, and stays its
+    owner's to disconnect.  Each board holds its registered pool until
+    board.close(); the last holder out disconnects and forgets it.
+    close_pools() (or port.teardown()) disconnects and forgets every
+    registered pool at once.
+
+  Other kinds of pool (aio.py's redis.asyncio ones) share the registry by
+    passing a factory, and are registered per factory; close_pools() leaves
+    those to their own module, which disconnects them its own way.
+"""
+import threading
+
+from redis import ConnectionPool
+
+try:
+    from redis import BlockingConnectionPool
+except ImportError:
+    # redis-py < 2.7
+    BlockingConnectionPool = None
+
+DEFAULT_BLOCKING_TIMEOUT = 20
+
+_lock = threading.Lock()
+_pools = {}
+# Registry key -> how many holds connection_pool has handed out.
+_holds = {}
+
+def _registry_key(connection_kwargs):
+    return tuple(sorted(connection_kwargs.items()))
+
+def connection_pool(max_connections=None,
+    blocking=False,
+    timeout=DEFAULT_BLOCKING_TIMEOUT,
+    health_check_interval=None,
+    factory=None,
+    **redis_kwargs):
+    """
+    The registered pool for these connection parameters, creating it on
+      first use.  Each call takes a hold on it; see release_pool.
+    factory, if given, builds the pool in place of ConnectionPool (or 
+      BlockingConnectionPool when blocking), from the same arguments.
+    """
+    if health_check_interval is not None:
+        redis_kwargs['health_check_interval'] = health_check_interval
+    key = (factory, _registry_key(redis_kwargs), max_connections, blocking,
+        blocking and timeout)
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = _make_pool(max_connections,
+                blocking,
+                timeout,
+                redis_kwargs,
+                factory)
+            _holds[key] = 0
+        _holds[key] += 1
+    return pool
+
+def release_pool(pool):
+    """
+    Gives back one hold on a registered pool; the last one disconnects and
+      forgets it.  Pools that aren't registered are left alone.
+    """
+    if _release(pool):
+        pool.disconnect()
+
+def _release(pool):
+    # Gives back one hold; True if it was the last, and pool is forgotten 
+    #  and due to be disconnected.
+    with _lock:
+        for key, registered in _pools.items():
+            if registered is pool:
+                break
+        else:
+            return False
+        _holds[key] -= 1
+        if _holds[key] > 0:
+            return False
+        del _pools[key]
+        del _holds[key]
+    return True
+
+def _make_pool(max_connections, blocking, timeout, redis_kwargs,
+    factory=None):
+    if not blocking:
+        if max_connections is not None:
+            redis_kwargs['max_connections'] = max_connections
+        return (factory or ConnectionPool)(**redis_kwargs)
+
+    if factory is None:
+        factory = BlockingConnectionPool
+    if factory is None:
+        raise ValueError("blocking pools need redis-py 2.7 or later")
+    if max_connections is None:
+        raise ValueError("a blocking pool needs max_connections")
+    return factory(max_connections=max_connections,
+        timeout=timeout,
+        **redis_kwargs)
+
+def registered_pools():
+    with _lock:
+        return list(_pools.values())
+
+def close_pools():
+    for pool in _forget_pools(None):
+        pool.disconnect()
+
+def _forget_pools(*factories):
+    # Forgets the registered pools made by any of factories (None for this 
+    #  module's own) and returns them, to be disconnected.
+    with _lock:
+        keys = [key for key in _pools if key[0] in factories]
+        for key in keys:
+            del _holds[key]
+        return [_pools.pop(key) for key in keys]
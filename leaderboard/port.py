@@ -6,8 +6,9 @@
     Things which don't (and take no args) are properties.
     Where raw positional booleans were passed in, kwargs are used instead, i.e. 
       use_zero_index_for_rank=True
-    The return value in ruby is a raw hash. In python, they 
-        *should* be (not yet) objs or named tuples by default.
+    The return value in ruby is a raw hash. In python, rows are LeaderEntry
+        objects (which still read like the hashes), or LeaderColumns with
+        columnar=True.
     Return hash values in ruby are strings; In python, they are native types
         (float/decimal/int).
     *Should* Adds incr/decr funcs to wrap oddly named change_score_for.
@@ -16,14 +17,28 @@
       It *should* be module.merge_leaderboards(destination, [src,...])
     rank_member is an odd name for a think which adds a member and 
         assigns a score.
-    *should* add a convenience func to close all LB-owned redis conns.
+    teardown() closes all LB-owned redis conns; board.close() lets go of 
+        one board's.
 """
 from __future__ import division
 import math
+import time
 
+from array import array
 from functools import wraps
+from itertools import count, islice
 from anyjson import loads, dumps
-from redis import Redis, ConnectionPool
+from redis import Redis
+from redis.exceptions import ConnectionError
+try:
+    from redis.exceptions import TimeoutError
+except ImportError:
+    # redis-py < 2.10 raises ConnectionError for timeouts too.
+    TimeoutError = ConnectionError
+
+from . import dumpfile, feed, scripts
+from .metrics import instrument
+from .pools import connection_pool, close_pools, release_pool
 
 
 VERSION = (2, 0, 0, 'alpha')
@@ -33,41 +48,407 @@ def get_version():
 
 DEFAULT_PAGE_SIZE = 25
 
+# Bulk loads pack this many members into each variadic ZADD, and send 
+#  this many ZADDs per pipeline round trip.
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CHUNKS_PER_PIPELINE = 10
+
+# Members fetched per round trip when walking a whole board.
+DEFAULT_BATCH_SIZE = 1000
+
+# Seconds each read of a rank change feed waits for new events.
+DEFAULT_FEED_BLOCK = 1.0
+
+# Where reads go on a board with replicas: 'replica' (any replica), 
+#  'primary', or 'read_your_writes' (a replica, unless this board wrote 
+#  the key within replica_lag seconds).
+READ_CONSISTENCIES = ('replica', 'primary', 'read_your_writes')
+DEFAULT_READ_CONSISTENCY = 'read_your_writes'
+DEFAULT_REPLICA_LAG = 1.0
+# Replica failures that send a read back to the primary.
+REPLICA_ERRORS = (ConnectionError, TimeoutError)
+
 DEFAULT_REDIS_HOST = 'localhost'
 DEFAULT_REDIS_PORT = 6379
 
 DEFAULT_LEADERBOARD_REQUEST_OPTIONS = {
     'with_scores': True, 
     'with_rank': True, 
-    'page_size': None
+    'page_size': None,
+    'columnar': False,
+    'ranking': 'ordinal'
 }
 
-# FIXME: fix connection lifecycle
-# FIXME: use redis connection pool.
-CONN_POOL = None
+# Bins histogram() splits a board into when given neither bins nor a 
+#  bucket_width to read.
+DEFAULT_HISTOGRAM_BINS = 10
+
+# How tied scores rank: 'ordinal' (1234, ties broken by member, as 
+#  ZREVRANK has it), 'competition' (1224) or 'dense' (1223, needs a board 
+#  with dense_index=True).
+RANKINGS = ('ordinal', 'competition', 'dense')
+
+_UNSET = object()
+
+class LeaderEntry(object):
+    """
+    One row of a leaderboard.  Fields that weren't asked for (with_rank or 
+      with_scores False) are left unset rather than None.
+    Also reads like the hashes rows used to be (entry['score'], 
+      'rank' in entry, dict(entry), == {'member': ...}).
+    """
+    __slots__ = ('member', 'rank', 'score')
+
+    def __init__(self, member, rank=_UNSET, score=_UNSET):
+        self.member = member
+        if rank is not _UNSET:
+            self.rank = rank
+        if score is not _UNSET:
+            self.score = score
+
+    def keys(self):
+        return [field for field in self.__slots__ if hasattr(self, field)]
+
+    def as_dict(self):
+        return dict((field, getattr(self, field)) for field in self.keys())
+
+    def copy(self):
+        return LeaderEntry(**self.as_dict())
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except (AttributeError, TypeError):
+            raise KeyError(field)
+
+    def __setitem__(self, field, value):
+        if field not in self.__slots__:
+            raise KeyError(field)
+        setattr(self, field, value)
+
+    def __contains__(self, field):
+        return field in self.__slots__ and hasattr(self, field)
+
+    def __eq__(self, other):
+        if isinstance(other, LeaderEntry):
+            other = other.as_dict()
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __repr__(self):
+        return "LeaderEntry(%s)" % ", ".join("%s=%r" % (field, 
+            getattr(self, field)) for field in self.keys())
+
+class LeaderColumns(object):
+    """
+    Rows as parallel columns, for big pages and exports: members is a list, 
+      ranks an array('l') and scores an array('d').  Columns that weren't 
+      asked for are None.  Members that aren't on the board (ranked_in_list) 
+      get rank -1 and score nan.
+    """
+    __slots__ = ('members', 'ranks', 'scores')
+
+    def __init__(self, members, ranks=None, scores=None):
+        self.members = members
+        if ranks is not None and not isinstance(ranks, array):
+            ranks = array('l', [-1 if rank is None else rank 
+                for rank in ranks])
+        self.ranks = ranks
+        if scores is not None and not isinstance(scores, array):
+            scores = array('d', [float('nan') if score is None else score 
+                for score in scores])
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.members)
+
+    def copy(self):
+        return LeaderColumns(list(self.members), 
+            self.ranks and array('l', self.ranks), 
+            self.scores and array('d', self.scores))
+
+    def __iter__(self):
+        # Row-wise view, as LeaderEntry objects.
+        for i, member in enumerate(self.members):
+            entry = LeaderEntry(member)
+            if self.ranks is not None:
+                entry.rank = self.ranks[i]
+            if self.scores is not None:
+                entry.score = self.scores[i]
+            yield entry
+
+class _LeadersPage(object):
+    """
+    One leaders page's reads and the shaping of their replies, without the 
+      I/O, for the boards that do it their own way (Batch, aio.py):
+      ZCARD and ZREVRANGE range_args() in one round trip, the ZREVRANGE 
+      again if past_end(), a ZCOUNT of higher_args() unless None, and 
+      then results().
+    """
+    def __init__(self, leaderboard, name, current_page, **kwargs):
+        self.leaderboard = leaderboard
+        self.name = name
+        self.page_size = leaderboard._conform_page_size(**kwargs)
+        self.with_rank, self.with_scores, self.use_zero_index_for_rank = \
+            leaderboard._conform_request_options(**kwargs)
+        self.columnar = kwargs.get('columnar', 
+            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['columnar'])
+        self.ranking = leaderboard._conform_ranking(**kwargs)
+        self.tied = self.with_rank and self.ranking != 'ordinal'
+        # Tied ranks need the scores, asked for or not.
+        self.fetch_scores = self.with_scores or self.tied
+        self.starting_offset = (current_page - 1) * self.page_size
+
+    def range_args(self):
+        return (self.name, 
+            self.starting_offset, 
+            self.starting_offset + self.page_size - 1, 
+            self.fetch_scores)
+
+    def past_end(self, total_members, raw_leader_data):
+        # Asked past the end; upstream clamps to the last page, which 
+        #  range_args() then covers.
+        if raw_leader_data or not total_members:
+            return False
+        total_pages = int(math.ceil(total_members / self.page_size))
+        self.starting_offset = (total_pages - 1) * self.page_size
+        return True
+
+    def higher_args(self, raw_leader_data):
+        if not (self.tied and raw_leader_data):
+            return None
+        return (self.leaderboard._higher_key(self.name, self.ranking), 
+            '(%r' % raw_leader_data[0][1], 
+            '+inf')
+
+    def results(self, raw_leader_data, higher=None):
+        leaderboard = self.leaderboard
+        ranks = None
+        if higher is not None:
+            ranks = leaderboard._tied_ranks(self.ranking, 
+                self.starting_offset, 
+                higher, 
+                [score for member, score in raw_leader_data])
+        if self.fetch_scores and not self.with_scores:
+            raw_leader_data = [member for member, score in raw_leader_data]
+        return leaderboard._ranked_in_range(raw_leader_data, 
+            self.starting_offset, 
+            with_rank=self.with_rank, 
+            with_scores=self.with_scores, 
+            use_zero_index_for_rank=self.use_zero_index_for_rank,
+            columnar=self.columnar, 
+            ranks=ranks)
+
+class Batch(object):
+    """
+    Collects *_in reads (on any boards) into one pipeline:
+
+      with highscore_lb.batch() as batch:
+          batch.rank_for_in('weekly', 'david')
+          batch.leaders_in('monthly', 1)
+      weekly_rank, monthly_leaders = batch.results
+
+    Each result is what the Leaderboard method would have returned.
+    """
+    def __init__(self, leaderboard):
+        self.leaderboard = leaderboard
+        self.pipe = leaderboard.redis.pipeline()
+        # (number of replies, callback(replies) -> result) per queued call.
+        self.calls = []
+        self.results = None
+
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.pipe.reset()
+
+    def _queue(self, replies, callback):
+        self.calls.append((replies, callback))
+        return self
+
+    def rank_for_in(self, name, member, use_zero_index_for_rank=False):
+        self.pipe.zrevrank(name, member)
+        return self._queue(1, lambda replies: 
+            self.leaderboard._conform_rank(replies[0], 
+                use_zero_index_for_rank))
+
+    def score_for_in(self, name, member):
+        self.pipe.zscore(name, member)
+        return self._queue(1, lambda replies: replies[0])
+
+    def check_member_in(self, name, member):
+        self.pipe.zscore(name, member)
+        return self._queue(1, lambda replies: replies[0] is not None)
+
+    def score_and_rank_for_in(self, name, member, 
+        use_zero_index_for_rank=False):
+        self.pipe.zscore(name, member)
+        self.pipe.zrevrank(name, member)
+        return self._queue(2, lambda replies: LeaderEntry(member, 
+            rank=self.leaderboard._conform_rank(replies[1], 
+                use_zero_index_for_rank), 
+            score=replies[0]))
+
+    def total_members_in(self, name):
+        self.pipe.zcard(name)
+        return self._queue(1, lambda replies: replies[0])
+
+    def total_pages_in(self, name, page_size=None):
+        if page_size is None:
+            page_size = self.leaderboard.page_size
+        self.pipe.zcard(name)
+        return self._queue(1, lambda replies: 
+            int(math.ceil(replies[0] / page_size)))
+
+    def total_members_in_score_range_in(self, name, min_score, max_score):
+        self.pipe.zcount(name, min_score, max_score)
+        return self._queue(1, lambda replies: replies[0])
+
+    def leaders_in(self, name, current_page=None, **kwargs):
+        if current_page is None or current_page < 1:
+            current_page = 1
+        leaderboard = self.leaderboard
+        page = _LeadersPage(leaderboard, name, current_page, **kwargs)
+        self.pipe.zcard(name)
+        self.pipe.zrevrange(*page.range_args())
+        def callback(replies):
+            total_members, raw_leader_data = replies
+            if page.past_end(total_members, raw_leader_data):
+                # Past the last page; this one costs its own round trip.
+                raw_leader_data = leaderboard.redis.zrevrange(
+                    *page.range_args())
+            # So does counting the scores above a tied page.
+            higher_args = page.higher_args(raw_leader_data)
+            higher = None
+            if higher_args is not None:
+                higher = leaderboard.redis.zcount(*higher_args)
+            return page.results(raw_leader_data, higher)
+        return self._queue(2, callback)
+
+    def execute(self):
+        replies = self.pipe.execute()
+        self.results = []
+        offset = 0
+        for count, callback in self.calls:
+            self.results.append(callback(replies[offset:offset + count]))
+            offset += count
+        self.calls = []
+        return self.results
 
 def teardown():
-    global CONN_POOL
-    if CONN_POOL is None:
-        return
-    CONN_POOL.disconnect()
-    CONN_POOL = None
+    """
+    Disconnects and forgets every pool boards have made from connection 
+      kwargs; boards still holding one reconnect on next use.
+    """
+    close_pools()
+
+def _native(member):
+    # Dumps hold members as bytes; loads write them back as str, as they 
+    #  were written in the first place.
+    if isinstance(member, str):
+        return member
+    return member.decode('utf-8')
+
+def _zadd(redis, name, members_and_scores):
+    # ZADD on a client or pipeline, the same on every redis-py (2.x takes 
+    #  zadd(name, **pairs), 3.0 on zadd(name, mapping)).
+    args = []
+    for member, score in members_and_scores:
+        args.extend([score, member])
+    return redis.execute_command('ZADD', name, *args)
+
+def _zincrby(redis, name, member, delta):
+    # Likewise for ZINCRBY, whose arguments 3.0 swapped round.
+    return redis.execute_command('ZINCRBY', name, delta, member)
 
 class Leaderboard(object):
     def __init__(self, name, 
         page_size=DEFAULT_PAGE_SIZE, 
         redis=None,
+        cache=None,
+        snapshot=None,
+        metrics=None,
+        pool=None,
+        replicas=None,
+        read_consistency=DEFAULT_READ_CONSISTENCY,
+        replica_lag=DEFAULT_REPLICA_LAG,
+        dense_index=False,
+        bucket_width=None,
+        max_members=None,
+        trim_every=1,
+        on_trim=None,
+        feed_length=None,
         **redis_kwargs):
+        """
+        The connection is, in order of preference: the redis client given, 
+          a client on the given pool, or one on the pool registered for 
+          redis_kwargs (see pools.connection_pool for the pool options).
+        replicas are clients that reads are spread over, round robin, as 
+          read_consistency (or a read's consistency= option) allows; writes 
+          always go to the primary connection.
+        dense_index keeps a sorted set of the distinct scores (<name>:dense)
+          in step with every write made through this board, for 
+          ranking='dense'.
+        bucket_width keeps a hash of member counts per score bucket 
+          (<name>:buckets, bucket i holding scores in [i * width, 
+          (i + 1) * width)) in step the same way, for histogram().
+        max_members caps boards written through this instance: writes go 
+          through the same script, which then drops the lowest ranked 
+          members past the cap, on every write or once per trim_every 
+          members written.  on_trim, if given, is called with (board name, 
+          trimmed members) after each trim that dropped any.
+        feed_length turns on the rank change feed (see feed.py): writes go 
+          through the same script again, which appends the members whose 
+          rank it moved to a stream capped at about feed_length entries.
+        """
+        # The registered pool this board holds, if it took one; clients 
+        #  and pools passed in belong to the caller.
+        self._registered_pool = None
+        if redis is None:
+            if pool is None:
+                pool = self._registered_pool = connection_pool(**redis_kwargs)
+            redis = Redis(connection_pool=pool)
+        self.redis = redis
 
+        if read_consistency not in READ_CONSISTENCIES:
+            raise ValueError("Unknown read consistency %r" % read_consistency)
+        self.replicas = list(replicas or [])
+        self.read_consistency = read_consistency
+        self.replica_lag = replica_lag
+        self._replica_turns = count()
+        # Board name -> time of this instance's last write to it.
+        self._written = {}
 
-        # TODO: allow pool to be sent in.
-        global CONN_POOL
-        if redis is None:
-            if CONN_POOL is None:
-                CONN_POOL = ConnectionPool(**redis_kwargs)
-            self.redis = Redis(connection_pool=CONN_POOL)
-        else:
-            self.redis = redis
+        self.dense_index = dense_index
+        self.bucket_width = bucket_width
+
+        if max_members is not None and max_members < 0:
+            raise ValueError("max_members can't be negative")
+        self.max_members = max_members
+        self.trim_every = max(trim_every, 1)
+        self.on_trim = on_trim
+        self._untrimmed_writes = 0
+
+        self.feed_length = feed_length
+
+        # Optional cache.PageCache for leaders(); invalidated by writes made
+        #  through this instance only.
+        self.cache = cache
+        # Optional snapshot.TopSnapshot serving head-of-board leaders() pages.
+        self.snapshot = snapshot
 
         self.name = name
         if page_size < 1:
@@ -75,6 +456,11 @@ class Leaderboard(object):
         else:
             self._page_size = page_size
 
+        # Optional metrics sink (see metrics.instrument); left unwrapped, 
+        #  and so free, when None.
+        if metrics is not None:
+            instrument(self, metrics)
+
     def _get_page_size(self):
         return self._page_size
     def _set_page_size(self, value):
@@ -84,99 +470,579 @@ class Leaderboard(object):
             self._page_size = value
     page_size = property(_get_page_size, _set_page_size)
 
+    def _invalidate(self, name):
+        if self.cache is not None:
+            self.cache.invalidate(name)
+        if self.snapshot is not None:
+            self.snapshot.invalidate(self, name)
+        if self.replicas:
+            self._written[name] = time.time()
+
+    def _replica_for(self, name, consistency=None):
+        """
+        The replica a read of name should go to, or None for the primary.
+        """
+        if consistency is None:
+            consistency = self.read_consistency
+        elif consistency not in READ_CONSISTENCIES:
+            raise ValueError("Unknown read consistency %r" % consistency)
+        if not self.replicas or consistency == 'primary':
+            return None
+        if consistency == 'read_your_writes' and \
+            time.time() - self._written.get(name, 0) < self.replica_lag:
+            return None
+        return self.replicas[next(self._replica_turns) % len(self.replicas)]
+
+    def _read(self, name, consistency, read):
+        """
+        read(redis) against a replica where allowed, and against the 
+          primary otherwise or if the replica fails.
+        """
+        replica = self._replica_for(name, consistency)
+        if replica is not None:
+            try:
+                return read(replica)
+            except REPLICA_ERRORS:
+                pass
+        return read(self.redis)
+
+    def close(self):
+        """
+        Lets go of the registered pool this board took (see 
+          pools.release_pool), disconnecting it if no other board holds it; 
+          the board reconnects on next use.  A client or pool passed in is 
+          left to its owner.
+        """
+        pool, self._registered_pool = self._registered_pool, None
+        if pool is not None:
+            release_pool(pool)
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+
     def delete_leaderboard(self):
         self.delete_leaderboard_named(self.name)
     def delete_leaderboard_named(self, name):
-        self.redis.delete(name)
+        if self.indexed:
+            self.redis.delete(*self._index_keys(name))
+        else:
+            self.redis.delete(name)
+        if self.snapshot is not None:
+            self.snapshot.drop(self, name)
+        self._invalidate(name)
+
+    @property
+    def indexed(self):
+        return self.dense_index or self.bucket_width is not None
+
+    @property
+    def _scripted_writes(self):
+        return self.indexed or self.max_members is not None or \
+            self.feed_length is not None
+
+    def _dense_key(self, name):
+        return "%s:dense" % name
+
+    def _buckets_key(self, name):
+        return "%s:buckets" % name
+
+    def _index_keys(self, name):
+        # KEYS for the scripts keeping the indexes; see scripts.py.
+        return [name, self._dense_key(name), self._buckets_key(name)]
+
+    def _events_key(self, name):
+        return "%s:events" % name
+
+    def _write_keys(self, name):
+        # KEYS for scripts.INDEXED_WRITE.
+        return self._index_keys(name) + [self._events_key(name)]
+
+    def _feed_args(self):
+        # ARGV[7] of scripts.INDEXED_WRITE.
+        if self.feed_length is None:
+            return ['']
+        return [self.feed_length]
+
+    def _index_args(self):
+        width = self.bucket_width
+        return [self.dense_index and '1' or '', 
+            '' if width is None else width]
+
+    def _indexed_write(self, name, mode, pairs, floor=None, 
+        chunk_size=DEFAULT_CHUNK_SIZE, 
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE, 
+        transaction=False):
+        """
+        Writes (member, value) pairs with scripts.INDEXED_WRITE, keeping 
+          the indexes in step and trimming as due, chunk_size pairs per 
+          script call.  pairs are read lazily, chunks_per_pipeline calls 
+          per round trip; with transaction they all go out in one 
+          MULTI/EXEC instead.
+          Returns a list of (applied, score) pairs per call.
+        """
+        if floor is None:
+            floor = ''
+        pairs = iter(pairs)
+        written = []
+        while True:
+            calls = []
+            while transaction or len(calls) < chunks_per_pipeline:
+                chunk = list(islice(pairs, chunk_size))
+                if not chunk:
+                    break
+                args = [mode, floor] + self._index_args() + \
+                    self._trim_args(mode, len(chunk)) + self._feed_args()
+                for member, value in chunk:
+                    args.extend([member, value])
+                calls.append((self._write_keys(name), args))
+            for results, trimmed in scripts.INDEXED_WRITE.call_many(
+                self.redis, 
+                calls, 
+                transaction=transaction):
+                if trimmed:
+                    self.on_trim(name, trimmed)
+                written.append(list(zip(results[0::2], results[1::2])))
+            if transaction or len(calls) < chunks_per_pipeline:
+                break
+        return written
+
+    def _trim_args(self, mode, writes):
+        # ARGV[5], ARGV[6] of scripts.INDEXED_WRITE: trim this call or not.
+        if self.max_members is None or mode == 'remove':
+            return ['', '']
+        self._untrimmed_writes += writes
+        if self._untrimmed_writes < self.trim_every:
+            return ['', '']
+        self._untrimmed_writes = 0
+        return [self.max_members, self.on_trim is not None and '1' or '']
+
+    def trim(self):
+        return self.trim_in(self.name)
+    def trim_in(self, name):
+        """
+        Trims name down to max_members now, whether or not a trim is due; 
+          returns the members dropped.
+        """
+        if self.max_members is None:
+            return []
+        results, trimmed = scripts.INDEXED_WRITE(self.redis, 
+            keys=self._write_keys(name), 
+            args=['set', ''] + self._index_args() + 
+                [self.max_members, '1'] + self._feed_args())
+        self._untrimmed_writes = 0
+        if trimmed:
+            if self.on_trim is not None:
+                self.on_trim(name, trimmed)
+            self._invalidate(name)
+        return trimmed
+
+    def rebuild_indexes(self):
+        return self.rebuild_indexes_in(self.name)
+    def rebuild_indexes_in(self, name):
+        """
+        Recomputes name's dense index and bucket counts (whichever this 
+          board keeps) from the board; the repair path for boards written 
+          around this instance (or before the indexes were turned on).  
+          Not atomic with writes made while it runs.
+        """
+        built = self._build_indexes(name, name)
+        with self.redis.pipeline() as pipe:
+            self._queue_index_swap(pipe, built)
+            pipe.execute()
+
+    def _build_indexes(self, name, source):
+        # Builds name's indexes from the members of source into temporary 
+        #  keys; returns (index, temp) pairs for _queue_index_swap.
+        indexes = self._index_keys(name)[1:]
+        temps = ["%s:rebuild" % index for index in indexes]
+        self.redis.delete(*temps)
+        start = 0
+        while True:
+            read = scripts.ADD_TO_INDEXES(self.redis, 
+                keys=[source] + temps, 
+                args=[start, start + DEFAULT_CHUNK_SIZE - 1] + 
+                    self._index_args())
+            if read < DEFAULT_CHUNK_SIZE:
+                break
+            start += DEFAULT_CHUNK_SIZE
+        return list(zip(indexes, temps))
+
+    def _queue_index_swap(self, pipe, built):
+        for index, temp in built:
+            if self.redis.exists(temp):
+                pipe.rename(temp, index)
+            else:
+                pipe.delete(index)
 
     def rank_member(self, member, score):
         self.rank_member_in(self.name, member, score)
     def rank_member_in(self, name, member, score):
-        self.redis.zadd(name, **{member: score})
+        if self._scripted_writes:
+            self._indexed_write(name, 'set', [(member, score)])
+        else:
+            _zadd(self.redis, name, [(member, score)])
+        self._invalidate(name)
+
+    def rank_member_if_higher(self, member, score):
+        return self.rank_member_if_higher_in(self.name, member, score)
+    def rank_member_if_higher_in(self, name, member, score):
+        """
+        Sets member's score only if it beats the current one (or member 
+          isn't ranked yet).  Returns whether the score was written.
+        """
+        if self._scripted_writes:
+            [[(ranked, new_score)]] = self._indexed_write(name, 
+                'set_if_higher', 
+                [(member, score)])
+            ranked = bool(ranked)
+        else:
+            ranked = bool(scripts.RANK_MEMBER_IF_HIGHER(self.redis, 
+                keys=[name], 
+                args=[member, score]))
+        if ranked:
+            self._invalidate(name)
+        return ranked
+
+    def rank_members(self, members_and_scores, 
+        chunk_size=DEFAULT_CHUNK_SIZE, 
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE):
+        return self.rank_members_in(self.name, 
+            members_and_scores, 
+            chunk_size=chunk_size, 
+            chunks_per_pipeline=chunks_per_pipeline)
+    def rank_members_in(self, name, members_and_scores, 
+        chunk_size=DEFAULT_CHUNK_SIZE, 
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE):
+        """
+        Bulk version of rank_member_in. members_and_scores may be any 
+          iterable (or generator) of (member, score) pairs; it is consumed 
+          lazily, chunk_size pairs at a time and chunks_per_pipeline chunks 
+          per round trip.
+        Returns a list with the ZADD count (newly added members) per chunk.
+        """
+        if chunk_size < 1:
+            chunk_size = DEFAULT_CHUNK_SIZE
+        if chunks_per_pipeline < 1:
+            chunks_per_pipeline = DEFAULT_CHUNKS_PER_PIPELINE
+
+        if self._scripted_writes:
+            counts = [sum(applied for applied, score in results) 
+                for results in self._indexed_write(name, 
+                    'set', 
+                    members_and_scores, 
+                    chunk_size=chunk_size, 
+                    chunks_per_pipeline=chunks_per_pipeline)]
+            self._invalidate(name)
+            return counts
+
+        counts = []
+        pairs = iter(members_and_scores)
+        pipe = self.redis.pipeline(transaction=False)
+        queued = 0
+        while True:
+            chunk = list(islice(pairs, chunk_size))
+            if not chunk:
+                break
+            _zadd(pipe, name, chunk)
+            queued += 1
+            if queued == chunks_per_pipeline:
+                counts.extend(pipe.execute())
+                queued = 0
+        if queued:
+            counts.extend(pipe.execute())
+        self._invalidate(name)
+        return counts
 
     def remove_member(self, member):
         self.remove_member_from(self.name, member)
     def remove_member_from(self, name, member):
-        self.redis.zrem(name, member)
+        if self._scripted_writes:
+            self._indexed_write(name, 'remove', [(member, '')])
+        else:
+            self.redis.zrem(name, member)
+        self._invalidate(name)
 
-    def total_members(self):
-        return self.total_members_in(self.name)
-    def total_members_in(self, name):
-        return self.redis.zcard(name)
+    def total_members(self, consistency=None):
+        return self.total_members_in(self.name, consistency=consistency)
+    def total_members_in(self, name, consistency=None):
+        return self._read(name, consistency, 
+            lambda redis: redis.zcard(name))
   
-    def total_pages(self):
-        return self.total_pages_in(self.name)
-    def total_pages_in(self, name, page_size=None):
+    def total_pages(self, consistency=None):
+        return self.total_pages_in(self.name, consistency=consistency)
+    def total_pages_in(self, name, page_size=None, consistency=None):
         if page_size is None:
             page_size = self.page_size
   
         return int(math.ceil(
-            self.total_members_in(name) / 
+            self.total_members_in(name, consistency=consistency) / 
             page_size
         ))
   
-    def total_members_in_score_range(self, min_score, max_score):
+    def total_members_in_score_range(self, min_score, max_score, 
+        consistency=None):
         return self.total_members_in_score_range_in(self.name, 
             min_score, 
-            max_score)
-    def total_members_in_score_range_in(self, name, min_score, max_score):
-        return self.redis.zcount(name, 
-            min_score, 
-            max_score)
+            max_score, 
+            consistency=consistency)
+    def total_members_in_score_range_in(self, name, min_score, max_score, 
+        consistency=None):
+        return self._read(name, consistency, 
+            lambda redis: redis.zcount(name, 
+                min_score, 
+                max_score))
   
-    def change_score_for(self, member, delta):
+    def percentile_for(self, member, consistency=None):
+        return self.percentile_for_in(self.name, 
+            member, 
+            consistency=consistency)
+    def percentile_for_in(self, name, member, consistency=None):
+        """
+        Percentage (0-100) of the board scoring strictly below member, or 
+          None if member isn't ranked.
+        """
+        counts = self._read(name, consistency, 
+            lambda redis: scripts.PERCENTILE_FOR(redis, 
+                keys=[name], 
+                args=[member]))
+        if counts is None:
+            return None
+        total, below = counts
+        return 100 * below / total
+
+    def score_at_percentile(self, percentile, consistency=None):
+        return self.score_at_percentile_in(self.name, 
+            percentile, 
+            consistency=consistency)
+    def score_at_percentile_in(self, name, percentile, consistency=None):
+        """
+        The nearest-rank score at percentile (0-100, counted from the 
+          lowest score), or None for an empty board.
+        """
+        if not 0 <= percentile <= 100:
+            raise ValueError("percentile must be between 0 and 100")
+        score = self._read(name, consistency, 
+            lambda redis: scripts.SCORE_AT_PERCENTILE(redis, 
+                keys=[name], 
+                args=[percentile]))
+        if score is None:
+            return None
+        return float(score)
+
+    def histogram(self, bins=None, consistency=None):
+        return self.histogram_in(self.name, bins=bins, consistency=consistency)
+    def histogram_in(self, name, bins=None, consistency=None):
+        """
+        Member counts per score bin, as ascending (low, high, count) rows.
+        bins is a number of equal-width bins spanning the board's scores, 
+          or a list of bin edges; each bin counts low <= score < high, 
+          save the last, which includes high too.
+        Left as None, a board with a bucket_width reads its bucket counts 
+          (one HGETALL, empty buckets left out); otherwise it is 
+          DEFAULT_HISTOGRAM_BINS.
+        """
+        if bins is None and self.bucket_width is not None:
+            buckets = self._read(name, consistency, 
+                lambda redis: redis.hgetall(self._buckets_key(name)))
+            return self._bucket_rows(buckets)
+        if bins is None:
+            bins = DEFAULT_HISTOGRAM_BINS
+
+        def read(redis):
+            edges = bins
+            if isinstance(bins, int):
+                with redis.pipeline(transaction=False) as pipe:
+                    pipe.zrange(name, 0, 0, withscores=True)
+                    pipe.zrevrange(name, 0, 0, True)
+                    lowest, highest = pipe.execute()
+                if not lowest:
+                    return []
+                edges = self._bin_edges(bins, lowest[0][1], highest[0][1])
+            with redis.pipeline(transaction=False) as pipe:
+                self._queue_bin_counts(pipe, name, edges)
+                return self._bin_rows(edges, pipe.execute())
+        return self._read(name, consistency, read)
+
+    def _bin_edges(self, bins, lowest, highest):
+        if bins < 1:
+            raise ValueError("bins must be at least 1")
+        width = (highest - lowest) / bins
+        return [lowest + i * width for i in range(bins)] + [highest]
+
+    def _queue_bin_counts(self, pipe, name, edges):
+        last = len(edges) - 2
+        for i, (low, high) in enumerate(zip(edges, edges[1:])):
+            if i < last:
+                high = '(%r' % float(high)
+            pipe.zcount(name, low, high)
+
+    def _bin_rows(self, edges, counts):
+        return [(float(low), float(high), count) 
+            for low, high, count in zip(edges, edges[1:], counts)]
+
+    def _bucket_rows(self, buckets):
+        width = self.bucket_width
+        rows = sorted((int(float(field)), int(count)) 
+            for field, count in buckets.items())
+        return [(i * width, (i + 1) * width, count) for i, count in rows]
+
+    def change_score_for(self, member, delta, floor=None):
         return self.change_score_for_member_in(self.name,
             member,
-            delta)
+            delta,
+            floor=floor)
+  
+    def change_score_for_member_in(self, name, member, delta, floor=None):
+        if self._scripted_writes:
+            [[(applied, score)]] = self._indexed_write(name, 
+                'incr', 
+                [(member, delta)], 
+                floor=floor)
+        elif floor is None:
+            score = _zincrby(self.redis, name, member, delta)
+            self._invalidate(name)
+            return score
+        else:
+            # Check and change atomically so nobody ever reads a score 
+            #  below floor.
+            applied, score = scripts.CHANGE_SCORE_WITH_FLOOR(self.redis, 
+                keys=[name], 
+                args=[member, delta, floor])
+        score = float(score)
+        if not applied:
+            raise ValueError(
+                "Invalid change resulted in final value %s" % score)
+        self._invalidate(name)
+        return score
   
-    def change_score_for_member_in(self, name, member, delta):
-        return self.redis.zincrby(name, member, delta)
+    def change_scores_for(self, deltas, floor=None):
+        return self.change_scores_for_members_in(self.name, 
+            deltas, 
+            floor=floor)
+    def change_scores_for_members_in(self, name, deltas, floor=None):
+        """
+        deltas is an iterable of (member, delta) pairs; all the ZINCRBYs 
+          go out in one pipeline. Returns the new scores, in order.
+        With floor, each change that would leave its member below floor is 
+          refused (atomically, as by change_score_for) and the score that 
+          was refused, below floor, comes back in its place; nothing raises.
+        """
+        return self._change_scores(name, deltas, floor)
+
+    def _change_scores(self, name, deltas, floor=None, transaction=False):
+        # With transaction, every change goes out in one MULTI/EXEC, so a 
+        #  failure leaves none of them applied (see buffered.py).
+        if self._scripted_writes:
+            scores = [float(score) 
+                for results in self._indexed_write(name, 'incr', deltas, 
+                    floor=floor, 
+                    transaction=transaction) 
+                for applied, score in results]
+            self._invalidate(name)
+            return scores
+
+        if floor is not None:
+            replies = scripts.CHANGE_SCORE_WITH_FLOOR.call_many(self.redis, 
+                [([name], [member, delta, floor]) 
+                    for member, delta in deltas], 
+                transaction=transaction)
+            self._invalidate(name)
+            return [float(score) for applied, score in replies]
+
+        with self.redis.pipeline(transaction=transaction) as pipe:
+            for member, delta in deltas:
+                _zincrby(pipe, name, member, delta)
+            scores = pipe.execute()
+        self._invalidate(name)
+        return scores
   
     def _conform_rank(self, rank, use_zero_index_for_rank):
         if rank is None or use_zero_index_for_rank:
             return rank
         return rank + 1
 
-    def rank_for(self, member, use_zero_index_for_rank=False):
+    def batch(self):
+        return Batch(self)
+
+    def score_and_rank_across(self, names, member, 
+        use_zero_index_for_rank=False):
+        """score_and_rank_for_in on each board, in one round trip."""
+        with self.batch() as batch:
+            for name in names:
+                batch.score_and_rank_for_in(name, 
+                    member, 
+                    use_zero_index_for_rank=use_zero_index_for_rank)
+        return batch.results
+
+    def rank_for(self, member, use_zero_index_for_rank=False, 
+        consistency=None, ranking='ordinal'):
         return self.rank_for_in(self.name, 
             member, 
-            use_zero_index_for_rank=use_zero_index_for_rank)
-    def rank_for_in(self, name, member, use_zero_index_for_rank=False):
-        rank = self.redis.zrevrank(name, member)
+            use_zero_index_for_rank=use_zero_index_for_rank, 
+            consistency=consistency, 
+            ranking=ranking)
+    def rank_for_in(self, name, member, use_zero_index_for_rank=False, 
+        consistency=None, ranking='ordinal'):
+        if self._conform_ranking(ranking=ranking) == 'ordinal':
+            rank = self._read(name, consistency, 
+                lambda redis: redis.zrevrank(name, member))
+        else:
+            rank, score = self._read(name, consistency, 
+                lambda redis: scripts.RANKED_WITH_TIES(redis, 
+                    keys=[name, self._higher_key(name, ranking)], 
+                    args=[member]))
         return self._conform_rank(rank, use_zero_index_for_rank)
   
-    def score_for(self, member):
-        return self.score_for_in(self.name, member)
-    def score_for_in(self, name, member):
-        return self.redis.zscore(name, member)
+    def score_for(self, member, consistency=None):
+        return self.score_for_in(self.name, member, consistency=consistency)
+    def score_for_in(self, name, member, consistency=None):
+        return self._read(name, consistency, 
+            lambda redis: redis.zscore(name, member))
 
-    def check_member(self, member):
-        return self.check_member_in(self.name, member)
-    def check_member_in(self, name, member):
-        return self.redis.zscore(name, member) is not None
+    def check_member(self, member, consistency=None):
+        return self.check_member_in(self.name, 
+            member, 
+            consistency=consistency)
+    def check_member_in(self, name, member, consistency=None):
+        return self.score_for_in(name, 
+            member, 
+            consistency=consistency) is not None
 
-    def score_and_rank_for(self, member, use_zero_index_for_rank=False):
+    def score_and_rank_for(self, member, use_zero_index_for_rank=False, 
+        consistency=None):
         return self.score_and_rank_for_in(self.name, 
             member, 
-            use_zero_index_for_rank=use_zero_index_for_rank)
-    def score_and_rank_for_in(self, name, member, use_zero_index_for_rank=False):
-        ret = {'member': member}
-        with self.redis.pipeline() as pipe:
-            pipe.zscore(name, member)
-            pipe.zrevrank(name, member)
-            ret['score'], ret['rank'] = pipe.execute()
-            
-        ret['rank'] = self._conform_rank(ret['rank'], use_zero_index_for_rank)
-        return ret
+            use_zero_index_for_rank=use_zero_index_for_rank, 
+            consistency=consistency)
+    def score_and_rank_for_in(self, name, member, use_zero_index_for_rank=False,
+        consistency=None):
+        score, rank = self._read(name, consistency, 
+            lambda redis: scripts.SCORE_AND_RANK(redis, 
+                keys=[name], 
+                args=[member]))
+        if score is not None:
+            score = float(score)
+        return LeaderEntry(member, 
+            rank=self._conform_rank(rank, use_zero_index_for_rank), 
+            score=score)
 
     def remove_members_in_score_range(self, min_score, max_score):
         return self.remove_members_in_score_range_in(self.name, 
             min_score, 
             max_score)
     def remove_members_in_score_range_in(self, name, min_score, max_score):
-        return self.redis.zremrangebyscore(name, 
-            min_score, 
-            max_score)
+        if self.indexed:
+            removed = scripts.REMOVE_RANGE_INDEXED(self.redis, 
+                keys=self._index_keys(name), 
+                args=[min_score, max_score] + self._index_args())
+        else:
+            removed = self.redis.zremrangebyscore(name, 
+                min_score, 
+                max_score)
+        self._invalidate(name)
+        return removed
 
     def _conform_page_size(self, **kwargs):
         page_size = kwargs.get('page_size', self.page_size)
@@ -184,6 +1050,44 @@ class Leaderboard(object):
           page_size = DEFAULT_PAGE_SIZE
         return page_size
 
+    def _conform_request_options(self, **kwargs):
+        with_rank = kwargs.get('with_rank',
+            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['with_rank'])
+        with_scores = kwargs.get('with_scores',
+            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['with_scores'])
+        use_zero_index_for_rank = kwargs.get('use_zero_index_for_rank',
+            False)
+        return with_rank, with_scores, use_zero_index_for_rank
+
+    def _conform_ranking(self, **kwargs):
+        ranking = kwargs.get('ranking', 
+            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['ranking'])
+        if ranking not in RANKINGS:
+            raise ValueError("Unknown ranking %r" % ranking)
+        if ranking == 'dense' and not self.dense_index:
+            raise ValueError("ranking='dense' needs dense_index=True")
+        return ranking
+
+    def _higher_key(self, name, ranking):
+        # Where scores above a member's are counted for its tied rank.
+        if ranking == 'dense':
+            return self._dense_key(name)
+        return name
+
+    def _results(self, members, ranks=None, scores=None, columnar=False):
+        if columnar:
+            return LeaderColumns(members, ranks, scores)
+        if ranks is None and scores is None:
+            return [LeaderEntry(member) for member in members]
+        if scores is None:
+            return [LeaderEntry(member, rank=rank) 
+                for member, rank in zip(members, ranks)]
+        if ranks is None:
+            return [LeaderEntry(member, score=score) 
+                for member, score in zip(members, scores)]
+        return [LeaderEntry(member, rank=rank, score=score) 
+            for member, rank, score in zip(members, ranks, scores)]
+
     def leaders(self, current_page, 
         **kwargs):
         return self.leaders_in(self.name, current_page, **kwargs)
@@ -194,99 +1098,419 @@ class Leaderboard(object):
           current_page = 1
 
         page_size = self._conform_page_size(**kwargs)
-    
-        total_pages = self.total_pages_in(name, page_size)
-        if current_page > total_pages:
-            current_page = total_pages
-    
-        index_for_redis = current_page - 1
+        with_rank, with_scores, use_zero_index_for_rank = \
+            self._conform_request_options(**kwargs)
 
-        starting_offset = (index_for_redis * page_size)
-        if starting_offset < 0:
-          starting_offset = 0
+        columnar = kwargs.get('columnar', 
+            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['columnar'])
+        ranking = self._conform_ranking(**kwargs)
 
-        ending_offset = (starting_offset + page_size) - 1
-        
-        raw_leader_data = self.redis.zrevrange(name, 
-            starting_offset, 
-            ending_offset, 
-            False)
-        if not raw_leader_data:
-            return []
+        consistency = kwargs.get('consistency')
 
-        return self.ranked_in_list_in(name, 
-            raw_leader_data, **kwargs)
+        if self.snapshot is not None and consistency != 'primary' and \
+            ranking == 'ordinal':
+            head = self.snapshot.leaders(self, name, current_page, page_size)
+            if head is not None:
+                starting_offset, raw_leader_data = head
+                if not with_scores:
+                    raw_leader_data = [member 
+                        for member, score in raw_leader_data]
+                return self._ranked_in_range(raw_leader_data, 
+                    starting_offset, 
+                    with_rank=with_rank, 
+                    with_scores=with_scores, 
+                    use_zero_index_for_rank=use_zero_index_for_rank,
+                    columnar=columnar)
+
+        if self.cache is None:
+            return self._read(name, consistency, 
+                lambda redis: self._fetch_leaders_in(name, 
+                    current_page, page_size, 
+                    with_rank, with_scores, use_zero_index_for_rank, columnar, 
+                    redis=redis, ranking=ranking))
+
+        key = (name, current_page, page_size, 
+            with_rank, with_scores, use_zero_index_for_rank, columnar, ranking)
+        leaders = self.cache.get(key, lambda: self._read(name, consistency, 
+            lambda redis: self._fetch_leaders_in(name, 
+                current_page, page_size, 
+                with_rank, with_scores, use_zero_index_for_rank, columnar, 
+                redis=redis, ranking=ranking)))
+        # Callers are free to mutate what they get back.
+        if columnar:
+            return leaders.copy()
+        return [leader.copy() for leader in leaders]
+
+    def _fetch_leaders_in(self, name, current_page, page_size, 
+        with_rank, with_scores, use_zero_index_for_rank, columnar=False, 
+        redis=None, ranking='ordinal'):
+        # Optimistically fetch the requested page along with the board size;
+        #  ranks fall out of the range offsets, so one round trip covers
+        #  the common case.
+        if redis is None:
+            redis = self.redis
+        page = _LeadersPage(self, name, current_page, 
+            page_size=page_size, 
+            with_rank=with_rank, 
+            with_scores=with_scores, 
+            use_zero_index_for_rank=use_zero_index_for_rank, 
+            columnar=columnar, 
+            ranking=ranking)
+        with redis.pipeline() as pipe:
+            pipe.zcard(name)
+            pipe.zrevrange(*page.range_args())
+            total_members, raw_leader_data = pipe.execute()
+
+        if page.past_end(total_members, raw_leader_data):
+            raw_leader_data = redis.zrevrange(*page.range_args())
+
+        higher_args = page.higher_args(raw_leader_data)
+        higher = None
+        if higher_args is not None:
+            higher = redis.zcount(*higher_args)
+        return page.results(raw_leader_data, higher)
+
+    def _tied_ranks(self, ranking, starting_offset, first, scores):
+        """
+        Zero-based competition/dense ranks for the scores of a contiguous 
+          ZREVRANGE slice starting at starting_offset, given the first 
+          row's.  Past it, ranks follow from where the score changes.
+        """
+        rank = first
+        ranks = [rank]
+        for i in range(1, len(scores)):
+            if scores[i] != scores[i - 1]:
+                if ranking == 'competition':
+                    rank = starting_offset + i
+                else:
+                    rank += 1
+            ranks.append(rank)
+        return ranks
+
+    def _ranked_in_range(self, raw_leader_data, starting_offset, 
+        with_rank=True, with_scores=True, use_zero_index_for_rank=False, 
+        columnar=False, ranks=None):
+        # raw_leader_data is a contiguous ZREVRANGE slice beginning at 
+        #  starting_offset, so each member's rank is its offset in the slice
+        #  (unless zero-based tied ranks are given).
+        if with_scores:
+            members = [member for member, score in raw_leader_data]
+            scores = [score for member, score in raw_leader_data]
+        else:
+            members, scores = raw_leader_data, None
+        if not with_rank:
+            ranks = None
+        elif ranks is not None:
+            ranks = [self._conform_rank(rank, use_zero_index_for_rank) 
+                for rank in ranks]
+        else:
+            first = self._conform_rank(starting_offset, 
+                use_zero_index_for_rank)
+            ranks = range(first, first + len(members))
+        return self._results(members, ranks, scores, columnar)
+  
+    def iter_all(self, batch_size=DEFAULT_BATCH_SIZE, with_scores=True, 
+        consistency=None):
+        return self.iter_all_in(self.name, 
+            batch_size=batch_size, 
+            with_scores=with_scores, 
+            consistency=consistency)
+    def iter_all_in(self, name, batch_size=DEFAULT_BATCH_SIZE, 
+        with_scores=True, consistency=None):
+        """
+        Lazily yields every member, best first, as (member, score) pairs 
+          (or bare members without with_scores), batch_size per round trip.
+        Walks with a (score, member) cursor rather than offsets, so members 
+          that move while the walk is in progress are neither skipped nor 
+          repeated on account of the others shifting around them; each 
+          batch after the first is read from the cursor by one script 
+          call, however big the tie group it sits in.
+        """
+        if batch_size < 1:
+            batch_size = DEFAULT_BATCH_SIZE
+        # One connection for the whole walk, so the cursor never hops 
+        #  between replicas at different points in replication.
+        redis = self._replica_for(name, consistency) or self.redis
+
+        last = None
+        while True:
+            try:
+                if last is None:
+                    rows = redis.zrevrange(name, 0, batch_size - 1, True)
+                else:
+                    reply = scripts.RANGE_AFTER(redis, 
+                        keys=[name], 
+                        args=[repr(last[1]), last[0], batch_size])
+                    rows = [(member, float(score)) 
+                        for member, score in zip(reply[0::2], reply[1::2])]
+            except REPLICA_ERRORS:
+                if redis is self.redis:
+                    raise
+                redis = self.redis
+                continue
+
+            for member, score in rows:
+                if with_scores:
+                    yield member, score
+                else:
+                    yield member
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+
+    def dump(self, fileobj, batch_size=DEFAULT_BATCH_SIZE, consistency=None):
+        return self.dump_in(self.name, 
+            fileobj, 
+            batch_size=batch_size, 
+            consistency=consistency)
+    def dump_in(self, name, fileobj, batch_size=DEFAULT_BATCH_SIZE, 
+        consistency=None):
+        """
+        Writes name to fileobj in the dumpfile format, walking it with 
+          iter_all_in.  Returns the number of members written.
+        Not a point-in-time copy of a board that is being written to.
+        """
+        return dumpfile.write(fileobj, self.iter_all_in(name, 
+            batch_size=batch_size, 
+            consistency=consistency))
+
+    def load(self, fileobj, 
+        chunk_size=DEFAULT_CHUNK_SIZE, 
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE):
+        return self.load_in(self.name, 
+            fileobj, 
+            chunk_size=chunk_size, 
+            chunks_per_pipeline=chunks_per_pipeline)
+    def load_in(self, name, fileobj, 
+        chunk_size=DEFAULT_CHUNK_SIZE, 
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE):
+        """
+        Replaces name with the board dumped to fileobj.  The dump is bulk 
+          loaded into a temporary key, trimmed and indexed there, and then 
+          RENAMEd over name (along with its indexes) in one transaction, 
+          so readers see the old board or the new one, never part of a load.
+        Returns the number of members loaded.
+        """
+        temp = "%s:load" % name
+        self.redis.delete(temp)
+        loaded = 0
+        trimmed = []
+        built = []
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            queued = 0
+            for batch in dumpfile.read(fileobj, chunk_size):
+                _zadd(pipe, temp, [(_native(member), score) 
+                    for member, score in batch])
+                loaded += len(batch)
+                queued += 1
+                if queued == chunks_per_pipeline:
+                    pipe.execute()
+                    queued = 0
+            if queued:
+                pipe.execute()
+            if loaded and self.max_members is not None:
+                trimmed = self._trim_loaded(temp)
+            if self.indexed:
+                built = self._build_indexes(name, temp)
+        except Exception:
+            self.redis.delete(temp, *[temp for index, temp in built])
+            raise
+
+        with self.redis.pipeline() as pipe:
+            if loaded:
+                pipe.rename(temp, name)
+            else:
+                pipe.delete(name)
+            self._queue_index_swap(pipe, built)
+            pipe.execute()
+        if trimmed and self.on_trim is not None:
+            self.on_trim(name, trimmed)
+        self._invalidate(name)
+        return loaded
+
+    def _trim_loaded(self, temp):
+        # Trims a board being loaded before its indexes are built, so it 
+        #  has none to keep in step and nothing to feed.
+        results, trimmed = scripts.INDEXED_WRITE(self.redis, 
+            keys=self._write_keys(temp), 
+            args=['set', '', '', '', self.max_members, '1', ''])
+        return trimmed
+  
+    def rank_changes(self, last_id='$', batch_size=DEFAULT_BATCH_SIZE, 
+        block=DEFAULT_FEED_BLOCK, use_zero_index_for_rank=False):
+        return self.rank_changes_in(self.name, 
+            last_id=last_id, 
+            batch_size=batch_size, 
+            block=block, 
+            use_zero_index_for_rank=use_zero_index_for_rank)
+    def rank_changes_in(self, name, last_id='$', batch_size=DEFAULT_BATCH_SIZE,
+        block=DEFAULT_FEED_BLOCK, use_zero_index_for_rank=False):
+        """
+        Lazily yields feed.RankChange events from name's rank change feed, 
+          those after last_id ('$' for from now on, '0' for every one still 
+          kept), batch_size per XREAD.  Each read blocks for up to block 
+          seconds and the feed is followed forever; with block=None it 
+          stops once caught up.
+        Pass the last event's id back as last_id to resume.
+        """
+        if batch_size < 1:
+            batch_size = DEFAULT_BATCH_SIZE
+        key = self._events_key(name)
+        # Resolved here rather than on the first next(), so '$' means the
+        #  time of the call.
+        if last_id == '$':
+            last_id = feed.latest_id(self.redis, key)
+        return self._follow_feed(key, last_id, batch_size, block, 
+            use_zero_index_for_rank)
+
+    def _follow_feed(self, key, last_id, batch_size, block, 
+        use_zero_index_for_rank):
+        while True:
+            entries = feed.read(self.redis, key, last_id, batch_size, block)
+            if not entries:
+                if block is None:
+                    return
+                continue
+            for entry_id, entry in entries:
+                change = feed.parse(entry_id, entry, use_zero_index_for_rank)
+                last_id = change.id
+                yield change
   
     def around_me(self, member, **kwargs):
         return self.around_me_in(self.name, member, **kwargs)
     def around_me_in(self, name, member, **kwargs):
-        reverse_rank_for_member = self.redis.zrevrank(name, member)
-    
-        page_size = self._conform_page_size(**kwargs)
-    
-        starting_offset = reverse_rank_for_member - int(page_size / 2)
-        if starting_offset < 0:
-            starting_offset = 0
+        """
+        The page_size rows around member: half a page above it and the 
+          rest below, fewer above near the top and more near the bottom, 
+          read in one script call.  Empty if member isn't ranked.
+        """
+        keys, args = self._around_me_call(name, member, **kwargs)
+        reply = self._read(name, kwargs.get('consistency'), 
+            lambda redis: scripts.AROUND_ME(redis, keys=keys, args=args))
+        return self._around_me_results(reply, **kwargs)
 
-        ending_offset = (starting_offset + page_size) - 1
-    
-        raw_leader_data = self.redis.zrevrange(name, 
+    def _around_me_call(self, name, member, **kwargs):
+        ranking = self._conform_ranking(**kwargs)
+        with_rank = self._conform_request_options(**kwargs)[0]
+        tied = with_rank and ranking != 'ordinal'
+        return ([name, self._higher_key(name, ranking)], 
+            [member, self._conform_page_size(**kwargs), tied and '1' or ''])
+
+    def _around_me_results(self, reply, **kwargs):
+        with_rank, with_scores, use_zero_index_for_rank = \
+            self._conform_request_options(**kwargs)
+        columnar = kwargs.get('columnar', 
+            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['columnar'])
+        if reply is None:
+            return self._results([], columnar=columnar)
+
+        starting_offset, first, rows = reply
+        raw_leader_data = [(member, float(score)) 
+            for member, score in zip(rows[0::2], rows[1::2])]
+        ranks = None
+        if first is not None:
+            ranks = self._tied_ranks(self._conform_ranking(**kwargs), 
+                starting_offset, 
+                first, 
+                [score for member, score in raw_leader_data])
+        if not with_scores:
+            raw_leader_data = [member for member, score in raw_leader_data]
+        return self._ranked_in_range(raw_leader_data, 
             starting_offset, 
-            ending_offset, 
-            False)
-        if not raw_leader_data:
-            return []
-        return self.ranked_in_list_in(name, 
-            raw_leader_data, 
-            **kwargs)
+            with_rank=with_rank, 
+            with_scores=with_scores, 
+            use_zero_index_for_rank=use_zero_index_for_rank,
+            columnar=columnar, 
+            ranks=ranks)
   
     def ranked_in_list(self, members, **kwargs):
         return self.ranked_in_list_in(self.name, members, **kwargs)
     def ranked_in_list_in(self, name, members, **kwargs):
-        with_rank = kwargs.get('with_rank',
-            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['with_rank'])
-        with_scores = kwargs.get('with_scores',
-            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['with_scores'])
-        use_zero_index_for_rank = kwargs.get('use_zero_index_for_rank',
-            False)
-        results = [{'member': member} for member in members]
+        """
+        Ranks and scores for an arbitrary list of members, one script call 
+          per chunk_size members (all in one round trip).  With 
+          sort_by_rank=True, results come back best first, unranked members 
+          last.
+        """
+        members = list(members)
+        return self._read(name, kwargs.get('consistency'), 
+            lambda redis: self._ranked_in_list(redis, name, members, 
+                **kwargs))
+
+    def _ranked_in_list(self, redis, name, members, **kwargs):
+        members = list(members)
+        script, calls = self._ranked_in_list_calls(name, members, **kwargs)
+        return self._ranked_in_list_results(members, 
+            script.call_many(redis, calls), 
+            **kwargs)
+
+    def _ranked_in_list_calls(self, name, members, **kwargs):
+        # The script and its (keys, args) calls, one per chunk_size members;
+        #  none if neither ranks nor scores are asked for.
+        with_rank, with_scores, use_zero_index_for_rank = \
+            self._conform_request_options(**kwargs)
+        chunk_size = kwargs.get('chunk_size', DEFAULT_CHUNK_SIZE)
+        ranking = self._conform_ranking(**kwargs)
+        if ranking == 'ordinal':
+            script, keys = scripts.RANKED_IN_LIST, [name]
+        else:
+            script, keys = (scripts.RANKED_WITH_TIES, 
+                [name, self._higher_key(name, ranking)])
         if not (with_rank or with_scores):
-            return results
+            return script, []
+        return script, [(keys, members[i:i + chunk_size]) 
+            for i in range(0, len(members), chunk_size)]
+
+    def _ranked_in_list_results(self, members, replies, **kwargs):
+        with_rank, with_scores, use_zero_index_for_rank = \
+            self._conform_request_options(**kwargs)
+        columnar = kwargs.get('columnar', 
+            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['columnar'])
+        if not (with_rank or with_scores):
+            return self._results(members, columnar=columnar)
 
         responses = []
-        if with_rank and with_scores:
-            step = 2
-            def process_result(i, rank, score):
-                results[i]['rank'] = self._conform_rank(rank, 
-                    use_zero_index_for_rank)
-                results[i]['score'] = score
-        elif with_rank:
-            step = 1
-            def process_result(i, rank):
-                results[i]['rank'] = self._conform_rank(rank, 
-                    use_zero_index_for_rank)
-        else: # with_score
-            step = 1
-            def process_result(i, score):
-                results[i]['score'] = score
+        for reply in replies:
+            responses.extend(reply)
+        ranks = responses[0::2]
+        scores = [score if score is None else float(score) 
+            for score in responses[1::2]]
 
-        with self.redis.pipeline() as pipe:
-            for member in members:
-                if with_rank:
-                    pipe.zrevrank(name, member)
-                if with_scores:
-                    pipe.zscore(name, member)
-            responses = pipe.execute()
-            for i in range(len(results)):
-                process_result(i, *responses[i*step:(i+1)*step])
-        return results
+        if kwargs.get('sort_by_rank', False):
+            members, ranks, scores = self._sorted_by_rank(members, 
+                ranks, 
+                scores)
+        if with_rank:
+            ranks = [self._conform_rank(rank, use_zero_index_for_rank) 
+                for rank in ranks]
+        else:
+            ranks = None
+        if not with_scores:
+            scores = None
+        return self._results(members, ranks, scores, columnar)
+
+    def _sorted_by_rank(self, members, ranks, scores):
+        order = sorted(range(len(members)), 
+            key=lambda i: (ranks[i] is None, ranks[i] or 0))
+        return ([members[i] for i in order], 
+            [ranks[i] for i in order], 
+            [scores[i] for i in order])
     
     # Merge leaderboards given by keys with this leaderboard into destination
     def merge_leaderboards(self, destination, keys, aggregate="sum"):
-        return self.redis.zunionstore(destination, 
+        total = self.redis.zunionstore(destination, 
             keys + [self.name], aggregate)
+        if self.indexed:
+            self.rebuild_indexes_in(destination)
+        self._invalidate(destination)
+        return total
   
       # Intersect leaderboards given by keys with this leaderboard into destination
     def intersect_leaderboards(self, destination, keys, aggregate="sum"):
-        return self.redis.zinterstore(destination, 
+        total = self.redis.zinterstore(destination, 
             keys + [self.name], aggregate)
+        if self.indexed:
+            self.rebuild_indexes_in(destination)
+        self._invalidate(destination)
+        return total
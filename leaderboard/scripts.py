@@ -0,0 +1,516 @@
+"""
+  Server-side Lua for compound leaderboard operations.
+
+  Each Script caches its SHA1 and is run with EVALSHA; if the server 
+    doesn't know the script yet (fresh server, SCRIPT FLUSH), it falls back 
+    to EVAL, which also loads it for next time.
+  Lua numbers are truncated to integers on the way out of redis, so scores 
+    are always returned as strings and converted on the python side.
+"""
+import hashlib
+
+from redis.exceptions import ResponseError
+
+class Script(object):
+    def __init__(self, source):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def __call__(self, redis, keys=(), args=()):
+        keys_and_args = list(keys) + list(args)
+        try:
+            return redis.execute_command('EVALSHA', 
+                self.sha, 
+                len(keys), 
+                *keys_and_args)
+        except ResponseError as e:
+            if not _is_noscript(e):
+                raise
+        return redis.execute_command('EVAL', 
+            self.source, 
+            len(keys), 
+            *keys_and_args)
+
+    def load(self, redis):
+        # Pipelines can't recover from NOSCRIPT mid-batch; load first.
+        return redis.execute_command('SCRIPT', 'LOAD', self.source)
+
+    def call_many(self, redis, calls, transaction=False):
+        """
+        Runs the script once per (keys, args) in calls, returning the replies
+          in order.  The first call goes out alone so a missing script gets
+          loaded; the rest share one pipeline.
+        With transaction=True they all go out in one MULTI/EXEC instead, 
+          behind a SCRIPT LOAD in the same transaction, so either every 
+          call runs or none does.
+        """
+        calls = list(calls)
+        if not calls:
+            return []
+        if transaction:
+            with redis.pipeline(transaction=True) as pipe:
+                pipe.script_load(self.source)
+                for keys, args in calls:
+                    pipe.execute_command('EVALSHA', 
+                        self.sha, 
+                        len(keys), 
+                        *(list(keys) + list(args)))
+                return pipe.execute()[1:]
+        replies = [self(redis, *calls[0])]
+        if len(calls) == 1:
+            return replies
+        with redis.pipeline(transaction=False) as pipe:
+            for keys, args in calls[1:]:
+                pipe.execute_command('EVALSHA', 
+                    self.sha, 
+                    len(keys), 
+                    *(list(keys) + list(args)))
+            return replies + pipe.execute()
+
+def _is_noscript(error):
+    message = str(error)
+    return (message.startswith('NOSCRIPT') or 
+        'No matching script' in message)
+
+# KEYS[1] board; ARGV[1] member, ARGV[2] delta, ARGV[3] floor.
+# Returns {applied, score}; the change is refused if it would leave the 
+#  member below floor.
+CHANGE_SCORE_WITH_FLOOR = Script("""
+local new_score = tonumber(redis.call('ZSCORE', KEYS[1], ARGV[1]) or 0) + 
+    tonumber(ARGV[2])
+if new_score < tonumber(ARGV[3]) then
+    return {0, tostring(new_score)}
+end
+return {1, redis.call('ZINCRBY', KEYS[1], ARGV[2], ARGV[1])}
+""")
+
+# KEYS[1] board; ARGV[1] member.  Returns {score, zero-based reverse rank}.
+SCORE_AND_RANK = Script("""
+return {redis.call('ZSCORE', KEYS[1], ARGV[1]), 
+    redis.call('ZREVRANK', KEYS[1], ARGV[1])}
+""")
+
+# KEYS[1] board; ARGV members.  Returns {rank, score, rank, score, ...} in
+#  member order, with nil for members that aren't ranked.
+RANKED_IN_LIST = Script("""
+local results = {}
+for i, member in ipairs(ARGV) do
+    results[2*i - 1] = redis.call('ZREVRANK', KEYS[1], member)
+    results[2*i] = redis.call('ZSCORE', KEYS[1], member)
+end
+return results
+""")
+
+# KEYS[1] board; ARGV[1] member, ARGV[2] score.  Returns 1 if the score 
+#  was written, 0 if the member already had an equal or higher score.
+RANK_MEMBER_IF_HIGHER = Script("""
+local current = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if current and tonumber(current) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+return 1
+""")
+
+# Board indexes, kept in step by INDEXED_WRITE and REMOVE_RANGE_INDEXED:
+#  the dense index, a sorted set of the distinct scores (each member being 
+#  the score as ZSCORE formats it), and the bucket counts, a hash of 
+#  floor(score / width) -> members in that bucket.
+# All of them take KEYS[1] board, KEYS[2] dense index, KEYS[3] bucket 
+#  counts, and ARGV[3] '1' to keep the dense index, ARGV[4] bucket width 
+#  ('' for no bucket counts).
+
+# KEYS[4] rank change feed.  ARGV[1] mode ('set', 'set_if_higher', 'incr' 
+#  or 'remove'), ARGV[2] floor for 'incr' ('' for none), ARGV[5] members to 
+#  trim the board down to afterwards ('' to leave it), ARGV[6] '1' to 
+#  return the trimmed members, ARGV[7] length to cap the feed at ('' for 
+#  no feed), then member, value pairs from ARGV[8] on.
+# A score joins the dense index when written, and leaves once ZCOUNT says 
+#  no member holds it any more.
+# Writes (and trims) that move a member's rank XADD {m member, o old rank, 
+#  n new rank, s score} to the feed, ranks zero-based and '' when unranked.
+# Returns {{applied, score, ...}, {trimmed member, ...}}; applied is 
+#  ZADD/ZREM's count for 'set' and 'remove', else 1 if written; score is 
+#  the new (or refused) score.
+INDEXED_WRITE = Script("""
+local mode, floor = ARGV[1], tonumber(ARGV[2])
+local dense, width = ARGV[3] == '1', tonumber(ARGV[4])
+local max_members, report = tonumber(ARGV[5]), ARGV[6] == '1'
+local feed_length = tonumber(ARGV[7])
+local function bucket(score)
+    return tostring(math.floor(tonumber(score) / width))
+end
+local function uncount(score)
+    if redis.call('HINCRBY', KEYS[3], bucket(score), -1) <= 0 then
+        redis.call('HDEL', KEYS[3], bucket(score))
+    end
+end
+local function feed(member, old_rank, new_rank, score)
+    redis.call('XADD', KEYS[4], 'MAXLEN', '~', feed_length, '*', 
+        'm', member, 'o', old_rank or '', 'n', new_rank or '', 
+        's', score or '')
+end
+local results = {}
+for i = 8, #ARGV, 2 do
+    local member, value = ARGV[i], ARGV[i + 1]
+    local old = redis.call('ZSCORE', KEYS[1], member)
+    local old_rank = feed_length and redis.call('ZREVRANK', KEYS[1], member)
+    local applied, written, new = 1, true, old
+    if mode == 'set' then
+        applied = redis.call('ZADD', KEYS[1], value, member)
+        new = redis.call('ZSCORE', KEYS[1], member)
+    elseif mode == 'set_if_higher' then
+        if old and tonumber(old) >= tonumber(value) then
+            applied, written = 0, false
+        else
+            redis.call('ZADD', KEYS[1], value, member)
+            new = redis.call('ZSCORE', KEYS[1], member)
+        end
+    elseif mode == 'incr' then
+        local wanted = tonumber(old or 0) + tonumber(value)
+        if floor and wanted < floor then
+            applied, written, new = 0, false, tostring(wanted)
+        else
+            new = redis.call('ZINCRBY', KEYS[1], value, member)
+        end
+    else
+        applied = redis.call('ZREM', KEYS[1], member)
+        new = false
+    end
+    if written and dense then
+        if old and old ~= new and 
+            redis.call('ZCOUNT', KEYS[1], old, old) == 0 then
+            redis.call('ZREM', KEYS[2], old)
+        end
+        if new then
+            redis.call('ZADD', KEYS[2], new, new)
+        end
+    end
+    if written and width then
+        if old then
+            uncount(old)
+        end
+        if new then
+            redis.call('HINCRBY', KEYS[3], bucket(new), 1)
+        end
+    end
+    if written and feed_length then
+        local new_rank = redis.call('ZREVRANK', KEYS[1], member)
+        if new_rank ~= old_rank then
+            feed(member, old_rank, new_rank, new)
+        end
+    end
+    results[i - 7] = applied
+    results[i - 6] = new
+end
+local trimmed = {}
+local excess = max_members and redis.call('ZCARD', KEYS[1]) - max_members
+if excess and excess > 0 then
+    local rows = {}
+    if dense or width or report or feed_length then
+        rows = redis.call('ZRANGE', KEYS[1], 0, excess - 1, 'WITHSCORES')
+    end
+    local total = redis.call('ZCARD', KEYS[1])
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, excess - 1)
+    for i = 1, #rows, 2 do
+        local score = rows[i + 1]
+        if dense and redis.call('ZCOUNT', KEYS[1], score, score) == 0 then
+            redis.call('ZREM', KEYS[2], score)
+        end
+        if width then
+            uncount(score)
+        end
+        if report then
+            trimmed[#trimmed + 1] = rows[i]
+        end
+        if feed_length then
+            feed(rows[i], total - 1 - (i - 1) / 2, false, false)
+        end
+    end
+end
+return {results, trimmed}
+""")
+
+# ARGV[1] min, ARGV[2] max.  Removes the members (and so every distinct 
+#  score) in the range; returns the number of members removed.
+REMOVE_RANGE_INDEXED = Script("""
+local dense, width = ARGV[3] == '1', tonumber(ARGV[4])
+if width then
+    local rows = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[2], 
+        'WITHSCORES')
+    for i = 2, #rows, 2 do
+        local field = tostring(math.floor(tonumber(rows[i]) / width))
+        if redis.call('HINCRBY', KEYS[3], field, -1) <= 0 then
+            redis.call('HDEL', KEYS[3], field)
+        end
+    end
+end
+local removed = redis.call('ZREMRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[2])
+if dense then
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], ARGV[1], ARGV[2])
+end
+return removed
+""")
+
+# ARGV[1] start, ARGV[2] stop.  Adds the members at ranks start..stop 
+#  (ascending) to the indexes; returns how many members it read.
+ADD_TO_INDEXES = Script("""
+local dense, width = ARGV[3] == '1', tonumber(ARGV[4])
+local rows = redis.call('ZRANGE', KEYS[1], ARGV[1], ARGV[2], 'WITHSCORES')
+for i = 2, #rows, 2 do
+    if dense then
+        redis.call('ZADD', KEYS[2], rows[i], rows[i])
+    end
+    if width then
+        redis.call('HINCRBY', KEYS[3], 
+            tostring(math.floor(tonumber(rows[i]) / width)), 1)
+    end
+end
+return #rows / 2
+""")
+
+# KEYS[1] board, KEYS[2] the set to count higher scores in: the board 
+#  itself for competition ranks, its dense index for dense ranks.  
+#  ARGV members.  Returns {higher, score, higher, score, ...} like 
+#  RANKED_IN_LIST, where higher (the zero-based rank) is the number of 
+#  members or distinct scores above the member's score.
+RANKED_WITH_TIES = Script("""
+local results = {}
+for i, member in ipairs(ARGV) do
+    local score = redis.call('ZSCORE', KEYS[1], member)
+    if score then
+        results[2*i - 1] = redis.call('ZCOUNT', KEYS[2], '(' .. score, '+inf')
+    else
+        results[2*i - 1] = false
+    end
+    results[2*i] = score
+end
+return results
+""")
+
+# KEYS[1] board, KEYS[2] the set to count higher scores in (as for 
+#  RANKED_WITH_TIES).  ARGV[1] member, ARGV[2] page size, ARGV[3] '1' to 
+#  count the first row's tied rank.  Returns {starting offset, first row's 
+#  tied rank (or nil), {member, score, ...}} for the page_size rows from 
+#  half a page above the member (clamped to the top, and moved up near the 
+#  bottom so the page stays full), or nil if the member isn't ranked.
+AROUND_ME = Script("""
+local rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+if not rank then
+    return false
+end
+local page_size = tonumber(ARGV[2])
+local start = math.min(rank - math.floor(page_size / 2), 
+    redis.call('ZCARD', KEYS[1]) - page_size)
+start = math.max(start, 0)
+local rows = redis.call('ZREVRANGE', KEYS[1], start, start + page_size - 1, 
+    'WITHSCORES')
+local first = false
+if ARGV[3] == '1' then
+    first = redis.call('ZCOUNT', KEYS[2], '(' .. rows[2], '+inf')
+end
+return {start, first, rows}
+""")
+
+# KEYS[1] board; ARGV[1] member.  Returns {board size, members scoring 
+#  strictly lower}, or nil if the member isn't ranked.
+PERCENTILE_FOR = Script("""
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not score then
+    return false
+end
+return {redis.call('ZCARD', KEYS[1]), 
+    redis.call('ZCOUNT', KEYS[1], '-inf', '(' .. score)}
+""")
+
+# KEYS[1] board; ARGV[1] percentile (0-100).  Returns the nearest-rank 
+#  score at that percentile, counting from the lowest, or nil if empty.
+SCORE_AT_PERCENTILE = Script("""
+local total = redis.call('ZCARD', KEYS[1])
+if total == 0 then
+    return false
+end
+local index = math.max(math.ceil(tonumber(ARGV[1]) / 100 * total) - 1, 0)
+return redis.call('ZRANGE', KEYS[1], index, index, 'WITHSCORES')[2]
+""")
+
+# Where (score, member) falls in a board's ZREVRANGE order, whether or not 
+#  the member is there: ties sit in descending member order, so a member 
+#  that isn't in the tie group is placed in it by bisection.  Members are 
+#  compared bytewise, as redis orders them; Lua's < goes by the locale.
+_POSITION = """
+local function before(a, b)
+    for i = 1, math.min(#a, #b) do
+        local x, y = string.byte(a, i), string.byte(b, i)
+        if x ~= y then
+            return x < y
+        end
+    end
+    return #a < #b
+end
+local function position(score, member)
+    -- The number of members ordered ahead of (score, member), and whether 
+    --  the member is there with that score.
+    local low = redis.call('ZCOUNT', KEYS[1], '(' .. score, '+inf')
+    local high = redis.call('ZCOUNT', KEYS[1], score, '+inf')
+    local rank = redis.call('ZREVRANK', KEYS[1], member)
+    if rank and rank >= low and rank < high then
+        return rank, true
+    end
+    while low < high do
+        local mid = math.floor((low + high) / 2)
+        if before(redis.call('ZREVRANGE', KEYS[1], mid, mid)[1], member) then
+            high = mid
+        else
+            low = mid + 1
+        end
+    end
+    return low, false
+end
+"""
+
+# KEYS[1] board; ARGV[1] score, ARGV[2] member, ARGV[3] count.  Returns 
+#  {member, score, ...} for the count rows after (score, member) in 
+#  ZREVRANGE order, so a walk's cursor holds even if its member has moved.
+RANGE_AFTER = Script(_POSITION + """
+local low, present = position(ARGV[1], ARGV[2])
+if present then
+    low = low + 1
+end
+return redis.call('ZREVRANGE', KEYS[1], low, low + tonumber(ARGV[3]) - 1, 
+    'WITHSCORES')
+""")
+
+# Sharded boards (see sharded.py) run these on every shard.
+# KEYS[1] board; ARGV score, member pairs.  Returns, for each pair, the 
+#  number of this shard's members ordered ahead of it.
+ORDERED_AHEAD = Script(_POSITION + """
+local results = {}
+for i = 1, #ARGV, 2 do
+    results[#results + 1] = (position(ARGV[i], ARGV[i + 1]))
+end
+return results
+""")
+
+# KEYS[1] board; ARGV[1] score, ARGV[2] member, ARGV[3] count.  Returns 
+#  {members ordered ahead, {member, score, ...} for up to count rows just 
+#  ahead, the same for up to count rows just behind}, leaving the member 
+#  itself out.
+NEIGHBOURS = Script(_POSITION + """
+local ahead, present = position(ARGV[1], ARGV[2])
+local count = tonumber(ARGV[3])
+local behind = ahead
+if present then
+    behind = ahead + 1
+end
+local above, below = {}, {}
+if count > 0 then
+    if ahead > 0 then
+        above = redis.call('ZREVRANGE', KEYS[1], math.max(ahead - count, 0), 
+            ahead - 1, 'WITHSCORES')
+    end
+    below = redis.call('ZREVRANGE', KEYS[1], behind, behind + count - 1, 
+        'WITHSCORES')
+end
+return {ahead, above, below}
+""")
+
+# Aggregate boards (see aggregate.py) take KEYS[1] the aggregate, KEYS[2] 
+#  the source written to, KEYS[3] on every source, in order, and ARGV[1] 
+#  'sum', 'max' or 'min'.  After the source write, each member touched has 
+#  its aggregate score recomputed from the sources (sums by ZINCRBY, in 
+#  source order, so redis does the float math), or leaves the aggregate 
+#  once no source ranks it.  ZUNIONSTORE adds the sources up smallest 
+#  first, so its sums can differ from these in the last bits.
+_AGGREGATE_MEMBER = """
+local function better(score, best)
+    if ARGV[1] == 'max' then
+        return tonumber(score) > tonumber(best)
+    end
+    return tonumber(score) < tonumber(best)
+end
+local function aggregate_member(member)
+    local best = false
+    if ARGV[1] == 'sum' then
+        redis.call('ZREM', KEYS[1], member)
+    end
+    for j = 3, #KEYS do
+        local score = redis.call('ZSCORE', KEYS[j], member)
+        if score and ARGV[1] == 'sum' then
+            redis.call('ZINCRBY', KEYS[1], score, member)
+        elseif score and (not best or better(score, best)) then
+            best = score
+        end
+    end
+    if ARGV[1] ~= 'sum' then
+        if best then
+            redis.call('ZADD', KEYS[1], best, member)
+        else
+            redis.call('ZREM', KEYS[1], member)
+        end
+    end
+end
+"""
+
+# ARGV[2] mode ('set', 'set_if_higher', 'incr' or 'remove'), ARGV[3] 
+#  floor for 'incr' ('' for none), then member, value pairs from ARGV[4] 
+#  on.  Returns {applied, score, ...} as INDEXED_WRITE does, score being 
+#  the member's new (or refused) score in the source.
+AGGREGATE_WRITE = Script(_AGGREGATE_MEMBER + """
+local mode, floor = ARGV[2], tonumber(ARGV[3])
+local results = {}
+for i = 4, #ARGV, 2 do
+    local member, value = ARGV[i], ARGV[i + 1]
+    local old = redis.call('ZSCORE', KEYS[2], member)
+    local applied, new = 1, old
+    if mode == 'set' then
+        applied = redis.call('ZADD', KEYS[2], value, member)
+        new = redis.call('ZSCORE', KEYS[2], member)
+    elseif mode == 'set_if_higher' then
+        if old and tonumber(old) >= tonumber(value) then
+            applied = 0
+        else
+            redis.call('ZADD', KEYS[2], value, member)
+            new = redis.call('ZSCORE', KEYS[2], member)
+        end
+    elseif mode == 'incr' then
+        local wanted = tonumber(old or 0) + tonumber(value)
+        if floor and wanted < floor then
+            applied, new = 0, tostring(wanted)
+        else
+            new = redis.call('ZINCRBY', KEYS[2], value, member)
+        end
+    else
+        applied = redis.call('ZREM', KEYS[2], member)
+        new = false
+    end
+    if applied ~= 0 or mode == 'set' then
+        aggregate_member(member)
+    end
+    results[i - 3] = applied
+    results[i - 2] = new
+end
+return results
+""")
+
+# ARGV[2] min, ARGV[3] max.  Removes the source's members in the score 
+#  range; returns how many.
+AGGREGATE_REMOVE_RANGE = Script(_AGGREGATE_MEMBER + """
+local members = redis.call('ZRANGEBYSCORE', KEYS[2], ARGV[2], ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], ARGV[2], ARGV[3])
+for i, member in ipairs(members) do
+    aggregate_member(member)
+end
+return #members
+""")
+
+# Snapshots (see snapshot.py): KEYS[1] a lease, ARGV[1] the token it was 
+#  taken with.  Deletes the lease only if it still holds that token, so a 
+#  rebuild that outlived its lease doesn't release the next one's; returns 
+#  1 if it did.
+RELEASE_LEASE = Script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
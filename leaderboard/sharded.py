@@ -0,0 +1,697 @@
+"""
+  A leaderboard whose members are spread over several redis nodes.
+
+  Each member lives on exactly one shard (crc32 of the member, mod the number
+    of shards), so single-member writes and lookups go to one node, and
+    ZUNIONSTORE/ZINTERSTORE can run shard by shard for boards sharing the
+    same layout.  Queries that need the whole board are scattered to every
+    shard in parallel and gathered here:
+      * rank: the members ordered ahead of (score, member) on every shard,
+          from one script per shard that counts the higher scores and
+          places the member among its ties by bisection (ZREVRANGE orders
+          ties by member, descending), without reading the tie group.
+      * leaders: the first page is a k-way merge of each shard's top rows.
+          Deeper pages first find the score at their first rank by
+          bisecting the score range with ZCOUNTs, then merge what each
+          shard holds from that score down, so a page costs about the same
+          wherever it is.
+      * around_me: each shard's nearest neighbours of (score, member),
+          merged.
+      * score_at_percentile: the same score bisection.
+      * iter_all (and so dump): a lazy merge of every shard's own walk.
+
+  Same API as port.Leaderboard; pass the shard connections in order (the
+    order is part of the layout):
+
+      ShardedLeaderboard('highscores', [Redis(port=6379), Redis(port=6380)])
+"""
+from __future__ import division
+import heapq
+import math
+import struct
+import threading
+import zlib
+
+from itertools import islice
+
+from .port import (Leaderboard as PortLeaderboard,
+    LeaderEntry,
+    _native,
+    _zadd,
+    DEFAULT_LEADERBOARD_REQUEST_OPTIONS,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_FEED_BLOCK,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CHUNKS_PER_PIPELINE,
+    DEFAULT_HISTOGRAM_BINS)
+from . import dumpfile
+from . import scripts
+
+_text = type(u'')
+
+def _scatter(calls):
+    """
+    Run each zero-arg callable on its own thread; results come back in
+      order and the first exception is re-raised.
+    """
+    if len(calls) == 1:
+        return [calls[0]()]
+
+    results = [None] * len(calls)
+    errors = []
+    def run(i, call):
+        try:
+            results[i] = call()
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=run, args=(i, call))
+        for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+class _Descending(object):
+    # heapq.merge only merges ascending; order (member, score) pairs the
+    #  way ZREVRANGE does: score, then member, both descending.
+    __slots__ = ('item',)
+    def __init__(self, item):
+        self.item = item
+    def __lt__(self, other):
+        return ((self.item[1], self.item[0]) >
+            (other.item[1], other.item[0]))
+
+def _merge_descending(shard_rows):
+    # Lazy, so the rows may be iterators too.
+    return (wrapped.item for wrapped in heapq.merge(
+        *[(_Descending(item) for item in rows) for rows in shard_rows]))
+
+def _rows(reply):
+    # Script replies carry {member, score, ...}.
+    return [(member, float(score))
+        for member, score in zip(reply[0::2], reply[1::2])]
+
+_MAGNITUDE = (1 << 63) - 1
+
+def _float_key(score):
+    # Doubles as integers in the same order, to bisect between two scores.
+    bits, = struct.unpack('>Q', struct.pack('>d', score))
+    if bits >> 63:
+        return -(bits & _MAGNITUDE)
+    return bits
+
+def _key_float(key):
+    if key < 0:
+        key = -key | (1 << 63)
+    return struct.unpack('>d', struct.pack('>Q', key))[0]
+
+def _midpoint(low, high):
+    # A score in [low, high), halfway through the doubles between them.
+    return _key_float((_float_key(low) + _float_key(high)) // 2)
+
+class ShardedBatch(object):
+    """
+    Batch for sharded boards: the same calls, queued and then run together
+      by execute(), each on its own thread.  There is no pipeline that
+      spans shards, so this saves waiting on the calls one after another
+      rather than round trips.
+    """
+    def __init__(self, leaderboard):
+        self.leaderboard = leaderboard
+        self.calls = []
+        self.results = None
+
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.calls = []
+
+    def _queue(self, method, *args, **kwargs):
+        self.calls.append(lambda: method(*args, **kwargs))
+        return self
+
+    def rank_for_in(self, name, member, use_zero_index_for_rank=False):
+        return self._queue(self.leaderboard.rank_for_in, name, member,
+            use_zero_index_for_rank=use_zero_index_for_rank)
+
+    def score_for_in(self, name, member):
+        return self._queue(self.leaderboard.score_for_in, name, member)
+
+    def check_member_in(self, name, member):
+        return self._queue(self.leaderboard.check_member_in, name, member)
+
+    def score_and_rank_for_in(self, name, member,
+        use_zero_index_for_rank=False):
+        return self._queue(self.leaderboard.score_and_rank_for_in, name,
+            member,
+            use_zero_index_for_rank=use_zero_index_for_rank)
+
+    def total_members_in(self, name):
+        return self._queue(self.leaderboard.total_members_in, name)
+
+    def total_pages_in(self, name, page_size=None):
+        return self._queue(self.leaderboard.total_pages_in, name, page_size)
+
+    def total_members_in_score_range_in(self, name, min_score, max_score):
+        return self._queue(self.leaderboard.total_members_in_score_range_in,
+            name,
+            min_score,
+            max_score)
+
+    def leaders_in(self, name, current_page=None, **kwargs):
+        return self._queue(self.leaderboard.leaders_in, name, current_page,
+            **kwargs)
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        self.results = _scatter(calls) if calls else []
+        return self.results
+
+class ShardedLeaderboard(PortLeaderboard):
+    def __init__(self, name, connections,
+        page_size=DEFAULT_PAGE_SIZE):
+        if not connections:
+            raise ValueError("ShardedLeaderboard needs at least one shard")
+        # Distinct scores can't be summed across shards, so no
+        #  ranking='dense' (nor any other index, cap or feed) here.  Shards
+        #  read from their own connections; consistency= is accepted for
+        #  API compatibility and ignored.
+        super(ShardedLeaderboard, self).__init__(name,
+            page_size,
+            redis=connections[0])
+        # Everything goes through the shards; a path that didn't would fail
+        #  here rather than quietly read or write the first one.
+        self.redis = None
+
+        self.shards = [PortLeaderboard(name, page_size, redis=connection)
+            for connection in connections]
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+
+    def shard_for(self, member):
+        # Hashes the bytes redis stores; str() only for non-text members, 
+        #  since on python 2 it can't take non-ASCII unicode.
+        if not isinstance(member, bytes):
+            if not isinstance(member, _text):
+                member = str(member)
+            member = member.encode('utf-8')
+        return self.shards[
+            (zlib.crc32(member) & 0xffffffff) % len(self.shards)]
+
+    def _scatter_pipelines(self, queue):
+        """
+        queue(pipe) adds commands to each shard's pipeline; returns every
+          shard's responses.
+        """
+        def run(shard):
+            def execute():
+                with shard.redis.pipeline() as pipe:
+                    queue(pipe)
+                    return pipe.execute()
+            return execute
+        return _scatter([run(shard) for shard in self.shards])
+
+    def delete_leaderboard_named(self, name):
+        _scatter([lambda shard=shard: shard.delete_leaderboard_named(name)
+            for shard in self.shards])
+
+    def rank_member_in(self, name, member, score):
+        self.shard_for(member).rank_member_in(name, member, score)
+
+    def rank_member_if_higher_in(self, name, member, score):
+        return self.shard_for(member).rank_member_if_higher_in(name,
+            member,
+            score)
+
+    def rank_members_in(self, name, members_and_scores,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE):
+        if chunk_size < 1:
+            chunk_size = DEFAULT_CHUNK_SIZE
+
+        counts = []
+        pairs = iter(members_and_scores)
+        batch_size = chunk_size * chunks_per_pipeline * len(self.shards)
+        while True:
+            batch = list(islice(pairs, batch_size))
+            if not batch:
+                break
+            by_shard = dict((id(shard), []) for shard in self.shards)
+            for member, score in batch:
+                by_shard[id(self.shard_for(member))].append((member, score))
+            for shard_counts in _scatter([
+                lambda shard=shard: shard.rank_members_in(name,
+                    by_shard[id(shard)],
+                    chunk_size=chunk_size,
+                    chunks_per_pipeline=chunks_per_pipeline)
+                for shard in self.shards]):
+                counts.extend(shard_counts)
+        return counts
+
+    def remove_member_from(self, name, member):
+        self.shard_for(member).remove_member_from(name, member)
+
+    def total_members_in(self, name, consistency=None):
+        return sum(_scatter([lambda shard=shard: shard.total_members_in(name)
+            for shard in self.shards]))
+
+    def total_members_in_score_range_in(self, name, min_score, max_score,
+        consistency=None):
+        return sum(_scatter([
+            lambda shard=shard: shard.total_members_in_score_range_in(name,
+                min_score,
+                max_score)
+            for shard in self.shards]))
+
+    def percentile_for_in(self, name, member, consistency=None):
+        score = self.score_for_in(name, member)
+        if score is None:
+            return None
+        def queue(pipe):
+            pipe.zcard(name)
+            pipe.zcount(name, '-inf', '(%r' % score)
+        responses = self._scatter_pipelines(queue)
+        total = sum(total for total, below in responses)
+        return 100 * sum(below for total, below in responses) / total
+
+    def score_at_percentile_in(self, name, percentile, consistency=None):
+        if not 0 <= percentile <= 100:
+            raise ValueError("percentile must be between 0 and 100")
+        total = self.total_members_in(name)
+        if not total:
+            return None
+        index = max(int(math.ceil(percentile / 100 * total)) - 1, 0)
+        score, below, ties = self._score_at(name, index)
+        return score
+
+    def _score_at(self, name, index):
+        """
+        The score of the member index places from the bottom of the whole
+          board (0 is the lowest), with the number of members scoring lower
+          and the number scoring the same, as (score, below, ties).
+        Bisects the score range with ZCOUNTs, every shard sending a count
+          and at most two rows per step.  Each step halves the doubles
+          left in range, so there are at most 64 of them, and the search
+          stops as soon as one score is left.
+        """
+        def ends(pipe):
+            pipe.zcard(name)
+            pipe.zrange(name, 0, 0, withscores=True)
+            pipe.zrevrange(name, 0, 0, True)
+        responses = self._scatter_pipelines(ends)
+        within = sum(total for total, lowest, highest in responses)
+        low = min(lowest[0][1] for total, lowest, highest in responses
+            if lowest)
+        high = max(highest[0][1] for total, lowest, highest in responses
+            if highest)
+        below = 0
+        while low < high:
+            mid = _midpoint(low, high)
+            def queue(pipe):
+                pipe.zcount(name, '%r' % low, '%r' % mid)
+                pipe.zrevrangebyscore(name, '%r' % mid, '%r' % low,
+                    start=0, num=1, withscores=True)
+                pipe.zrangebyscore(name, '(%r' % mid, '%r' % high,
+                    start=0, num=1, withscores=True)
+            responses = self._scatter_pipelines(queue)
+            counted = sum(count for count, under, over in responses)
+            if below + counted > index:
+                within = counted
+                high = max(under[0][1] for count, under, over in responses
+                    if under)
+            else:
+                below += counted
+                within -= counted
+                low = min(over[0][1] for count, under, over in responses
+                    if over)
+        return low, below, within
+
+    def histogram_in(self, name, bins=None, consistency=None):
+        if bins is None:
+            bins = DEFAULT_HISTOGRAM_BINS
+        edges = bins
+        if isinstance(bins, int):
+            def ends(pipe):
+                pipe.zrange(name, 0, 0, withscores=True)
+                pipe.zrevrange(name, 0, 0, True)
+            scores = [rows[0][1] for response in self._scatter_pipelines(ends)
+                for rows in response if rows]
+            if not scores:
+                return []
+            edges = self._bin_edges(bins, min(scores), max(scores))
+        responses = self._scatter_pipelines(
+            lambda pipe: self._queue_bin_counts(pipe, name, edges))
+        return self._bin_rows(edges, [sum(counts)
+            for counts in zip(*responses)])
+
+    def change_score_for_member_in(self, name, member, delta, floor=None):
+        return self.shard_for(member).change_score_for_member_in(name,
+            member,
+            delta,
+            floor=floor)
+
+    def change_scores_for_members_in(self, name, deltas, floor=None):
+        deltas = list(deltas)
+        by_shard = dict((id(shard), []) for shard in self.shards)
+        for i, (member, delta) in enumerate(deltas):
+            by_shard[id(self.shard_for(member))].append((i, member, delta))
+
+        scores = [None] * len(deltas)
+        shard_scores = _scatter([
+            lambda shard=shard: shard.change_scores_for_members_in(name,
+                [(member, delta)
+                    for i, member, delta in by_shard[id(shard)]],
+                floor=floor)
+            for shard in self.shards])
+        for shard, results in zip(self.shards, shard_scores):
+            for (i, member, delta), score in zip(by_shard[id(shard)],
+                results):
+                scores[i] = score
+        return scores
+
+    def score_for_in(self, name, member, consistency=None):
+        return self.shard_for(member).score_for_in(name, member)
+
+    def check_member_in(self, name, member, consistency=None):
+        return self.shard_for(member).check_member_in(name, member)
+
+    def _reverse_ranks_for_scores(self, name, members_and_scores,
+        ranking='ordinal'):
+        """
+        Zero-based global reverse ranks for (member, score) pairs, from one
+          pipeline per shard.  Members without a score get None.  Ordinal
+          ranks count the ties ordered ahead; competition ranks don't.
+        """
+        members_and_scores = list(members_and_scores)
+        ranked = [(member, score) for member, score in members_and_scores
+            if score is not None]
+        if not ranked:
+            return [None] * len(members_and_scores)
+        if ranking == 'ordinal':
+            args = []
+            for member, score in ranked:
+                args.extend([repr(score), member])
+            responses = _scatter([
+                lambda shard=shard: scripts.ORDERED_AHEAD(shard.redis,
+                    keys=[name],
+                    args=args)
+                for shard in self.shards])
+        else:
+            def queue(pipe):
+                for member, score in ranked:
+                    pipe.zcount(name, '(%r' % score, '+inf')
+            responses = self._scatter_pipelines(queue)
+
+        ranks = dict((member, sum(counts))
+            for (member, score), counts in zip(ranked, zip(*responses)))
+        return [ranks.get(member) for member, score in members_and_scores]
+
+    def batch(self):
+        return ShardedBatch(self)
+
+    def score_and_rank_across(self, names, member,
+        use_zero_index_for_rank=False):
+        return [self.score_and_rank_for_in(name,
+                member,
+                use_zero_index_for_rank=use_zero_index_for_rank)
+            for name in names]
+
+    def rank_for_in(self, name, member, use_zero_index_for_rank=False,
+        consistency=None, ranking='ordinal'):
+        ranking = self._conform_ranking(ranking=ranking)
+        score = self.score_for_in(name, member)
+        rank, = self._reverse_ranks_for_scores(name, [(member, score)],
+            ranking)
+        return self._conform_rank(rank, use_zero_index_for_rank)
+
+    def score_and_rank_for_in(self, name, member,
+        use_zero_index_for_rank=False, consistency=None):
+        score = self.score_for_in(name, member)
+        rank, = self._reverse_ranks_for_scores(name, [(member, score)])
+        return LeaderEntry(member,
+            rank=self._conform_rank(rank, use_zero_index_for_rank),
+            score=score)
+
+    def remove_members_in_score_range_in(self, name, min_score, max_score):
+        return sum(_scatter([
+            lambda shard=shard: shard.remove_members_in_score_range_in(name,
+                min_score,
+                max_score)
+            for shard in self.shards]))
+
+    def leaders_in(self, name, current_page=None, **kwargs):
+        if current_page is None or current_page < 1:
+            current_page = 1
+
+        page_size = self._conform_page_size(**kwargs)
+        with_rank, with_scores, use_zero_index_for_rank = \
+            self._conform_request_options(**kwargs)
+        columnar = kwargs.get('columnar',
+            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['columnar'])
+        ranking = self._conform_ranking(**kwargs)
+
+        starting_offset = (current_page - 1) * page_size
+        total_members = None
+        if starting_offset:
+            total_members = self.total_members_in(name)
+            if starting_offset >= total_members and total_members:
+                total_pages = int(math.ceil(total_members / page_size))
+                starting_offset = (total_pages - 1) * page_size
+        page = self._range(name, starting_offset, page_size, total_members)
+        ranks = self._window_ranks(name, ranking, starting_offset, page)
+        if not with_scores:
+            page = [member for member, score in page]
+        return self._ranked_in_range(page,
+            starting_offset,
+            with_rank=with_rank,
+            with_scores=with_scores,
+            use_zero_index_for_rank=use_zero_index_for_rank,
+            columnar=columnar,
+            ranks=ranks)
+
+    def _range(self, name, start, count, total=None):
+        """
+        The (member, score) rows at global reverse ranks start to
+          start + count - 1, given the board's size (needed past the first
+          page).  There the score at start is found first (see _score_at)
+          and each shard reads from that score down, so only the ties
+          ordered ahead of start in its own tie group are read and skipped,
+          however deep the page.
+        """
+        skip, top = 0, '+inf'
+        if start:
+            if start >= total:
+                return []
+            score, below, ties = self._score_at(name, total - 1 - start)
+            skip = start - (total - below - ties)
+            top = '%r' % score
+        responses = self._scatter_pipelines(
+            lambda pipe: pipe.zrevrangebyscore(name, top, '-inf',
+                start=0, num=skip + count, withscores=True))
+        return list(islice(_merge_descending(
+            [rows for rows, in responses]), skip, skip + count))
+
+    def _window_ranks(self, name, ranking, starting_offset, window):
+        # Tied ranks for a contiguous (member, score) window; None (ranks
+        #  by offset) for ordinal ranking.
+        if ranking == 'ordinal' or not window:
+            return None
+        first, = self._reverse_ranks_for_scores(name, window[:1], ranking)
+        return self._tied_ranks(ranking,
+            starting_offset,
+            first,
+            [score for member, score in window])
+
+    def around_me_in(self, name, member, **kwargs):
+        columnar = kwargs.get('columnar',
+            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['columnar'])
+        score = self.score_for_in(name, member)
+        if score is None:
+            return self._results([], columnar=columnar)
+
+        page_size = self._conform_page_size(**kwargs)
+        with_rank, with_scores, use_zero_index_for_rank = \
+            self._conform_request_options(**kwargs)
+        ranking = self._conform_ranking(**kwargs)
+        half = int(page_size / 2)
+
+        # From each shard: how many are ordered ahead of the member, and
+        #  its nearest neighbours either side.
+        responses = _scatter([
+            lambda shard=shard: scripts.NEIGHBOURS(shard.redis,
+                keys=[name],
+                args=[repr(score), member, page_size - 1])
+            for shard in self.shards])
+
+        rank = 0
+        above, below = [], []
+        for ahead, nearest_above, nearest_below in responses:
+            rank += ahead
+            above.extend(_rows(nearest_above))
+            below.extend(_rows(nearest_below))
+
+        # Half a page above, or more near the bottom to keep the page full.
+        key = lambda item: (item[1], item[0])
+        below = sorted(below, key=key, reverse=True)[:page_size - 1]
+        above = sorted(above, key=key)[:min(rank,
+            max(half, page_size - 1 - len(below)))]
+        above.reverse()
+        window = (above + [(member, score)] + below)[:page_size]
+        starting_offset = rank - len(above)
+        ranks = self._window_ranks(name, ranking, starting_offset, window)
+
+        if not with_scores:
+            window = [item[0] for item in window]
+        return self._ranked_in_range(window,
+            starting_offset,
+            with_rank=with_rank,
+            with_scores=with_scores,
+            use_zero_index_for_rank=use_zero_index_for_rank,
+            columnar=columnar,
+            ranks=ranks)
+
+    def ranked_in_list_in(self, name, members, **kwargs):
+        with_rank, with_scores, use_zero_index_for_rank = \
+            self._conform_request_options(**kwargs)
+        columnar = kwargs.get('columnar',
+            DEFAULT_LEADERBOARD_REQUEST_OPTIONS['columnar'])
+        ranking = self._conform_ranking(**kwargs)
+        members = list(members)
+        if not (with_rank or with_scores):
+            return self._results(members, columnar=columnar)
+
+        by_shard = dict((id(shard), []) for shard in self.shards)
+        for i, member in enumerate(members):
+            by_shard[id(self.shard_for(member))].append((i, member))
+        def scores_for(shard):
+            def fetch():
+                with shard.redis.pipeline() as pipe:
+                    for i, member in by_shard[id(shard)]:
+                        pipe.zscore(name, member)
+                    return pipe.execute()
+            return fetch
+
+        scores = [None] * len(members)
+        for shard, shard_scores in zip(self.shards,
+            _scatter([scores_for(shard) for shard in self.shards])):
+            for (i, member), score in zip(by_shard[id(shard)], shard_scores):
+                scores[i] = score
+
+        sort_by_rank = kwargs.get('sort_by_rank', False)
+        ranks = None
+        if with_rank or sort_by_rank:
+            ranks = self._reverse_ranks_for_scores(name,
+                zip(members, scores),
+                ranking)
+        if sort_by_rank:
+            members, ranks, scores = self._sorted_by_rank(members,
+                ranks,
+                scores)
+        if with_rank:
+            ranks = [self._conform_rank(rank, use_zero_index_for_rank)
+                for rank in ranks]
+        else:
+            ranks = None
+        if not with_scores:
+            scores = None
+        return self._results(members, ranks, scores, columnar)
+
+    def merge_leaderboards(self, destination, keys, aggregate="sum"):
+        return sum(_scatter([
+            lambda shard=shard: shard.merge_leaderboards(destination,
+                keys,
+                aggregate)
+            for shard in self.shards]))
+
+    def intersect_leaderboards(self, destination, keys, aggregate="sum"):
+        return sum(_scatter([
+            lambda shard=shard: shard.intersect_leaderboards(destination,
+                keys,
+                aggregate)
+            for shard in self.shards]))
+
+    def iter_all_in(self, name, batch_size=DEFAULT_BATCH_SIZE,
+        with_scores=True, consistency=None):
+        """
+        As Leaderboard.iter_all_in, merging every shard's own walk lazily,
+          so a batch per shard is held at a time.
+        """
+        for member, score in _merge_descending([
+            shard.iter_all_in(name, batch_size=batch_size)
+            for shard in self.shards]):
+            if with_scores:
+                yield member, score
+            else:
+                yield member
+
+    def load_in(self, name, fileobj,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE):
+        """
+        As Leaderboard.load_in, each shard loading its members into a
+          temporary key that is then renamed over name.  That is one rename
+          per shard, so a reader can catch some shards loaded and others
+          not yet.
+        """
+        temp = "%s:load" % name
+        def delete_temps():
+            self._scatter_pipelines(lambda pipe: pipe.delete(temp))
+        delete_temps()
+        loaded = dict((id(shard), 0) for shard in self.shards)
+        batches = dumpfile.read(fileobj, chunk_size)
+        try:
+            while True:
+                chunk = list(islice(batches,
+                    chunks_per_pipeline * len(self.shards)))
+                if not chunk:
+                    break
+                by_shard = dict((id(shard), []) for shard in self.shards)
+                for batch in chunk:
+                    members = dict((id(shard), []) for shard in self.shards)
+                    for member, score in batch:
+                        member = _native(member)
+                        members[id(self.shard_for(member))].append(
+                            (member, score))
+                    for shard in self.shards:
+                        if members[id(shard)]:
+                            by_shard[id(shard)].append(members[id(shard)])
+                            loaded[id(shard)] += len(members[id(shard)])
+                def load(shard):
+                    def execute():
+                        with shard.redis.pipeline(transaction=False) as pipe:
+                            for members in by_shard[id(shard)]:
+                                _zadd(pipe, temp, members)
+                            pipe.execute()
+                    return execute
+                _scatter([load(shard) for shard in self.shards])
+        except Exception:
+            delete_temps()
+            raise
+
+        def swap(shard):
+            def execute():
+                with shard.redis.pipeline() as pipe:
+                    if loaded[id(shard)]:
+                        pipe.rename(temp, name)
+                    else:
+                        pipe.delete(name)
+                    pipe.execute()
+            return execute
+        _scatter([swap(shard) for shard in self.shards])
+        return sum(loaded.values())
+
+    def rebuild_indexes_in(self, name):
+        raise ValueError("Sharded boards keep no indexes")
+
+    def rank_changes_in(self, name, last_id='$', batch_size=DEFAULT_BATCH_SIZE,
+        block=DEFAULT_FEED_BLOCK, use_zero_index_for_rank=False):
+        raise ValueError("Sharded boards keep no rank change feed")
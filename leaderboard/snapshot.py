@@ -0,0 +1,203 @@
+"""
+  Materialized top-K snapshot, for serving the head of a board at high QPS.
+
+  Pass one to a Leaderboard to have leaders() pages that fall within the
+    top `size` rows served from the snapshot:
+
+    highscore_lb = Leaderboard('highscores', snapshot=TopSnapshot(100))
+
+  The snapshot is the top rows plus the board size, serialized with
+    anyjson.  By default it lives in this process, so a head-page read
+    costs no network at all; with shared=True it is a string key
+    (<board>:top) that every process reads with a single GET and whichever
+    notices it is stale rebuilds.
+
+  Snapshots older than max_age seconds are rebuilt on the next read, which
+    bounds staleness.  Only one reader at a time rebuilds (per process, or
+    per board with shared=True, by a SET NX lease on <board>:top:refresh
+    holding a token of its own, which only its holder may release);
+    the others keep serving the stale snapshot meanwhile, or read live when
+    there is none yet.  Writes made through the board drop the snapshot too
+    when refresh_on_write is set, and deleting the board always does.
+    start() rebuilds on a background thread every `interval` seconds
+    instead, so readers never wait on a rebuild; a failed rebuild is 
+    logged and tried again next interval.
+"""
+from __future__ import division
+import logging
+import math
+import threading
+import time
+import uuid
+
+from anyjson import loads, dumps
+
+from . import scripts
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_SIZE = 100
+DEFAULT_MAX_AGE = 1.0
+# Seconds a shared rebuild may hold its lease before another reader may
+#  try (if the rebuilding process died, say).
+DEFAULT_REFRESH_LEASE = 5
+
+class TopSnapshot(object):
+    def __init__(self,
+        size=DEFAULT_SNAPSHOT_SIZE,
+        max_age=DEFAULT_MAX_AGE,
+        shared=False,
+        refresh_on_write=False,
+        clock=time.time,
+        refresh_lease=DEFAULT_REFRESH_LEASE):
+        self.size = size
+        self.max_age = max_age
+        self.shared = shared
+        self.refresh_on_write = refresh_on_write
+        self.clock = clock
+        self.refresh_lease = refresh_lease
+
+        self._lock = threading.Lock()
+        # Board name -> (taken, total, rows), for in-process snapshots.
+        self._local = {}
+        # Board names being rebuilt by a reader in this process.
+        self._refreshing = set()
+        self._stop = None
+
+    def key_for(self, name):
+        return "%s:top" % name
+
+    def _lease_key(self, name):
+        return "%s:top:refresh" % name
+
+    def refresh(self, board, name=None):
+        """
+        Rebuilds the snapshot of name (default: the board's own) now.
+        """
+        if name is None:
+            name = board.name
+        def read(redis):
+            with redis.pipeline() as pipe:
+                pipe.zcard(name)
+                pipe.zrevrange(name, 0, self.size - 1, True)
+                return pipe.execute()
+        total, rows = board._read(name, None, read)
+        snapshot = (self.clock(), total,
+            [(member, score) for member, score in rows])
+        if self.shared:
+            board.redis.set(self.key_for(name), dumps(snapshot))
+        else:
+            with self._lock:
+                self._local[name] = snapshot
+        return snapshot
+
+    def _load(self, board, name):
+        if self.shared:
+            raw = board.redis.get(self.key_for(name))
+            if raw is None:
+                return None
+            return loads(raw)
+        with self._lock:
+            return self._local.get(name)
+
+    def rows(self, board, name, start, stop):
+        """
+        (total members, rows start..stop-1) from a fresh enough snapshot,
+          rebuilding it if need be; None when the slice isn't in it, or
+          there is no snapshot yet and another reader is building it.
+        """
+        snapshot = self._load(board, name)
+        if snapshot is None or self.clock() - snapshot[0] > self.max_age:
+            snapshot = self._refresh_once(board, name) or snapshot
+            if snapshot is None:
+                return None
+        taken, total, rows = snapshot
+        if stop > self.size and total > self.size:
+            return None
+        return total, rows[start:stop]
+
+    def _refresh_once(self, board, name):
+        # Rebuilds unless another reader already is; None if one is.
+        with self._lock:
+            if name in self._refreshing:
+                return None
+            self._refreshing.add(name)
+        try:
+            if not self.shared:
+                return self.refresh(board, name)
+            lease = self._lease_key(name)
+            token = uuid.uuid4().hex
+            if not board.redis.set(lease, token, 
+                px=int(self.refresh_lease * 1000), nx=True):
+                return None
+            try:
+                return self.refresh(board, name)
+            finally:
+                scripts.RELEASE_LEASE(board.redis, keys=[lease], args=[token])
+        finally:
+            with self._lock:
+                self._refreshing.discard(name)
+
+    def leaders(self, board, name, current_page, page_size):
+        """
+        (starting offset, (member, score) rows) for a leaders page, or None
+          if the page reaches past the snapshot.
+        """
+        starting_offset = (current_page - 1) * page_size
+        found = self.rows(board, name, starting_offset,
+            starting_offset + page_size)
+        if found is None:
+            return None
+        total, rows = found
+        if not rows and total:
+            # Past the end; clamp to the last page, as leaders() does.
+            starting_offset = (int(math.ceil(total / page_size)) - 1) * \
+                page_size
+            found = self.rows(board, name, starting_offset,
+                starting_offset + page_size)
+            if found is None:
+                return None
+            total, rows = found
+        return starting_offset, rows
+
+    def invalidate(self, board, name):
+        if self.refresh_on_write:
+            self.drop(board, name)
+
+    def drop(self, board, name):
+        """
+        Forgets the snapshot of name, as when the board is deleted.
+        """
+        if self.shared:
+            board.redis.delete(self.key_for(name))
+        else:
+            with self._lock:
+                self._local.pop(name, None)
+
+    def start(self, board, interval, names=None):
+        """
+        Rebuilds the snapshots of names (default: the board's own) every
+          interval seconds on a daemon thread, until stop().
+        """
+        if names is None:
+            names = [board.name]
+        self.stop()
+        stop = self._stop = threading.Event()
+        def run():
+            while not stop.is_set():
+                for name in names:
+                    # There is no caller to raise to from here.
+                    try:
+                        self.refresh(board, name)
+                    except Exception:
+                        log.exception("Snapshot of %s failed; retrying in "
+                            "%ss", name, interval)
+                stop.wait(interval)
+        refresher = threading.Thread(target=run)
+        refresher.daemon = True
+        refresher.start()
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
@@ -0,0 +1,211 @@
+"""
+  Daily/weekly (or any fixed-period) boards alongside the all-time board,
+    kept up to date by a single write.
+
+  The board's own name is the all-time board; each Window adds one bucket
+    key per period (name:daily:<period index>), which expires `retention`
+    seconds after its period ends.  rank_member(s)/change_score(s)_for 
+    write the all-time board and every current bucket in one pipeline, as 
+    plain ZADDs and ZINCRBYs, and remove_member removes from every bucket 
+    still kept; windowed boards keep no indexes, cap or feed.  Writers that 
+    would update one key only (the *_in ones, rank_member_if_higher and 
+    remove_members_in_score_range) raise NotImplementedError; load and 
+    delete_leaderboard still act on the all-time board alone.
+
+  Reads go through the usual *_in methods with a bucket key:
+
+      board = TimeWindowedLeaderboard('highscores')
+      board.leaders_in(board.key_for('daily'), 1)
+      board.leaders_in(board.rolling_key('daily', 7), 1)
+
+  Rolling windows ("last 7 days") are a ZUNIONSTORE of the recent buckets
+    into a short-lived key, which is reused until it expires rather than
+    recomputed per read.
+"""
+import time
+
+from itertools import islice
+
+from .port import (Leaderboard as PortLeaderboard,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CHUNKS_PER_PIPELINE,
+    _zadd,
+    _zincrby)
+
+DEFAULT_ROLLING_TTL = 60
+
+class Window(object):
+    def __init__(self, name, period, retention, offset=0):
+        self.name = name
+        self.period = period
+        self.retention = retention
+        # Shifts period boundaries; the epoch was a Thursday.
+        self.offset = offset
+
+    def bucket(self, timestamp):
+        return int((timestamp + self.offset) // self.period)
+
+    def closes_at(self, bucket):
+        return int((bucket + 1) * self.period - self.offset)
+
+    def expires_at(self, bucket):
+        return self.closes_at(bucket) + self.retention
+
+DAY = 24 * 60 * 60
+DAILY = Window('daily', DAY, retention=8*DAY)
+WEEKLY = Window('weekly', 7*DAY, retention=5*7*DAY, offset=3*DAY)
+
+class TimeWindowedLeaderboard(PortLeaderboard):
+    def __init__(self, name,
+        windows=(DAILY, WEEKLY),
+        page_size=DEFAULT_PAGE_SIZE,
+        redis=None,
+        clock=time.time,
+        **redis_kwargs):
+        super(TimeWindowedLeaderboard, self).__init__(name,
+            page_size,
+            redis,
+            **redis_kwargs)
+        if self._scripted_writes:
+            raise ValueError("Windowed boards keep no indexes, cap or feed")
+        self.windows = dict((window.name, window) for window in windows)
+        self.clock = clock
+        # Bucket keys this instance has already set EXPIREAT on, with the 
+        #  time their period closes; closed ones are dropped.
+        self._expiring = {}
+
+    def _bucket_key(self, window, bucket):
+        return "%s:%s:%d" % (self.name, window.name, bucket)
+
+    def key_for(self, window_name, when=None):
+        if when is None:
+            when = self.clock()
+        window = self.windows[window_name]
+        return self._bucket_key(window, window.bucket(when))
+
+    def _write(self, when, queue):
+        # queue(pipe, key) adds the write for one key; the all-time board's
+        #  reply comes first.
+        if when is None:
+            when = self.clock()
+        keys = [self.name]
+        expiring = {}
+        with self.redis.pipeline(transaction=False) as pipe:
+            queue(pipe, self.name)
+            for window in self.windows.values():
+                bucket = window.bucket(when)
+                key = self._bucket_key(window, bucket)
+                keys.append(key)
+                queue(pipe, key)
+                if key not in self._expiring:
+                    pipe.expireat(key, window.expires_at(bucket))
+                    expiring[key] = window.closes_at(bucket)
+            results = pipe.execute()
+        if expiring:
+            # A new bucket; the ones before it may have closed by now.
+            now = self.clock()
+            for key, closes_at in list(self._expiring.items()):
+                if closes_at <= now:
+                    del self._expiring[key]
+            self._expiring.update(expiring)
+        for key in keys:
+            self._invalidate(key)
+        return results
+
+    def rank_member(self, member, score, when=None):
+        self._write(when,
+            lambda pipe, key: _zadd(pipe, key, [(member, score)]))
+
+    def rank_members(self, members_and_scores,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        chunks_per_pipeline=DEFAULT_CHUNKS_PER_PIPELINE,
+        when=None):
+        if chunk_size < 1:
+            chunk_size = DEFAULT_CHUNK_SIZE
+        if chunks_per_pipeline < 1:
+            chunks_per_pipeline = DEFAULT_CHUNKS_PER_PIPELINE
+        if when is None:
+            when = self.clock()
+        counts = []
+        pairs = iter(members_and_scores)
+        while True:
+            chunks = []
+            for i in range(chunks_per_pipeline):
+                chunk = list(islice(pairs, chunk_size))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            if not chunks:
+                break
+            def queue(pipe, key):
+                for chunk in chunks:
+                    _zadd(pipe, key, chunk)
+            counts.extend(self._write(when, queue)[:len(chunks)])
+            if len(chunks) < chunks_per_pipeline:
+                break
+        return counts
+
+    def change_score_for(self, member, delta, when=None):
+        return self._write(when,
+            lambda pipe, key: _zincrby(pipe, key, member, delta))[0]
+
+    def change_scores_for(self, deltas, when=None):
+        deltas = list(deltas)
+        def queue(pipe, key):
+            for member, delta in deltas:
+                _zincrby(pipe, key, member, delta)
+        return self._write(when, queue)[:len(deltas)]
+
+    def remove_member(self, member):
+        # From every bucket that may still exist, not just the current ones.
+        now = self.clock()
+        keys = [self.name]
+        for window in self.windows.values():
+            keys.extend(self._bucket_key(window, bucket) 
+                for bucket in range(window.bucket(now - window.retention), 
+                    window.bucket(now) + 1))
+        with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.zrem(key, member)
+            pipe.execute()
+        for key in keys:
+            self._invalidate(key)
+
+    def _single_key_write(self, *args, **kwargs):
+        # Would leave the windows out of step with the all-time board.
+        raise NotImplementedError("Windowed boards are written through "
+            "rank_member(s), change_score(s)_for and remove_member")
+    rank_member_in = rank_members_in = _single_key_write
+    rank_member_if_higher = rank_member_if_higher_in = _single_key_write
+    change_score_for_member_in = change_scores_for_members_in = \
+        _single_key_write
+    remove_member_from = _single_key_write
+    remove_members_in_score_range = _single_key_write
+    remove_members_in_score_range_in = _single_key_write
+
+    def rolling_key(self, window_name, count,
+        ttl=DEFAULT_ROLLING_TTL,
+        aggregate="sum",
+        when=None):
+        """
+        Key holding the union of the last `count` buckets of the window
+          (including the current one), built at most once per ttl.
+        """
+        if when is None:
+            when = self.clock()
+        window = self.windows[window_name]
+        current = window.bucket(when)
+        key = "%s:%s:last%d:%s:%d" % (self.name, window.name, count,
+            aggregate, current)
+        if self.redis.exists(key):
+            return key
+
+        with self.redis.pipeline() as pipe:
+            pipe.zunionstore(key,
+                [self._bucket_key(window, bucket)
+                    for bucket in range(current - count + 1, current + 1)],
+                aggregate)
+            pipe.expire(key, ttl)
+            pipe.execute()
+        return key
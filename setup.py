@@ -18,6 +18,8 @@ setup(
     packages=find_packages(),
     zip_safe=False,
     install_requires=get_deps(),
+    # leaderboard.aio, on redis.asyncio.
+    extras_require={'aio': ['redis>=4.2']},
     include_package_data=True,
     classifiers=[
         'Intended Audience :: Developers',
@@ -2,6 +2,23 @@ from __future__ import absolute_import
 
 import unittest
 from port import *
+from aggregate import *
+from bench import *
+from buffered import *
+from cache import *
+from dumpfile import *
+from feed import *
+from metrics import *
+from pools import *
+from replicas import *
+from sharded import *
+from snapshot import *
+from windowed import *
+try:
+    # python 3 only.
+    from aio import *
+except (ImportError, SyntaxError):
+    pass
 
 """
 todo:
@@ -0,0 +1,121 @@
+import asyncio
+import unittest
+
+from tests import backend
+
+@unittest.skipIf(backend.MEMORY, "needs a live redis")
+class TestAsyncLeaderboard(unittest.TestCase):
+    def setUp(self):
+        from leaderboard.aio import AsyncLeaderboard
+        self.loop = asyncio.new_event_loop()
+        self.leaderboard = AsyncLeaderboard("name")
+        self.other = AsyncLeaderboard("other")
+        self.conn = backend.connection()
+
+    def tearDown(self):
+        from leaderboard.aio import teardown
+        self.conn.flushdb()
+        self._run(teardown())
+        self.loop.close()
+        self.conn = None
+
+    def _run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def _rank_members_in_leaderboard(self, members_to_add=5):
+        self._run(self.leaderboard.rank_members(
+            ("member_%d" % i, i) for i in range(1, members_to_add+1)))
+
+    def test_leaders(self):
+        self._rank_members_in_leaderboard(30)
+
+        leaders = self._run(self.leaderboard.leaders(2))
+        self.assertEqual(5, len(leaders))
+        self.assertEqual({'member': 'member_5', 'score': 5, 'rank': 26},
+            leaders[0])
+
+    def test_score_and_rank_for(self):
+        self._rank_members_in_leaderboard()
+
+        data = self._run(self.leaderboard.score_and_rank_for('member_1'))
+        self.assertEqual({'member': 'member_1', 'score': 1, 'rank': 5}, data)
+
+    def test_around_me_and_ranked_in_list(self):
+        self._rank_members_in_leaderboard(10)
+
+        around = self._run(self.leaderboard.around_me('member_5', 
+            page_size=3))
+        self.assertEqual(['member_6', 'member_5', 'member_4'],
+            [leader['member'] for leader in around])
+        self.assertEqual([], self._run(self.leaderboard.around_me('nobody')))
+
+        ranked = self._run(self.leaderboard.ranked_in_list(['member_1', 
+            'member_10']))
+        self.assertEqual([10, 1], [result['rank'] for result in ranked])
+
+    def test_concurrent_boards(self):
+        async def fetch_both():
+            await asyncio.gather(self.leaderboard.rank_member('a', 1),
+                self.other.rank_member('b', 2))
+            return await asyncio.gather(self.leaderboard.leaders(1),
+                self.other.leaders(1))
+
+        mine, other = self._run(fetch_both())
+        self.assertEqual('a', mine[0]['member'])
+        self.assertEqual('b', other[0]['member'])
+
+        merged = self._run(self.leaderboard.merge_leaderboards('both', 
+            ['other']))
+        self.assertEqual(2, merged)
+
+    def test_tied_ranks_and_floors(self):
+        self._run(self.leaderboard.rank_members([('a', 3), ('b', 3), 
+            ('c', 1)]))
+
+        self.assertEqual([1, 1, 3], [leader['rank'] for leader in 
+            self._run(self.leaderboard.leaders(1, ranking='competition'))])
+        self.assertEqual(3, self._run(self.leaderboard.rank_for('c', 
+            ranking='competition')))
+        self.assertEqual([1, 1], [result['rank'] for result in 
+            self._run(self.leaderboard.ranked_in_list(['a', 'b'], 
+                ranking='competition'))])
+        self.assertRaises(ValueError, self._run, 
+            self.leaderboard.leaders(1, ranking='dense'))
+
+        self.assertRaises(ValueError, self._run, 
+            self.leaderboard.change_score_for('c', -2, floor=0))
+        self.assertEqual([-1.0, 2.0], self._run(
+            self.leaderboard.change_scores_for([('c', -2), ('a', -1)], 
+                floor=0)))
+        self.assertEqual(1, self._run(self.leaderboard.score_for('c')))
+        self.assertEqual(2, self._run(self.leaderboard.score_at_percentile(
+            50)))
+
+    def test_pools_per_connection_kwargs(self):
+        from leaderboard import aio, pools
+        import leaderboard.port as lb
+        same = aio.AsyncLeaderboard("name")
+        elsewhere = aio.AsyncLeaderboard("name", db=1)
+        capped = aio.AsyncLeaderboard("name", max_connections=5)
+        self.assertTrue(same.redis.connection_pool is 
+            self.leaderboard.redis.connection_pool)
+        self.assertFalse(elsewhere.redis.connection_pool is 
+            self.leaderboard.redis.connection_pool)
+        self.assertEqual(5, capped.redis.connection_pool.max_connections)
+
+        self._run(elsewhere.close())
+        self.assertFalse(elsewhere.redis.connection_pool in 
+            pools.registered_pools())
+        self._run(same.close())
+        self.assertTrue(self.leaderboard.redis.connection_pool in 
+            pools.registered_pools())
+
+        # The sync teardown leaves asyncio pools to this one.
+        lb.teardown()
+        self.assertTrue(self.leaderboard.redis.connection_pool in 
+            pools.registered_pools())
+        self._run(aio.teardown())
+        self.assertEqual([], pools.registered_pools())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+"""
+  The suite runs against a live redis on localhost by default (and flushes 
+    db 0).  Set LEADERBOARD_TEST_BACKEND=memory to run it against 
+    leaderboard.memory instead, no server needed.
+"""
+import os
+
+import redis
+
+from leaderboard.memory import MemoryRedis
+
+MEMORY = os.environ.get('LEADERBOARD_TEST_BACKEND') == 'memory'
+
+def connection():
+    if MEMORY:
+        return MemoryRedis()
+    return redis.Redis()
+
+def leaderboard_kwargs(conn):
+    # Against redis, boards make their own connections as an app would;
+    #  in memory, they all have to share the one store.
+    if MEMORY:
+        return {'redis': conn}
+    return {}
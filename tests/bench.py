@@ -0,0 +1,30 @@
+import unittest
+
+from leaderboard import bench
+
+class TestBench(unittest.TestCase):
+    def test_percentile(self):
+        samples = list(range(101))
+        self.assertEqual(50, bench.percentile(samples, 50))
+        self.assertEqual(99, bench.percentile(samples, 99))
+        self.assertEqual(None, bench.percentile([], 50))
+
+    def test_bench_size_on_memory(self):
+        results = bench.bench_size('memory', 100, samples=2)
+        operations = [result['operation'] for result in results]
+        self.assertTrue('leaders:tail' in operations)
+        self.assertTrue('ranked_in_list:1000' in operations)
+        for result in results:
+            self.assertEqual(100, result['size'])
+            self.assertTrue(result['p50'] <= result['p99'])
+
+    def test_compare(self):
+        baseline = [{'backend': 'memory', 'size': 100, 'operation': 'a',
+                'p50': 1.0},
+            {'backend': 'memory', 'size': 100, 'operation': 'b',
+                'p50': 1.0}]
+        results = [dict(baseline[0], p50=1.1), dict(baseline[1], p50=1.5),
+            dict(baseline[1], size=1000, p50=9.0)]
+        regressions = bench.compare(baseline, results, threshold=0.2)
+        self.assertEqual([('b', 1.0)],
+            [(result['operation'], old) for result, old in regressions])
@@ -0,0 +1,147 @@
+import unittest
+
+import leaderboard.port as lb
+from tests import backend
+from leaderboard.idiom import Leaderboard
+from leaderboard.buffered import BufferedLeaderboard
+
+class TestBufferedLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.conn = backend.connection()
+        self.leaderboard = Leaderboard("name", 
+            **backend.leaderboard_kwargs(self.conn))
+        self.buffered = BufferedLeaderboard(self.leaderboard, max_pending=3)
+
+    def tearDown(self):
+        self.buffered.close()
+        self.conn.flushdb()
+        lb.teardown()
+        self.conn = None
+
+    def test_incr_is_buffered_until_flush(self):
+        for i in range(10):
+            self.buffered.incr('member_1')
+        self.buffered.incr('member_2', 5)
+
+        self.assertEqual(0, self.leaderboard.total_members())
+        self.assertEqual(10, self.buffered.pending_delta('member_1'))
+
+        results = self.buffered.flush()
+        self.assertEqual({'member_1': 10, 'member_2': 5}, results)
+        self.assertEqual(2, self.leaderboard.total_members())
+        self.assertEqual(0, self.buffered.pending_delta('member_1'))
+
+    def test_flushes_at_max_pending(self):
+        self.buffered.incr('member_1')
+        self.buffered.incr('member_2')
+        self.assertEqual(0, self.leaderboard.total_members())
+
+        self.buffered.incr('member_3')
+        self.assertEqual(3, self.leaderboard.total_members())
+
+    def test_decr_refuses_negative_result(self):
+        self.leaderboard.set_member_score('member_1', 3)
+        self.buffered.decr('member_1', 2)
+        self.buffered.decr('member_1', 2)
+        self.buffered.incr('member_2')
+
+        self.assertRaises(ValueError, self.buffered.flush)
+        self.assertEqual((1, 3), 
+            self.leaderboard.get_rank_and_score('member_1'))
+        self.assertEqual(1, self.leaderboard.get_rank_and_score('member_2')[1])
+
+    def test_refused_decrements_leave_absent_members_out(self):
+        self.buffered.decr('member_1')
+        self.assertRaises(ValueError, self.buffered.flush)
+        self.assertFalse(self.leaderboard.port.check_member('member_1'))
+
+    def test_threshold_flush_raises_only_for_its_own_member(self):
+        self.buffered.decr('member_1')
+        self.buffered.incr('member_2')
+        self.buffered.incr('member_3')
+        self.assertEqual(2, self.leaderboard.total_members())
+
+        self.buffered.incr('member_2')
+        self.buffered.incr('member_3')
+        self.assertRaises(ValueError, self.buffered.decr, 'member_4')
+        self.assertEqual(2, 
+            self.leaderboard.get_rank_and_score('member_2')[1])
+
+    def test_failed_flush_keeps_deltas(self):
+        port = self.leaderboard.port
+        def fail(name, deltas, floor=None, transaction=False):
+            raise IOError("connection lost")
+        port._change_scores = fail
+        self.buffered.incr('member_1', 2)
+        self.assertRaises(IOError, self.buffered.flush)
+        self.assertEqual(2, self.buffered.pending_delta('member_1'))
+
+        del port._change_scores
+        self.assertEqual({'member_1': 2}, self.buffered.flush())
+
+    def test_failed_flush_is_never_applied_twice(self):
+        # Every round trip after the first fails, as a dropped connection 
+        #  would; a flush must go through whole or not at all.
+        redis = self.leaderboard.port.redis
+        trips = []
+        def flaky(execute):
+            def wrapper(*args, **kwargs):
+                trips.append(execute)
+                if len(trips) > 1:
+                    raise IOError("connection lost")
+                return execute(*args, **kwargs)
+            return wrapper
+        pipeline = redis.pipeline
+        def flaky_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            pipe.execute = flaky(pipe.execute)
+            return pipe
+        redis.pipeline = flaky_pipeline
+        redis.execute_command = flaky(redis.execute_command)
+        for i in range(1, 3):
+            self.buffered.incr('member_%d' % i, i)
+        try:
+            self.buffered.flush()
+        except IOError:
+            pass
+        finally:
+            del redis.pipeline, redis.execute_command
+        self.buffered.flush()
+
+        self.assertEqual(1, self.leaderboard.get_rank_and_score('member_1')[1])
+        self.assertEqual(2, self.leaderboard.get_rank_and_score('member_2')[1])
+
+    def test_reads_include_pending(self):
+        self.leaderboard.set_member_score('member_1', 3)
+        self.buffered.incr('member_1', 2)
+
+        self.assertEqual(3, self.buffered.get_rank_and_score('member_1')[1])
+
+        self.buffered.include_pending = True
+        self.assertEqual(5, self.buffered.get_rank_and_score('member_1')[1])
+        self.assertEqual(5, self.buffered.leaders(1)[0]['score'])
+
+    def test_background_flush(self):
+        buffered = BufferedLeaderboard(self.leaderboard, flush_interval=0.01)
+        buffered.incr('member_1')
+        buffered._stopped.wait(0.1)
+        self.assertEqual(1, self.leaderboard.total_members())
+        buffered.close()
+
+    def test_background_flush_outlives_errors(self):
+        port = self.leaderboard.port
+        def fail(name, deltas, floor=None, transaction=False):
+            raise IOError("connection lost")
+        port._change_scores = fail
+        buffered = BufferedLeaderboard(self.leaderboard, flush_interval=0.01)
+        buffered.incr('member_1')
+        buffered._stopped.wait(0.05)
+        self.assertTrue(buffered._flusher.is_alive())
+
+        del port._change_scores
+        buffered._stopped.wait(0.1)
+        self.assertEqual(1, self.leaderboard.total_members())
+        buffered.close()
+
+if __name__ == '__main__':
+    unittest.main()
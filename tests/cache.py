@@ -0,0 +1,104 @@
+import time
+import unittest
+
+import leaderboard.port as lb
+from leaderboard.cache import PageCache
+from tests import backend
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = PageCache(max_entries=2, ttl=10, clock=self.clock)
+        self.loads = 0
+
+    def _loader(self, value):
+        def load():
+            self.loads += 1
+            return value
+        return load
+
+    def test_hit_miss_and_ttl(self):
+        self.assertEqual('a', self.cache.get(('name', 1), self._loader('a')))
+        self.assertEqual('a', self.cache.get(('name', 1), self._loader('b')))
+        self.assertEqual(1, self.loads)
+
+        self.clock.now = 11
+        self.assertEqual('b', self.cache.get(('name', 1), self._loader('b')))
+        self.assertEqual(2, self.loads)
+        self.assertEqual(1, self.cache.stats['hits'])
+        self.assertEqual(2, self.cache.stats['misses'])
+
+    def test_lru_eviction(self):
+        self.cache.get(('name', 1), self._loader(1))
+        self.cache.get(('name', 2), self._loader(2))
+        self.cache.get(('name', 1), self._loader(1))
+        self.cache.get(('name', 3), self._loader(3))
+
+        self.assertEqual(1, self.cache.stats['evictions'])
+        self.cache.get(('name', 1), self._loader(1))
+        self.assertEqual(3, self.loads)
+
+    def test_invalidate_is_per_board(self):
+        self.cache.get(('name', 1), self._loader('a'))
+        self.cache.get(('other', 1), self._loader('a'))
+        self.cache.invalidate('name')
+
+        self.assertEqual('b', self.cache.get(('name', 1), self._loader('b')))
+        self.assertEqual('a', self.cache.get(('other', 1), self._loader('b')))
+
+    def test_stale_while_revalidate(self):
+        self.cache.stale_while_revalidate = True
+        self.cache.get(('name', 1), self._loader('a'))
+        self.clock.now = 11
+
+        self.assertEqual('a', self.cache.get(('name', 1), self._loader('b')))
+        self.assertEqual(1, self.cache.stats['stale_hits'])
+        # let the background refresher finish.
+        for i in range(100):
+            if not self.cache._refreshing:
+                break
+            time.sleep(0.01)
+        self.assertEqual('b', self.cache.get(('name', 1), self._loader('c')))
+
+class TestLeaderboardPageCache(unittest.TestCase):
+    def setUp(self):
+        self.conn = backend.connection()
+        self.cache = PageCache(ttl=60)
+        self.leaderboard = lb.Leaderboard('name', cache=self.cache, 
+            **backend.leaderboard_kwargs(self.conn))
+
+    def tearDown(self):
+        self.conn.flushdb()
+        lb.teardown()
+        self.conn = None
+
+    def test_leaders_are_cached_until_a_write(self):
+        self.leaderboard.rank_member('member_1', 1)
+        self.assertEqual(1, len(self.leaderboard.leaders(1)))
+
+        lb._zadd(self.conn, 'name', [('member_2', 2)])
+        self.assertEqual(1, len(self.leaderboard.leaders(1)))
+        self.assertEqual(1, self.cache.stats['hits'])
+
+        self.leaderboard.rank_member('member_3', 3)
+        self.assertEqual(3, len(self.leaderboard.leaders(1)))
+
+        self.leaderboard.change_score_for('member_1', 10)
+        self.assertEqual('member_1', self.leaderboard.leaders(1)[0]['member'])
+
+        self.leaderboard.remove_member('member_1')
+        self.assertEqual(2, len(self.leaderboard.leaders(1)))
+
+    def test_cached_leaders_are_copies(self):
+        self.leaderboard.rank_member('member_1', 1)
+        self.leaderboard.leaders(1)[0]['score'] = 100
+        self.assertEqual(1, self.leaderboard.leaders(1)[0]['score'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import io
+import mmap
+import tempfile
+import unittest
+
+import leaderboard.port as lb
+from leaderboard import dumpfile
+from tests import backend
+
+class TestDumpfile(unittest.TestCase):
+    def setUp(self):
+        self.conn = backend.connection()
+        self.leaderboard = lb.Leaderboard('name',
+            **backend.leaderboard_kwargs(self.conn))
+
+    def tearDown(self):
+        self.conn.flushdb()
+        lb.teardown()
+        self.conn = None
+
+    def _dump(self, rows):
+        out = io.BytesIO()
+        dumpfile.write(out, rows, flush_every=2)
+        return out.getvalue()
+
+    def test_format_round_trips(self):
+        rows = [(b'b', 2.5), (b'', -1.0), (u'\xe9'.encode('utf-8'), 0.0)]
+        data = self._dump(rows)
+        self.assertEqual(4 + 3 * 12 + 3 + 12, len(data))
+
+        self.assertEqual([rows[:2], rows[2:]],
+            list(dumpfile.read(io.BytesIO(data), batch_size=2)))
+        self.assertEqual(rows, [(member.tobytes(), score)
+            for member, score in dumpfile.records(data)])
+
+    def test_records_from_mmap(self):
+        rows = [(b'member_%d' % i, float(i)) for i in range(100)]
+        with tempfile.TemporaryFile() as f:
+            dumpfile.write(f, rows)
+            f.flush()
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                self.assertEqual(rows, [(dumpfile._bytes(member), score)
+                    for member, score in dumpfile.records(buf)])
+            finally:
+                buf.close()
+
+    def test_bad_dumps_are_refused(self):
+        data = self._dump([(b'a', 1.0), (b'b', 2.0)])
+        for bad in (data[:-1], data[:10], b'nope' + data[4:]):
+            self.assertRaises(ValueError, list,
+                dumpfile.read(io.BytesIO(bad)))
+            self.assertRaises(ValueError, list, dumpfile.records(bad))
+
+    def test_dump_and_load(self):
+        for i in range(1, 26):
+            self.leaderboard.rank_member('member_%d' % i, i)
+        out = io.BytesIO()
+        self.assertEqual(25, self.leaderboard.dump(out, batch_size=7))
+
+        other = lb.Leaderboard('other',
+            **backend.leaderboard_kwargs(self.conn))
+        other.rank_member('stale', 100)
+        out.seek(0)
+        self.assertEqual(25, other.load(out, chunk_size=4,
+            chunks_per_pipeline=2))
+        self.assertEqual(self.leaderboard.leaders(1), other.leaders(1))
+        self.assertFalse(self.conn.exists('other:load'))
+
+        # A bad dump leaves the board as it was.
+        self.assertRaises(ValueError, other.load,
+            io.BytesIO(out.getvalue()[:-20]), chunk_size=4)
+        self.assertEqual(25, other.total_members())
+        self.assertFalse(self.conn.exists('other:load'))
+
+        empty = io.BytesIO()
+        lb.Leaderboard('nobody',
+            **backend.leaderboard_kwargs(self.conn)).dump(empty)
+        empty.seek(0)
+        self.assertEqual(0, other.load(empty))
+        self.assertEqual(0, other.total_members())
+
+    def test_load_rebuilds_indexes(self):
+        self.leaderboard.rank_members([('a', 1), ('b', 1), ('c', 7)])
+        out = io.BytesIO()
+        self.leaderboard.dump(out)
+        out.seek(0)
+
+        trimmed = []
+        other = lb.Leaderboard('other',
+            bucket_width=5,
+            dense_index=True,
+            max_members=2,
+            on_trim=lambda name, members: trimmed.extend(members),
+            **backend.leaderboard_kwargs(self.conn))
+        other.rank_member('stale', 100)
+        other.load(out)
+        self.assertEqual(2, other.total_members())
+        self.assertEqual([(0, 5, 1), (5, 10, 1)], other.histogram())
+        self.assertEqual([1, 2], [leader['rank'] for leader in
+            other.leaders(1, ranking='dense')])
+        self.assertEqual(['a'], [lb._native(member) for member in trimmed])
+        for temp in ('other:load', 'other:dense:rebuild',
+            'other:buckets:rebuild'):
+            self.assertFalse(self.conn.exists(temp))
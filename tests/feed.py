@@ -0,0 +1,79 @@
+import threading
+import time
+import unittest
+
+import leaderboard.port as lb
+from leaderboard.feed import RankChange
+from tests import backend
+
+class TestRankChangeFeed(unittest.TestCase):
+    def setUp(self):
+        self.conn = backend.connection()
+        self.leaderboard = self._leaderboard(feed_length=1000)
+
+    def tearDown(self):
+        self.conn.flushdb()
+        lb.teardown()
+        self.conn = None
+
+    def _leaderboard(self, **kwargs):
+        kwargs.update(backend.leaderboard_kwargs(self.conn))
+        return lb.Leaderboard('name', **kwargs)
+
+    def _changes(self, last_id='0', **kwargs):
+        return [(change.member, change.old_rank, change.new_rank,
+                change.score)
+            for change in self.leaderboard.rank_changes(last_id,
+                block=None, **kwargs)]
+
+    def test_writes_that_move_ranks_are_fed(self):
+        self.leaderboard.rank_members([('a', 1), ('b', 2)])
+        self.leaderboard.rank_member('c', 3)
+        self.leaderboard.change_score_for('a', 5)
+        # Same rank, no event.
+        self.leaderboard.change_score_for('a', 1)
+        self.leaderboard.remove_member('b')
+        self.assertFalse(self.leaderboard.rank_member_if_higher('c', 1))
+
+        self.assertEqual([('a', None, 1, 1.0),
+            ('b', None, 1, 2.0),
+            ('c', None, 1, 3.0),
+            ('a', 3, 1, 6.0),
+            ('b', 3, None, None)], self._changes())
+        self.assertEqual(('a', 2, 0, 6.0), self._changes(
+            use_zero_index_for_rank=True)[3])
+
+    def test_resuming_and_trimming(self):
+        self.leaderboard.rank_member('a', 1)
+        last = list(self.leaderboard.rank_changes('0', block=None))[-1]
+        self.assertTrue(isinstance(last, RankChange))
+        self.assertEqual([], self._changes(last.id))
+
+        capped = self._leaderboard(feed_length=1000, max_members=1)
+        capped.rank_member('b', 2)
+        self.assertEqual([('b', None, 1, 2.0), ('a', 2, None, None)],
+            self._changes(last.id))
+
+    def test_from_now_on_means_the_time_of_the_call(self):
+        self.leaderboard.rank_member('a', 1)
+        changes = self.leaderboard.rank_changes(block=None)
+        self.leaderboard.rank_member('b', 2)
+        self.assertEqual(['b'], [change.member for change in changes])
+
+    def test_plain_boards_have_no_feed(self):
+        plain = self._leaderboard()
+        plain.rank_member('a', 1)
+        self.assertEqual([], list(plain.rank_changes('0', block=None)))
+
+    def test_blocking_reads_see_new_events(self):
+        changes = self.leaderboard.rank_changes(block=0.05, batch_size=2)
+        def write():
+            time.sleep(0.1)
+            self.leaderboard.rank_members([('a', 1), ('b', 2), ('c', 3)])
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            self.assertEqual(['a', 'b', 'c'],
+                [next(changes).member for i in range(3)])
+        finally:
+            writer.join()
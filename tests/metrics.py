@@ -0,0 +1,103 @@
+import unittest
+
+import leaderboard.port as lb
+from leaderboard.metrics import Histogram, Sample, instrument, payload_size
+from tests import backend
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.redis = backend.connection()
+        self.redis.flushdb()
+        self.samples = []
+        self.leaderboard = lb.Leaderboard('name', metrics=self.samples.append,
+            **backend.leaderboard_kwargs(self.redis))
+
+    def tearDown(self):
+        self.redis.flushdb()
+        lb.teardown()
+        self.redis = None
+
+    def test_uninstrumented_board_is_untouched(self):
+        board = lb.Leaderboard('name', **backend.leaderboard_kwargs(self.redis))
+        self.assertFalse('leaders' in board.__dict__)
+        self.assertTrue(board.redis is self.redis or not backend.MEMORY)
+
+    def test_records_outermost_call(self):
+        self.leaderboard.rank_member('member_1', 1)
+        self.leaderboard.leaders(1)
+        self.assertEqual(['rank_member', 'leaders'],
+            [sample.method for sample in self.samples])
+
+        rank_member, leaders = self.samples
+        self.assertEqual(1, rank_member.commands)
+        self.assertEqual(1, rank_member.round_trips)
+        self.assertTrue(rank_member.bytes_sent > 0)
+        # ZCARD and ZREVRANGE, pipelined.
+        self.assertEqual(2, leaders.commands)
+        self.assertEqual(1, leaders.round_trips)
+        self.assertTrue(leaders.bytes_received > 0)
+        self.assertTrue(leaders.seconds >= 0)
+
+    def test_records_script_calls(self):
+        self.leaderboard.rank_member('member_1', 1)
+        self.leaderboard.score_and_rank_for('member_1')
+        self.assertEqual(1, self.samples[-1].commands)
+
+    def test_generator_methods(self):
+        self.leaderboard.rank_members([('member_%d' % i, i) 
+            for i in range(10)])
+        members = list(self.leaderboard.iter_all(batch_size=4))
+        self.assertEqual(10, len(members))
+        self.assertEqual(['rank_members', 'iter_all'],
+            [sample.method for sample in self.samples])
+        sample = self.samples[-1]
+        self.assertTrue(sample.round_trips >= 3)
+
+        list(self.leaderboard.iter_all_in('name', batch_size=4))
+        self.assertEqual('iter_all_in', self.samples[-1].method)
+
+    def test_payload_size(self):
+        self.assertEqual(0, payload_size(None))
+        self.assertEqual(6, payload_size(['abc', ('de', 'f')]))
+        self.assertEqual(4, payload_size({'ab': 1.5}) - 1)
+
+class TestHistogram(unittest.TestCase):
+    def _sample(self, method, seconds, commands=1):
+        sample = Sample(method)
+        sample.seconds = seconds
+        sample.commands = commands
+        sample.round_trips = 1
+        return sample
+
+    def test_stats(self):
+        histogram = Histogram(buckets=(0.001, 0.01, 0.1))
+        for i in range(98):
+            histogram(self._sample('leaders', 0.0005, commands=2))
+        histogram(self._sample('leaders', 0.05, commands=2))
+        histogram(self._sample('leaders', 5, commands=2))
+        histogram(self._sample('rank_member', 0.005))
+
+        stats = histogram.stats()
+        self.assertEqual(100, stats['leaders']['calls'])
+        self.assertEqual(200, stats['leaders']['commands'])
+        self.assertEqual(100, stats['leaders']['round_trips'])
+        self.assertEqual(0.001, stats['leaders']['p50'])
+        self.assertEqual(0.1, stats['leaders']['p99'])
+        self.assertEqual(None, histogram.percentile('leaders', 100))
+        self.assertEqual(0.01, stats['rank_member']['p50'])
+        self.assertEqual(None, histogram.percentile('around_me', 50))
+
+        histogram.reset()
+        self.assertEqual({}, histogram.stats())
+
+    def test_instrument_existing_board(self):
+        redis = backend.connection()
+        redis.flushdb()
+        histogram = Histogram()
+        board = instrument(lb.Leaderboard('other', 
+            **backend.leaderboard_kwargs(redis)), histogram)
+        board.rank_member('member_1', 1)
+        board.total_members()
+        self.assertEqual(set(['rank_member', 'total_members']), 
+            set(histogram.stats()))
+        redis.flushdb()
@@ -0,0 +1,81 @@
+import unittest
+
+import redis
+
+import leaderboard.port as lb
+from leaderboard import pools
+from tests import backend
+
+class CountingPool(redis.ConnectionPool):
+    disconnects = 0
+    def disconnect(self):
+        self.disconnects += 1
+        super(CountingPool, self).disconnect()
+
+class TestPools(unittest.TestCase):
+    def tearDown(self):
+        lb.teardown()
+
+    def test_pools_are_keyed_by_connection_params(self):
+        first = lb.Leaderboard('first', db=1)
+        second = lb.Leaderboard('second', db=1)
+        other = lb.Leaderboard('other', db=2)
+        self.assertTrue(first.redis.connection_pool is 
+            second.redis.connection_pool)
+        self.assertFalse(first.redis.connection_pool is 
+            other.redis.connection_pool)
+        self.assertEqual(2, len(pools.registered_pools()))
+
+        capped = lb.Leaderboard('capped', db=1, max_connections=5)
+        self.assertFalse(first.redis.connection_pool is 
+            capped.redis.connection_pool)
+        self.assertEqual(5, capped.redis.connection_pool.max_connections)
+
+    def test_pool_injection(self):
+        pool = redis.ConnectionPool(db=3)
+        board = lb.Leaderboard('name', pool=pool)
+        self.assertTrue(board.redis.connection_pool is pool)
+        self.assertEqual([], pools.registered_pools())
+
+    @unittest.skipIf(pools.BlockingConnectionPool is None, 
+        "redis-py has no BlockingConnectionPool")
+    def test_blocking_pool(self):
+        pool = pools.connection_pool(db=1, blocking=True, 
+            max_connections=2, timeout=0.5)
+        self.assertTrue(isinstance(pool, pools.BlockingConnectionPool))
+        self.assertEqual(0.5, pool.timeout)
+        self.assertTrue(pool is pools.connection_pool(db=1, blocking=True, 
+            max_connections=2, timeout=0.5))
+        self.assertRaises(ValueError, pools.connection_pool, blocking=True)
+
+    def test_teardown_forgets_pools(self):
+        first = lb.Leaderboard('first', db=1)
+        lb.teardown()
+        self.assertEqual([], pools.registered_pools())
+        self.assertFalse(first.redis.connection_pool is 
+            lb.Leaderboard('first', db=1).redis.connection_pool)
+
+    def test_close(self):
+        conn = backend.connection()
+        with lb.Leaderboard('name', 
+            **backend.leaderboard_kwargs(conn)) as board:
+            board.rank_member('member_1', 1)
+            self.assertEqual(1, board.total_members())
+        # Closed boards reconnect on next use.
+        self.assertEqual(1, board.total_members())
+        conn.flushdb()
+
+    def test_close_lets_go_of_registered_pools_only(self):
+        first = lb.Leaderboard('first', db=1)
+        second = lb.Leaderboard('second', db=1)
+        first.close()
+        first.close()
+        self.assertEqual([second.redis.connection_pool], 
+            pools.registered_pools())
+        second.close()
+        self.assertEqual([], pools.registered_pools())
+
+        pool = CountingPool(db=3)
+        lb.Leaderboard('name', pool=pool).close()
+        lb.Leaderboard('name', redis=redis.Redis(connection_pool=pool)).close()
+        self.assertEqual(0, pool.disconnects)
@@ -3,6 +3,7 @@ import unittest
 import redis
 
 import leaderboard.port as lb
+from tests import backend
 
 """
 todo:
@@ -17,14 +18,18 @@ todo:
 
 class TestLeaderboard(unittest.TestCase):
     def setUp(self):
-        self.leaderboard = lb.Leaderboard("name")
-        self.conn = redis.Redis()
+        self.conn = backend.connection()
+        self.leaderboard = self._leaderboard("name")
     
     def tearDown(self):
         self.conn.flushdb()
         lb.teardown()
         self.conn = None
     
+    def _leaderboard(self, name, **kwargs):
+        kwargs.update(backend.leaderboard_kwargs(self.conn))
+        return lb.Leaderboard(name, **kwargs)
+
     def _rank_members_in_leaderboard(self, members_to_add=5):
         for i in range(1, members_to_add+1):
             self.leaderboard.rank_member("member_%d" % i, i)
@@ -62,6 +67,7 @@ class TestLeaderboard(unittest.TestCase):
         self.leaderboard.delete_leaderboard()
         self.assertEqual(False, self.conn.exists('name'))
   
+    @unittest.skipIf(backend.MEMORY, "counts redis server clients")
     def test_can_pass_existing_redis_connection_to_initializer(self):
         self.leaderboard = lb.Leaderboard('name', redis=self.conn)
     
@@ -74,11 +80,79 @@ class TestLeaderboard(unittest.TestCase):
 
         self.assertEqual(1, self.leaderboard.total_members())
   
+    def test_rank_members(self):
+        members = (("member_%d" % i, i) for i in range(1, 26))
+
+        counts = self.leaderboard.rank_members(members, chunk_size=10, 
+            chunks_per_pipeline=2)
+
+        self.assertEqual([10, 10, 5], counts)
+        self.assertEqual(25, self.leaderboard.total_members())
+        self.assertEqual(1, self.leaderboard.rank_for('member_25'))
+        self.assertEqual(7, self.leaderboard.score_for('member_7'))
+
+        counts = self.leaderboard.rank_members([('member_1', 100), 
+            ('member_26', 26)])
+        self.assertEqual([1], counts)
+        self.assertEqual(1, self.leaderboard.rank_for('member_1'))
+
+    def test_indexed_rank_members_pipelines_lazily(self):
+        leaderboard = self._leaderboard('name', dense_index=True)
+        written = []
+        def members():
+            for i in range(1, 8):
+                # Chunks already sent are on the board before more are read.
+                written.append(leaderboard.total_members())
+                yield ("member_%d" % i, i)
+
+        counts = leaderboard.rank_members(members(), chunk_size=2, 
+            chunks_per_pipeline=2)
+
+        self.assertEqual([2, 2, 2, 1], counts)
+        self.assertEqual([0, 0, 0, 0, 4, 4, 4], written)
+        self.assertEqual(1, leaderboard.rank_for('member_7', ranking='dense'))
+
+    def test_rank_members_with_no_members(self):
+        self.assertEqual([], self.leaderboard.rank_members([]))
+        self.assertEqual(0, self.leaderboard.total_members())
+  
     def test_total_members_in_score_range(self):
         self._rank_members_in_leaderboard(5)
     
         self.assertEqual(3, self.leaderboard.total_members_in_score_range(2, 4))
   
+    def test_change_scores_for(self):
+        self._rank_members_in_leaderboard(5)
+
+        scores = self.leaderboard.change_scores_for([('member_1', 10), 
+            ('member_6', 3), ('member_5', -1)])
+
+        self.assertEqual([11, 3, 4], scores)
+        self.assertEqual(1, self.leaderboard.rank_for('member_1'))
+  
+    def test_change_score_for_with_floor(self):
+        self.leaderboard.rank_member('member_1', 3)
+
+        self.assertEqual(1, self.leaderboard.change_score_for('member_1', -2, 
+            floor=0))
+        self.assertRaises(ValueError, self.leaderboard.change_score_for, 
+            'member_1', -2, floor=0)
+        self.assertEqual(1, self.leaderboard.score_for('member_1'))
+
+        self.assertRaises(ValueError, self.leaderboard.change_score_for, 
+            'member_2', -1, floor=0)
+        self.assertFalse(self.leaderboard.check_member('member_2'))
+
+    def test_rank_member_if_higher(self):
+        self.assertTrue(self.leaderboard.rank_member_if_higher('member_1', 5))
+        self.assertFalse(self.leaderboard.rank_member_if_higher('member_1', 4))
+        self.assertFalse(self.leaderboard.rank_member_if_higher('member_1', 5))
+        self.assertEqual(5, self.leaderboard.score_for('member_1'))
+
+        self.assertTrue(self.leaderboard.rank_member_if_higher('member_1', 
+            5.5))
+        self.assertEqual(5.5, self.leaderboard.score_for('member_1'))
+  
     def test_rank_for(self):
         self._rank_members_in_leaderboard(5)
 
@@ -144,6 +218,28 @@ class TestLeaderboard(unittest.TestCase):
         self.assertEqual(1, 
             len(leaders))
   
+    def test_leaders_ranks_follow_page_offset(self):
+        self._rank_members_in_leaderboard(lb.DEFAULT_PAGE_SIZE * 2 + 3)
+
+        leaders = self.leaderboard.leaders(2)
+        self.assertEqual(lb.DEFAULT_PAGE_SIZE, len(leaders))
+        self.assertEqual(lb.DEFAULT_PAGE_SIZE + 1, leaders[0]['rank'])
+        self.assertEqual(lb.DEFAULT_PAGE_SIZE * 2, leaders[-1]['rank'])
+        for leader in leaders:
+            self.assertEqual(self.leaderboard.rank_for(leader['member']),
+                leader['rank'])
+            self.assertEqual(self.leaderboard.score_for(leader['member']),
+                leader['score'])
+
+        leaders = self.leaderboard.leaders(10, use_zero_index_for_rank=True)
+        self.assertEqual(3, len(leaders))
+        self.assertEqual(lb.DEFAULT_PAGE_SIZE * 2, leaders[0]['rank'])
+        self.assertEqual('member_1', leaders[-1]['member'])
+
+    def test_leaders_on_empty_leaderboard(self):
+        self.assertEqual([], self.leaderboard.leaders(1))
+        self.assertEqual([], self.leaderboard.leaders(3))
+  
     def test_leaders_without_retrieving_scores_and_ranks(self):
         self._rank_members_in_leaderboard(lb.DEFAULT_PAGE_SIZE)
 
@@ -160,6 +256,94 @@ class TestLeaderboard(unittest.TestCase):
         member_1 = {'member': 'member_1'}
         self.assertEqual(member_1, leaders[24])
   
+    def test_iter_all(self):
+        self._rank_members_in_leaderboard(25)
+
+        members = list(self.leaderboard.iter_all(batch_size=4))
+        self.assertEqual(25, len(members))
+        self.assertEqual(('member_25', 25), members[0])
+        self.assertEqual(('member_1', 1), members[-1])
+
+        self.assertEqual(['member_%d' % i for i in range(25, 0, -1)], 
+            list(self.leaderboard.iter_all(with_scores=False)))
+        self.assertEqual([], list(self.leaderboard.iter_all_in('nobody')))
+
+    def test_iter_all_with_ties_bigger_than_a_batch(self):
+        for i in range(10):
+            self.leaderboard.rank_member('tie_%d' % i, 5)
+        self.leaderboard.rank_member('top', 6)
+        self.leaderboard.rank_member('bottom', 1)
+
+        members = list(self.leaderboard.iter_all(batch_size=3, 
+            with_scores=False))
+        self.assertEqual(['top'] + ['tie_%d' % i for i in range(9, -1, -1)] + 
+            ['bottom'], members)
+
+    def test_iter_all_when_the_cursor_member_moves(self):
+        for i in range(10):
+            self.leaderboard.rank_member('tie_%d' % i, 5)
+
+        seen = []
+        for member in self.leaderboard.iter_all(batch_size=3, 
+            with_scores=False):
+            seen.append(member)
+            if member == 'tie_7':
+                # The cursor leaves its tie group; the walk goes on after it.
+                self.leaderboard.rank_member('tie_7', 1)
+                self.leaderboard.remove_member('tie_6')
+        self.assertEqual(['tie_9', 'tie_8', 'tie_7'] + 
+            ['tie_%d' % i for i in range(5, -1, -1)] + ['tie_7'], seen)
+
+    def test_iter_all_under_concurrent_writes(self):
+        self._rank_members_in_leaderboard(20)
+
+        seen = []
+        for member, score in self.leaderboard.iter_all(batch_size=3):
+            seen.append(member)
+            if len(seen) == 5:
+                # Offsets would shift under these removals and skip members.
+                self.leaderboard.remove_member('member_20')
+                self.leaderboard.remove_member('member_19')
+        self.assertEqual(['member_%d' % i for i in range(20, 0, -1)], seen)
+  
+    def test_leader_entries(self):
+        self._rank_members_in_leaderboard(5)
+
+        leader = self.leaderboard.leaders(1)[0]
+        self.assertTrue(isinstance(leader, lb.LeaderEntry))
+        self.assertEqual(('member_5', 1, 5), 
+            (leader.member, leader.rank, leader.score))
+        self.assertEqual({'member': 'member_5', 'rank': 1, 'score': 5}, 
+            dict(leader))
+
+        leader = self.leaderboard.leaders(1, with_scores=False)[0]
+        self.assertFalse(hasattr(leader, 'score'))
+        self.assertRaises(KeyError, lambda: leader['score'])
+
+        data = self.leaderboard.score_and_rank_for('member_2')
+        self.assertEqual(4, data.rank)
+
+    def test_columnar_results(self):
+        self._rank_members_in_leaderboard(5)
+
+        columns = self.leaderboard.leaders(1, columnar=True)
+        self.assertEqual(['member_5', 'member_4', 'member_3', 'member_2', 
+            'member_1'], columns.members)
+        self.assertEqual([1, 2, 3, 4, 5], list(columns.ranks))
+        self.assertEqual('d', columns.scores.typecode)
+        self.assertEqual([5, 4, 3, 2, 1], list(columns.scores))
+        self.assertEqual(self.leaderboard.leaders(1), list(columns))
+
+        columns = self.leaderboard.ranked_in_list(['member_1', 'nobody'], 
+            columnar=True, with_scores=False)
+        self.assertEqual([5, -1], list(columns.ranks))
+        self.assertEqual(None, columns.scores)
+
+        columns = self.leaderboard.leaders(1, columnar=True, 
+            with_rank=False, with_scores=False)
+        self.assertEqual(5, len(columns))
+        self.assertEqual(None, columns.ranks)
+  
     def test_around_me(self):
         self._rank_members_in_leaderboard(lb.DEFAULT_PAGE_SIZE * 3 + 1)
 
@@ -171,14 +355,42 @@ class TestLeaderboard(unittest.TestCase):
             len(leaders_around_me) / 2)
 
         leaders_around_me = self.leaderboard.around_me('member_1')
-        self.assertEqual(self.leaderboard.page_size / 2 + 1, 
-            len(leaders_around_me))
+        self.assertEqual(self.leaderboard.page_size, len(leaders_around_me))
+        self.assertEqual('member_1', leaders_around_me[-1]['member'])
 
         self.assertEqual(lb.DEFAULT_PAGE_SIZE, 25)
         leaders_around_me = self.leaderboard.around_me('member_76')
         self.assertEqual(self.leaderboard.page_size / 2, 
             len(leaders_around_me) / 2)
   
+    def test_around_me_near_the_ends(self):
+        self.assertEqual([], self.leaderboard.around_me('nobody'))
+        self._rank_members_in_leaderboard(10)
+        self.assertEqual([], self.leaderboard.around_me('nobody'))
+        self.assertEqual(0, len(self.leaderboard.around_me('nobody', 
+            columnar=True)))
+
+        leaders_around_me = self.leaderboard.around_me('member_2', 
+            page_size=5)
+        self.assertEqual(['member_5', 'member_4', 'member_3', 'member_2', 
+            'member_1'], [leader['member'] for leader in leaders_around_me])
+        self.assertEqual([6, 7, 8, 9, 10], 
+            [leader['rank'] for leader in leaders_around_me])
+        self.assertEqual([5.0, 4.0, 3.0, 2.0, 1.0], 
+            [leader['score'] for leader in leaders_around_me])
+
+        leaders_around_me = self.leaderboard.around_me('member_1', 
+            page_size=20)
+        self.assertEqual(10, len(leaders_around_me))
+
+        leaders_around_me = self.leaderboard.around_me('member_9', 
+            page_size=5, with_scores=False, use_zero_index_for_rank=True)
+        self.assertEqual([{'member': 'member_10', 'rank': 0}, 
+            {'member': 'member_9', 'rank': 1}, 
+            {'member': 'member_8', 'rank': 2}, 
+            {'member': 'member_7', 'rank': 3}, 
+            {'member': 'member_6', 'rank': 4}], leaders_around_me)
+
     def test_ranked_in_list(self):
         self._rank_members_in_leaderboard(lb.DEFAULT_PAGE_SIZE)
 
@@ -200,6 +412,27 @@ class TestLeaderboard(unittest.TestCase):
         self.assertEqual(16, ranked_members[2]['rank'])
         self.assertEqual(10, ranked_members[2]['score'])    
   
+    def test_ranked_in_list_in_chunks_and_sorted(self):
+        self._rank_members_in_leaderboard(lb.DEFAULT_PAGE_SIZE)
+
+        members = ['member_%d' % i for i in range(1, 26, 2)] + ['nobody']
+        ranked_members = self.leaderboard.ranked_in_list(members, 
+            chunk_size=4)
+        self.assertEqual(len(members), len(ranked_members))
+        self.assertEqual(25, ranked_members[0]['rank'])
+        self.assertEqual(1, ranked_members[0]['score'])
+        self.assertEqual(1, ranked_members[-2]['rank'])
+        self.assertEqual(None, ranked_members[-1]['rank'])
+        self.assertEqual(None, ranked_members[-1]['score'])
+
+        ranked_members = self.leaderboard.ranked_in_list(
+            ['nobody', 'member_3', 'member_20', 'member_7'], 
+            sort_by_rank=True)
+        self.assertEqual(['member_20', 'member_7', 'member_3', 'nobody'], 
+            [ranked['member'] for ranked in ranked_members])
+        self.assertEqual([6, 19, 23, None], 
+            [ranked['rank'] for ranked in ranked_members])
+  
     def test_ranked_in_list_without_scores(self):
         self._rank_members_in_leaderboard(lb.DEFAULT_PAGE_SIZE)
 
@@ -273,6 +506,233 @@ class TestLeaderboard(unittest.TestCase):
         self.assertEqual(1, data['score'])
         self.assertEqual(5, data['rank'])
   
+    def test_score_and_rank_for_missing_member(self):
+        self._rank_members_in_leaderboard()
+
+        data = self.leaderboard.score_and_rank_for('member_6')
+        self.assertEqual('member_6', data['member'])
+        self.assertEqual(None, data['score'])
+        self.assertEqual(None, data['rank'])
+  
+    def _rank_tied_members(self, leaderboard):
+        # Scores 10, 10, 8, 8, 8, 5, 3, 3.
+        leaderboard.rank_members(zip(['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h'], 
+            [10, 10, 8, 8, 8, 5, 3, 3]))
+
+    def test_competition_ranking(self):
+        self._rank_tied_members(self.leaderboard)
+
+        self.assertEqual([1, 1, 3, 3, 3, 6, 7, 7], [leader['rank'] 
+            for leader in self.leaderboard.leaders(1, ranking='competition')])
+        self.assertEqual([3, 3, 6], [leader['rank'] 
+            for leader in self.leaderboard.leaders(2, page_size=3, 
+                ranking='competition')])
+        self.assertEqual([2, 2, 5], [leader['rank'] 
+            for leader in self.leaderboard.leaders(2, page_size=3, 
+                ranking='competition', 
+                use_zero_index_for_rank=True)])
+        self.assertEqual(['d', 'c', 'f'], [leader['member'] 
+            for leader in self.leaderboard.leaders(2, page_size=3, 
+                ranking='competition', 
+                with_scores=False)])
+        self.assertEqual(3, self.leaderboard.rank_for('e', 
+            ranking='competition'))
+        self.assertEqual(None, self.leaderboard.rank_for('nobody', 
+            ranking='competition'))
+        self.assertEqual([7, 3, None], [leader['rank'] 
+            for leader in self.leaderboard.ranked_in_list(['h', 'd', 'x'], 
+                ranking='competition')])
+        self.assertEqual([1, 1, 3, 3, 3], [leader['rank'] 
+            for leader in self.leaderboard.around_me('a', page_size=5, 
+                ranking='competition')])
+        self.assertRaises(ValueError, self.leaderboard.leaders, 1, 
+            ranking='olympic')
+
+    def test_dense_ranking(self):
+        self.assertRaises(ValueError, self.leaderboard.rank_for, 'a', 
+            ranking='dense')
+
+        leaderboard = self._leaderboard('name', dense_index=True)
+        self._rank_tied_members(leaderboard)
+        self.assertEqual([1, 1, 2, 2, 2, 3, 4, 4], [leader['rank'] 
+            for leader in leaderboard.leaders(1, ranking='dense')])
+        self.assertEqual([2, 2, 3], [leader['rank'] 
+            for leader in leaderboard.leaders(2, page_size=3, 
+                ranking='dense')])
+        self.assertEqual(4, leaderboard.rank_for('g', ranking='dense'))
+        self.assertEqual([4, 2, None], [leader['rank'] 
+            for leader in leaderboard.ranked_in_list(['h', 'd', 'x'], 
+                ranking='dense')])
+
+        # Writes keep the index in step.
+        leaderboard.remove_member('f')
+        self.assertEqual(3, leaderboard.rank_for('g', ranking='dense'))
+        leaderboard.change_score_for('c', 1)
+        self.assertEqual([1, 1, 2, 3, 3, 4, 4], [leader['rank'] 
+            for leader in leaderboard.leaders(1, ranking='dense')])
+        self.assertRaises(ValueError, leaderboard.change_score_for, 'g', -5, 
+            floor=0)
+        self.assertTrue(leaderboard.rank_member_if_higher('g', 9))
+        self.assertFalse(leaderboard.rank_member_if_higher('g', 1))
+        leaderboard.rank_member('h', 10)
+        self.assertEqual([1, 1, 1, 2, 2, 3, 3], [leader['rank'] 
+            for leader in leaderboard.leaders(1, ranking='dense')])
+        self.assertEqual([11.0, 4.0], leaderboard.change_scores_for(
+            [('a', 1), ('e', -4)]))
+        leaderboard.remove_members_in_score_range(0, 8)
+        self.assertEqual([1, 2, 2, 3, 3], [leader['rank'] 
+            for leader in leaderboard.leaders(1, ranking='dense')])
+
+        maintained = self.conn.zrange('name:dense', 0, -1)
+        leaderboard.rebuild_indexes()
+        self.assertEqual(maintained, self.conn.zrange('name:dense', 0, -1))
+        self.assertEqual(3, len(maintained))
+
+        leaderboard.delete_leaderboard()
+        self.assertFalse(self.conn.exists('name:dense'))
+
+    def test_percentiles(self):
+        self.assertEqual(None, self.leaderboard.score_at_percentile(50))
+        self._rank_members_in_leaderboard(10)
+        self.leaderboard.rank_member('member_11', 10)
+
+        self.assertEqual(0, self.leaderboard.percentile_for('member_1'))
+        self.assertAlmostEqual(900 / 11.0, 
+            self.leaderboard.percentile_for('member_11'))
+        self.assertAlmostEqual(900 / 11.0, 
+            self.leaderboard.percentile_for('member_10'))
+        self.assertEqual(None, self.leaderboard.percentile_for('nobody'))
+
+        self.assertEqual(1.0, self.leaderboard.score_at_percentile(0))
+        self.assertEqual(6.0, self.leaderboard.score_at_percentile(50))
+        self.assertEqual(10.0, self.leaderboard.score_at_percentile(100))
+        self.assertRaises(ValueError, self.leaderboard.score_at_percentile, 
+            101)
+
+    def test_histogram(self):
+        self.assertEqual([], self.leaderboard.histogram(4))
+        self._rank_members_in_leaderboard(9)
+
+        self.assertEqual([(1.0, 3.0, 2), (3.0, 5.0, 2), (5.0, 7.0, 2), 
+            (7.0, 9.0, 3)], self.leaderboard.histogram(4))
+        self.assertEqual([(0.0, 5.0, 4), (5.0, 100.0, 5)], 
+            self.leaderboard.histogram([0, 5, 100]))
+        self.assertEqual(10, len(self.leaderboard.histogram()))
+        self.assertEqual(9, sum(count 
+            for low, high, count in self.leaderboard.histogram()))
+
+    def test_bucket_counts(self):
+        leaderboard = self._leaderboard('name', bucket_width=5, 
+            dense_index=True)
+        leaderboard.rank_members([('a', 1), ('b', 4), ('c', 5), ('d', 12)])
+        self.assertEqual([(0, 5, 2), (5, 10, 1), (10, 15, 1)], 
+            leaderboard.histogram())
+
+        # Writes keep the counts in step.
+        leaderboard.change_score_for('a', 5)
+        leaderboard.rank_member('e', -1)
+        self.assertFalse(leaderboard.rank_member_if_higher('d', 2))
+        leaderboard.remove_member('c')
+        self.assertEqual([(-5, 0, 1), (0, 5, 1), (5, 10, 1), (10, 15, 1)], 
+            leaderboard.histogram())
+        leaderboard.remove_members_in_score_range(0, 7)
+        self.assertEqual([(-5, 0, 1), (10, 15, 1)], leaderboard.histogram())
+        self.assertEqual(2, len(leaderboard.histogram(2)))
+
+        maintained = leaderboard.histogram()
+        self.conn.delete('name:buckets')
+        leaderboard.rebuild_indexes()
+        self.assertEqual(maintained, leaderboard.histogram())
+
+        leaderboard.delete_leaderboard()
+        self.assertFalse(self.conn.exists('name:buckets'))
+
+    def test_capped_board(self):
+        trims = []
+        leaderboard = self._leaderboard('name', max_members=3, 
+            on_trim=lambda name, members: trims.append((name, members)))
+        leaderboard.rank_members([('a', 1), ('b', 2), ('c', 3), ('d', 4)])
+        self.assertEqual(3, leaderboard.total_members())
+        self.assertEqual([('name', ['a'])], trims)
+
+        leaderboard.rank_member('e', 5)
+        leaderboard.change_score_for('c', 10)
+        self.assertEqual(['c', 'e', 'd'], [leader['member'] 
+            for leader in leaderboard.leaders(1)])
+        self.assertEqual([('name', ['a']), ('name', ['b'])], trims)
+        self.assertFalse(leaderboard.rank_member_if_higher('c', 1))
+        leaderboard.remove_member('d')
+        self.assertEqual(2, leaderboard.total_members())
+
+    def test_capped_board_trims_every_n_writes(self):
+        leaderboard = self._leaderboard('name', max_members=2, trim_every=3, 
+            bucket_width=10, dense_index=True)
+        leaderboard.rank_member('a', 1)
+        leaderboard.rank_member('b', 2)
+        leaderboard.rank_member('c', 3)
+        self.assertEqual(2, leaderboard.total_members())
+        leaderboard.rank_member('d', 4)
+        leaderboard.rank_member('e', 2)
+        self.assertEqual(4, leaderboard.total_members())
+
+        self.assertEqual(['b', 'e'], sorted(leaderboard.trim()))
+        self.assertEqual([], leaderboard.trim())
+        self.assertEqual([(0, 10, 2)], leaderboard.histogram())
+        self.assertEqual([3.0, 4.0], sorted(float(score) 
+            for score in self.conn.zrange('name:dense', 0, -1)))
+
+    def test_score_and_rank_across(self):
+        self._rank_members_in_leaderboard()
+        other = self._leaderboard('other')
+        other.rank_member('member_1', 10)
+        other.rank_member('member_2', 20)
+
+        data = self.leaderboard.score_and_rank_across(['name', 'other', 
+            'nobody'], 'member_1')
+        self.assertEqual([5, 2, None], [entry['rank'] for entry in data])
+        self.assertEqual([1, 10, None], [entry['score'] for entry in data])
+
+    def test_batch(self):
+        self._rank_members_in_leaderboard(30)
+        other = self._leaderboard('other')
+        other.rank_member('member_1', 10)
+
+        with self.leaderboard.batch() as batch:
+            batch.rank_for_in('name', 'member_30')
+            batch.score_for_in('other', 'member_1')
+            batch.total_members_in('other')
+            batch.leaders_in('name', 2, page_size=10)
+            batch.leaders_in('name', 10)
+            batch.check_member_in('other', 'member_2')
+            batch.total_pages_in('name', 7)
+        rank, score, total, leaders, last_page, checked, pages = \
+            batch.results
+
+        self.assertEqual(1, rank)
+        self.assertEqual(10, score)
+        self.assertEqual(1, total)
+        self.assertEqual(self.leaderboard.leaders(2, page_size=10), leaders)
+        self.assertEqual(self.leaderboard.leaders(2), last_page)
+        self.assertFalse(checked)
+        self.assertEqual(5, pages)
+
+    def test_batch_tied_leaders(self):
+        self.leaderboard.rank_members([('a', 3), ('b', 2), ('c', 2), 
+            ('d', 1)])
+
+        with self.leaderboard.batch() as batch:
+            batch.leaders_in('name', 2, page_size=2, ranking='competition')
+            batch.leaders_in('name', 2, page_size=2, ranking='competition', 
+                with_scores=False)
+        tied, without_scores = batch.results
+        self.assertEqual(self.leaderboard.leaders(2, page_size=2, 
+            ranking='competition'), tied)
+        self.assertEqual([2, 4], [leader['rank'] for leader in tied])
+        self.assertEqual([None, None], 
+            [leader.get('score') for leader in without_scores])
+        self.assertRaises(ValueError, self.leaderboard.batch().leaders_in, 
+            'name', 1, ranking='dense')
+  
     def test_remove_members_in_score_range(self):
         self._rank_members_in_leaderboard()
 
@@ -293,8 +753,8 @@ class TestLeaderboard(unittest.TestCase):
             self.assertTrue(leader['score'] < 100)
   
     def test_merge_leaderboards(self):
-        foo = lb.Leaderboard('foo')    
-        bar = lb.Leaderboard('bar')
+        foo = self._leaderboard('foo')    
+        bar = self._leaderboard('bar')
 
         foo.rank_member('foo_1', 1)
         foo.rank_member('foo_2', 2)
@@ -305,7 +765,7 @@ class TestLeaderboard(unittest.TestCase):
         num_foobar_keys = foo.merge_leaderboards('foobar', ['bar'])
         self.assertEqual(5, num_foobar_keys)
 
-        foobar = lb.Leaderboard('foobar')  
+        foobar = self._leaderboard('foobar')  
         self.assertEqual(5, foobar.total_members())
 
         first_leader_in_foobar = foobar.leaders(1)[0]
@@ -316,8 +776,8 @@ class TestLeaderboard(unittest.TestCase):
         lb.teardown()
   
     def test_intersect_leaderboards(self):
-        foo = lb.Leaderboard('foo')
-        bar = lb.Leaderboard('bar')
+        foo = self._leaderboard('foo')
+        bar = self._leaderboard('bar')
 
         foo.rank_member('foo_1', 1)
         foo.rank_member('foo_2', 2)
@@ -331,7 +791,7 @@ class TestLeaderboard(unittest.TestCase):
             aggregate="max")
         self.assertEqual(2, num_foobar_keys)
 
-        foobar = lb.Leaderboard('foobar')
+        foobar = self._leaderboard('foobar')
         self.assertEqual(2, foobar.total_members())
 
         first_leader_in_foobar = foobar.leaders(1)[0]
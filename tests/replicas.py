@@ -0,0 +1,87 @@
+import unittest
+
+from redis.exceptions import ConnectionError
+
+import leaderboard.port as lb
+from leaderboard.memory import MemoryRedis
+
+class DownReplica(object):
+    def __getattr__(self, attr):
+        def call(*args, **kwargs):
+            raise ConnectionError("replica is down")
+        return call
+
+class TestReplicas(unittest.TestCase):
+    # Replicas here are separate stores that are never synced, so where a 
+    #  read went shows in what it returns.
+    def setUp(self):
+        self.primary = MemoryRedis()
+        self.replicas = [MemoryRedis(), MemoryRedis()]
+        for i, replica in enumerate(self.replicas):
+            lb._zadd(replica, 'name', [('replica_%d' % i, 10)])
+        self.leaderboard = lb.Leaderboard('name', 
+            redis=self.primary, 
+            replicas=self.replicas)
+
+    def test_reads_go_round_robin_over_replicas(self):
+        lb._zadd(self.primary, 'name', [('member_1', 1)])
+        members = [self.leaderboard.leaders(1)[0]['member'] 
+            for i in range(4)]
+        self.assertEqual(members[:2] * 2, members)
+        self.assertEqual(set(['replica_0', 'replica_1']), set(members))
+        self.assertEqual(1, self.leaderboard.total_members())
+        self.assertEqual(None, self.leaderboard.score_for('member_1'))
+
+    def test_writes_go_to_the_primary(self):
+        self.leaderboard.rank_member('member_1', 1)
+        self.assertEqual(1, self.primary.zcard('name'))
+        self.assertEqual([1, 1], 
+            [replica.zcard('name') for replica in self.replicas])
+
+    def test_read_your_writes(self):
+        self.leaderboard.rank_member('member_1', 1)
+        self.assertEqual(1, self.leaderboard.score_for('member_1'))
+        self.assertEqual(None, self.leaderboard.score_for('member_1', 
+            consistency='replica'))
+
+        self.leaderboard.replica_lag = 0
+        self.assertEqual(None, self.leaderboard.score_for('member_1'))
+        self.assertEqual(1, self.leaderboard.score_for('member_1', 
+            consistency='primary'))
+
+    def test_per_call_consistency(self):
+        lb._zadd(self.primary, 'name', [('member_1', 1)])
+        self.assertEqual(['member_1'], [leader['member'] for leader in 
+            self.leaderboard.leaders(1, consistency='primary')])
+        self.assertEqual(1, self.leaderboard.around_me('member_1', 
+            consistency='primary')[0]['rank'])
+        self.assertEqual(1, self.leaderboard.ranked_in_list(['member_1'], 
+            consistency='primary')[0]['rank'])
+        self.assertEqual(1, self.leaderboard.score_and_rank_for('member_1', 
+            consistency='primary')['rank'])
+        self.assertEqual(['member_1'], [member for member, score in 
+            self.leaderboard.iter_all(consistency='primary')])
+        self.assertRaises(ValueError, self.leaderboard.total_members, 
+            consistency='nearest')
+
+    def test_primary_board_consistency(self):
+        lb._zadd(self.primary, 'name', [('member_1', 1)])
+        board = lb.Leaderboard('name', 
+            redis=self.primary, 
+            replicas=self.replicas, 
+            read_consistency='primary')
+        self.assertTrue(board.check_member('member_1'))
+        self.assertRaises(ValueError, lb.Leaderboard, 'name', 
+            redis=self.primary, 
+            read_consistency='nearest')
+
+    def test_falls_back_to_primary(self):
+        lb._zadd(self.primary, 'name', [('member_1', 1)])
+        board = lb.Leaderboard('name', 
+            redis=self.primary, 
+            replicas=[DownReplica()])
+        self.assertEqual(1, board.rank_for('member_1'))
+        self.assertEqual(['member_1'], 
+            [leader['member'] for leader in board.leaders(1)])
+        self.assertEqual(['member_1'], 
+            [member for member, score in board.iter_all()])
@@ -0,0 +1,190 @@
+import io
+import random
+import unittest
+
+import redis
+
+import leaderboard.port as lb
+from leaderboard.memory import MemoryRedis
+from leaderboard.sharded import ShardedLeaderboard
+from tests import backend
+
+SHARDS = 3
+
+class TestShardedLeaderboard(unittest.TestCase):
+    """
+    Checks a board sharded over several connections against the same data 
+      in one plain Leaderboard.  Against redis the shards are dbs 1-3.
+    """
+    def setUp(self):
+        self.conn = backend.connection()
+        if backend.MEMORY:
+            self.shard_conns = [MemoryRedis() for i in range(SHARDS)]
+        else:
+            self.shard_conns = [redis.Redis(db=i) 
+                for i in range(1, SHARDS + 1)]
+        self.sharded = ShardedLeaderboard('name', self.shard_conns)
+        self.reference = lb.Leaderboard('name', redis=self.conn)
+
+    def tearDown(self):
+        for conn in [self.conn] + self.shard_conns:
+            conn.flushdb()
+        if not backend.MEMORY:
+            for conn in [self.conn] + self.shard_conns:
+                conn.connection_pool.disconnect()
+        lb.teardown()
+        self.conn = None
+
+    def _rank_members(self, members_to_add=60, scores=20):
+        members = [("member_%d" % i, random.randint(1, scores)) 
+            for i in range(1, members_to_add + 1)]
+        self.sharded.rank_members(members, chunk_size=7)
+        self.reference.rank_members(members)
+
+    def test_members_are_spread_over_shards(self):
+        self._rank_members()
+
+        self.assertEqual(60, self.sharded.total_members())
+        for shard in self.sharded.shards:
+            self.assertTrue(0 < shard.total_members() < 60)
+
+    def test_non_ascii_members(self):
+        member = u'jos\xe9'
+        self.sharded.rank_member(member, 5)
+
+        self.assertTrue(self.sharded.shard_for(member) is 
+            self.sharded.shard_for(member.encode('utf-8')))
+        self.assertEqual(5, self.sharded.score_for(member))
+        self.assertEqual(1, self.sharded.rank_for(member))
+
+    def test_ranks_match_single_board(self):
+        self._rank_members()
+
+        for i in range(1, 61):
+            member = "member_%d" % i
+            self.assertEqual(self.reference.score_and_rank_for(member), 
+                self.sharded.score_and_rank_for(member))
+        self.assertEqual(None, self.sharded.rank_for('nobody'))
+
+        members = ['member_3', 'nobody', 'member_40']
+        self.assertEqual(self.reference.ranked_in_list(members), 
+            self.sharded.ranked_in_list(members))
+        self.assertEqual(
+            self.reference.ranked_in_list(members, sort_by_rank=True), 
+            self.sharded.ranked_in_list(members, sort_by_rank=True))
+
+    def test_leaders_match_single_board(self):
+        self._rank_members()
+
+        for page in range(0, 5):
+            self.assertEqual(self.reference.leaders(page, page_size=7), 
+                self.sharded.leaders(page, page_size=7))
+        self.assertEqual(self.reference.leaders(1, with_scores=False), 
+            self.sharded.leaders(1, with_scores=False))
+
+    def test_deep_pages_through_big_tie_groups(self):
+        self._rank_members(200, scores=4)
+
+        for page in range(1, 31, 3):
+            self.assertEqual(self.reference.leaders(page, page_size=7), 
+                self.sharded.leaders(page, page_size=7))
+        self.assertEqual(
+            self.reference.leaders(13, page_size=11, ranking='competition'), 
+            self.sharded.leaders(13, page_size=11, ranking='competition'))
+
+    def test_around_me_matches_single_board(self):
+        self._rank_members()
+
+        for member in ['member_1', 'member_30', 'member_60']:
+            self.assertEqual(self.reference.around_me(member, page_size=9), 
+                self.sharded.around_me(member, page_size=9))
+        self.assertEqual([], self.sharded.around_me('nobody'))
+
+    def test_competition_ranks_match_single_board(self):
+        self._rank_members(scores=8)
+
+        for page in (1, 2, 3):
+            self.assertEqual(
+                self.reference.leaders(page, ranking='competition'), 
+                self.sharded.leaders(page, ranking='competition'))
+        self.assertEqual(
+            self.reference.around_me('member_30', ranking='competition'), 
+            self.sharded.around_me('member_30', ranking='competition'))
+        members = ['member_%d' % i for i in range(1, 61, 7)] + ['nobody']
+        self.assertEqual(
+            self.reference.ranked_in_list(members, ranking='competition'), 
+            self.sharded.ranked_in_list(members, ranking='competition'))
+        self.assertEqual(
+            self.reference.rank_for('member_5', ranking='competition'), 
+            self.sharded.rank_for('member_5', ranking='competition'))
+        self.assertRaises(ValueError, self.sharded.leaders, 1, 
+            ranking='dense')
+
+    def test_percentiles_match_single_board(self):
+        self._rank_members(scores=8)
+
+        for member in ['member_1', 'member_30', 'nobody']:
+            self.assertEqual(self.reference.percentile_for(member), 
+                self.sharded.percentile_for(member))
+        self.assertEqual(self.reference.histogram(3), 
+            self.sharded.histogram(3))
+        self.assertEqual(self.reference.histogram([0, 2, 8]), 
+            self.sharded.histogram([0, 2, 8]))
+        for percentile in (0, 1, 33.3, 50, 99, 100):
+            self.assertEqual(self.reference.score_at_percentile(percentile), 
+                self.sharded.score_at_percentile(percentile))
+        self.assertEqual(None, ShardedLeaderboard('nobody', 
+            self.shard_conns).score_at_percentile(50))
+
+    def test_change_scores_and_remove(self):
+        self._rank_members()
+
+        deltas = [('member_1', 100), ('member_2', -100), ('member_1', 1)]
+        self.assertEqual(self.reference.change_scores_for(deltas), 
+            self.sharded.change_scores_for(deltas))
+        self.assertEqual('member_1', self.sharded.leaders(1)[0]['member'])
+
+        self.sharded.remove_member('member_1')
+        self.assertEqual(59, self.sharded.total_members())
+        self.assertEqual(
+            self.reference.total_members_in_score_range(1, 10), 
+            self.sharded.total_members_in_score_range(1, 10))
+
+    def test_merge_leaderboards(self):
+        self._rank_members(10)
+        other = ShardedLeaderboard('other', self.shard_conns)
+        other.rank_member('member_1', 1000)
+        other.rank_member('someone', 1)
+
+        self.assertEqual(11, self.sharded.merge_leaderboards('merged', 
+            ['other']))
+        merged = ShardedLeaderboard('merged', self.shard_conns)
+        self.assertEqual('member_1', merged.leaders(1)[0]['member'])
+
+    def test_walks_dumps_and_batches(self):
+        self._rank_members(scores=8)
+
+        self.assertEqual(list(self.reference.iter_all(batch_size=4)), 
+            [(lb._native(member), score) 
+                for member, score in self.sharded.iter_all(batch_size=4)])
+        out = io.BytesIO()
+        self.assertEqual(60, self.sharded.dump(out, batch_size=4))
+        out.seek(0)
+        loaded = ShardedLeaderboard('loaded', self.shard_conns)
+        loaded.rank_member('stale', 100)
+        self.assertEqual(60, loaded.load(out, chunk_size=4))
+        self.assertEqual(self.sharded.leaders(2), loaded.leaders(2))
+        for shard in loaded.shards:
+            self.assertFalse(shard.redis.exists('loaded:load'))
+
+        with self.sharded.batch() as batch:
+            batch.rank_for_in('name', 'member_7')
+            batch.leaders_in('loaded', 3, page_size=5)
+        self.assertEqual([self.reference.rank_for('member_7'), 
+            self.reference.leaders(3, page_size=5)], batch.results)
+
+        self.assertRaises(ValueError, self.sharded.rank_changes)
+        self.assertRaises(ValueError, self.sharded.rebuild_indexes)
+
+if __name__ == '__main__':
+    unittest.main()
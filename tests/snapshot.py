@@ -0,0 +1,174 @@
+import threading
+import time
+import unittest
+
+import leaderboard.port as lb
+from leaderboard.snapshot import TopSnapshot
+from tests import backend
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+class TestTopSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.conn = backend.connection()
+        self.clock = FakeClock()
+        self.snapshot = TopSnapshot(size=10, max_age=5, clock=self.clock)
+        self.leaderboard = self._leaderboard(self.snapshot)
+        self.reference = self._leaderboard(None)
+        for i in range(1, 31):
+            self.reference.rank_member('member_%d' % i, i)
+
+    def tearDown(self):
+        self.snapshot.stop()
+        self.conn.flushdb()
+        lb.teardown()
+        self.conn = None
+
+    def _leaderboard(self, snapshot, page_size=5):
+        return lb.Leaderboard('name', 
+            page_size=page_size, 
+            snapshot=snapshot, 
+            **backend.leaderboard_kwargs(self.conn))
+
+    def test_head_pages_match_live_reads(self):
+        for page in (1, 2, 3, 7):
+            self.assertEqual(self.reference.leaders(page), 
+                self.leaderboard.leaders(page))
+        self.assertEqual(self.reference.leaders(2, with_scores=False), 
+            self.leaderboard.leaders(2, with_scores=False))
+        self.assertEqual(list(self.reference.leaders(1, columnar=True)), 
+            list(self.leaderboard.leaders(1, columnar=True)))
+
+    def test_serves_from_snapshot_until_max_age(self):
+        self.leaderboard.leaders(1)
+        self.reference.rank_member('member_99', 99)
+        self.assertEqual('member_30', self.leaderboard.leaders(1)[0]['member'])
+        self.assertEqual('member_99', 
+            self.leaderboard.leaders(1, consistency='primary')[0]['member'])
+
+        self.clock.now += 6
+        self.assertEqual('member_99', self.leaderboard.leaders(1)[0]['member'])
+
+    def test_refresh_on_write(self):
+        snapshot = TopSnapshot(size=10, refresh_on_write=True, 
+            clock=self.clock)
+        board = self._leaderboard(snapshot)
+        board.leaders(1)
+        board.rank_member('member_99', 99)
+        self.assertEqual('member_99', board.leaders(1)[0]['member'])
+
+    def test_shared_snapshot(self):
+        snapshot = TopSnapshot(size=10, shared=True, clock=self.clock)
+        board = self._leaderboard(snapshot)
+        self.assertEqual(self.reference.leaders(2), board.leaders(2))
+        self.assertTrue(self.conn.get('name:top') is not None)
+
+        # Another process' board reads the same key.
+        self.reference.rank_member('member_99', 99)
+        other = self._leaderboard(TopSnapshot(size=10, shared=True, 
+            clock=self.clock))
+        self.assertEqual('member_30', other.leaders(1)[0]['member'])
+
+    def test_one_reader_refreshes_at_a_time(self):
+        self.leaderboard.leaders(1)
+        self.clock.now += 6
+        refreshes = []
+        refresh = self.snapshot.refresh
+        def slow_refresh(board, name=None):
+            refreshes.append(name)
+            time.sleep(0.05)
+            return refresh(board, name)
+        self.snapshot.refresh = slow_refresh
+
+        readers = [threading.Thread(target=self.leaderboard.leaders, 
+            args=(1,)) for i in range(5)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(['name'], refreshes)
+
+    def test_shared_refresh_lease(self):
+        snapshot = TopSnapshot(size=10, shared=True, clock=self.clock)
+        board = self._leaderboard(snapshot)
+        board.leaders(1)
+        self.reference.rank_member('member_99', 99)
+        self.clock.now += 6
+
+        # Another process is rebuilding: serve the stale snapshot meanwhile,
+        #  or read live when there's none.
+        self.conn.set('name:top:refresh', '1')
+        self.assertEqual('member_30', board.leaders(1)[0]['member'])
+        self.conn.delete('name:top')
+        self.assertEqual('member_99', board.leaders(1)[0]['member'])
+        self.assertEqual(None, self.conn.get('name:top'))
+
+        self.conn.delete('name:top:refresh')
+        self.assertEqual('member_99', board.leaders(1)[0]['member'])
+        self.assertTrue(self.conn.get('name:top') is not None)
+        self.assertEqual(None, self.conn.get('name:top:refresh'))
+
+    def test_lease_is_released_by_its_holder_only(self):
+        snapshot = TopSnapshot(size=10, shared=True, clock=self.clock)
+        board = self._leaderboard(snapshot)
+        refresh = snapshot.refresh
+        def slow_refresh(board, name=None):
+            # The lease ran out mid-rebuild and another reader took it.
+            self.conn.set('name:top:refresh', 'other')
+            return refresh(board, name)
+        snapshot.refresh = slow_refresh
+
+        board.leaders(1)
+        self.assertEqual('other', self.conn.get('name:top:refresh'))
+
+    def test_delete_drops_the_snapshot(self):
+        snapshot = TopSnapshot(size=10, shared=True, clock=self.clock)
+        board = self._leaderboard(snapshot)
+        board.leaders(1)
+        board.delete_leaderboard()
+        self.assertEqual(None, self.conn.get('name:top'))
+        self.assertEqual([], board.leaders(1))
+
+    def test_small_boards_fit_whole(self):
+        board = lb.Leaderboard('small', 
+            page_size=5, 
+            snapshot=self.snapshot, 
+            **backend.leaderboard_kwargs(self.conn))
+        board.rank_member('member_1', 1)
+        board.rank_member('member_2', 2)
+        self.assertEqual(['member_2', 'member_1'], 
+            [leader['member'] for leader in board.leaders(4)])
+
+    def test_start_refreshes_in_background(self):
+        self.snapshot.max_age = 60
+        self.leaderboard.leaders(1)
+        self.snapshot.start(self.leaderboard, 0.01)
+        self.reference.rank_member('member_99', 99)
+        for i in range(100):
+            if self.leaderboard.leaders(1)[0]['member'] == 'member_99':
+                break
+            time.sleep(0.01)
+        self.assertEqual('member_99', self.leaderboard.leaders(1)[0]['member'])
+
+    def test_background_refresh_outlives_errors(self):
+        refresh = self.snapshot.refresh
+        failures = []
+        def flaky_refresh(board, name=None):
+            if not failures:
+                failures.append(name)
+                raise IOError("connection lost")
+            return refresh(board, name)
+        self.snapshot.refresh = flaky_refresh
+        self.snapshot.max_age = 60
+        self.snapshot.start(self.leaderboard, 0.01)
+        for i in range(100):
+            if self.snapshot._local.get('name'):
+                break
+            time.sleep(0.01)
+        self.assertEqual(['name'], failures)
+        self.assertEqual('member_30', 
+            self.snapshot._local['name'][2][0][0])
@@ -0,0 +1,163 @@
+import time
+import unittest
+
+import leaderboard.port as lb
+from leaderboard.windowed import TimeWindowedLeaderboard, DAY
+from tests import backend
+
+class FakeClock(object):
+    def __init__(self, now):
+        self.now = now
+    def __call__(self):
+        return self.now
+
+class TestTimeWindowedLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.conn = backend.connection()
+        # Noon UTC on this week's Monday (the epoch was a Thursday); close
+        #  to real time so bucket expiry doesn't kick in.
+        now = time.time()
+        self.clock = FakeClock(now - (now + 3*DAY) % (7*DAY) + DAY / 2)
+        self.leaderboard = TimeWindowedLeaderboard('name', 
+            clock=self.clock, 
+            **backend.leaderboard_kwargs(self.conn))
+
+    def tearDown(self):
+        self.conn.flushdb()
+        lb.teardown()
+        self.conn = None
+
+    def test_one_write_updates_every_window(self):
+        self.leaderboard.change_score_for('member_1', 5)
+        self.clock.now += DAY
+        self.assertEqual(8, self.leaderboard.change_score_for('member_1', 3))
+
+        self.assertEqual(8, self.leaderboard.score_for('member_1'))
+        self.assertEqual(8, self.leaderboard.score_for_in(
+            self.leaderboard.key_for('weekly'), 'member_1'))
+        self.assertEqual(3, self.leaderboard.score_for_in(
+            self.leaderboard.key_for('daily'), 'member_1'))
+        self.assertEqual(5, self.leaderboard.score_for_in(
+            self.leaderboard.key_for('daily', when=self.clock.now - DAY), 
+            'member_1'))
+
+    def test_bulk_writes_update_every_window(self):
+        self.assertEqual([2, 1], self.leaderboard.rank_members(
+            [('member_1', 5), ('member_2', 4), ('member_3', 3)], 
+            chunk_size=2))
+        self.assertEqual([7.0, 2.0], self.leaderboard.change_scores_for(
+            [('member_1', 2), ('member_4', 2)]))
+
+        for window in ('daily', 'weekly'):
+            key = self.leaderboard.key_for(window)
+            self.assertEqual(4, self.leaderboard.total_members_in(key))
+            self.assertEqual(7, self.leaderboard.score_for_in(key, 
+                'member_1'))
+
+    def test_remove_member_from_every_bucket(self):
+        self.leaderboard.rank_member('member_1', 5)
+        self.clock.now += DAY
+        self.leaderboard.rank_member('member_1', 5)
+        yesterday = self.leaderboard.key_for('daily', 
+            when=self.clock.now - DAY)
+
+        self.leaderboard.remove_member('member_1')
+
+        self.assertEqual(None, self.leaderboard.score_for('member_1'))
+        for key in (yesterday, self.leaderboard.key_for('daily'), 
+            self.leaderboard.key_for('weekly')):
+            self.assertEqual(None, self.leaderboard.score_for_in(key, 
+                'member_1'))
+
+    def test_single_key_writes_are_refused(self):
+        self.assertRaises(NotImplementedError, 
+            self.leaderboard.rank_member_in, 'name', 'member_1', 5)
+        self.assertRaises(NotImplementedError, 
+            self.leaderboard.rank_member_if_higher, 'member_1', 5)
+        self.assertRaises(NotImplementedError, 
+            self.leaderboard.change_scores_for_members_in, 'name', 
+            [('member_1', 5)])
+        self.assertRaises(NotImplementedError, 
+            self.leaderboard.remove_members_in_score_range, 0, 10)
+        self.assertEqual(0, self.leaderboard.total_members())
+
+    def test_weeks_start_on_monday(self):
+        monday = self.leaderboard.key_for('weekly')
+        self.assertEqual(monday, self.leaderboard.key_for('weekly', 
+            when=self.clock.now + 6*DAY))
+        self.assertNotEqual(monday, self.leaderboard.key_for('weekly', 
+            when=self.clock.now - DAY))
+
+    def test_bucket_expiry_follows_period_end(self):
+        daily = self.leaderboard.windows['daily']
+        bucket = daily.bucket(self.clock.now)
+
+        self.assertEqual(self.clock.now + DAY / 2 + daily.retention, 
+            daily.expires_at(bucket))
+
+    def test_closed_buckets_are_forgotten(self):
+        self.leaderboard.rank_member('member_1', 5)
+        keys = set(self.leaderboard._expiring)
+        self.assertEqual(2, len(keys))
+
+        for day in range(1, 15):
+            self.clock.now += DAY
+            self.leaderboard.rank_member('member_1', 5)
+        self.assertEqual(set([self.leaderboard.key_for('daily'), 
+            self.leaderboard.key_for('weekly')]), 
+            set(self.leaderboard._expiring))
+
+    def test_failed_write_sets_expiry_again(self):
+        def fail():
+            raise IOError("connection lost")
+        pipeline = self.conn.pipeline
+        def failing_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            pipe.execute = fail
+            return pipe
+        self.leaderboard.redis.pipeline = failing_pipeline
+        try:
+            self.assertRaises(IOError, self.leaderboard.rank_member, 
+                'member_1', 5)
+        finally:
+            del self.leaderboard.redis.pipeline
+        self.assertEqual({}, self.leaderboard._expiring)
+
+    @unittest.skipIf(backend.MEMORY, "memory backend has no TTL command")
+    def test_bucket_ttls(self):
+        self.leaderboard.rank_member('member_1', 5)
+
+        self.assertTrue(self.conn.ttl('name') in (None, -1))
+        # TTL counts from the real clock; check the EXPIREAT it implies.
+        daily = self.leaderboard.windows['daily']
+        ttl = self.conn.ttl(self.leaderboard.key_for('daily'))
+        self.assertTrue(abs(time.time() + ttl - 
+            daily.expires_at(daily.bucket(self.clock.now))) <= 2)
+
+    def test_scripted_write_options_are_refused(self):
+        for option in ({'dense_index': True}, {'max_members': 10}, 
+            {'feed_length': 10}):
+            option.update(backend.leaderboard_kwargs(self.conn))
+            self.assertRaises(ValueError, TimeWindowedLeaderboard, 'other', 
+                **option)
+
+    def test_rolling_window(self):
+        for day in range(10):
+            self.leaderboard.change_score_for('member_1', 1)
+            self.leaderboard.change_score_for('member_%d' % (day + 2), 1)
+            self.clock.now += DAY
+        self.clock.now -= DAY
+
+        key = self.leaderboard.rolling_key('daily', 7)
+        self.assertEqual(7, self.leaderboard.score_for_in(key, 'member_1'))
+        self.assertEqual(8, self.leaderboard.total_members_in(key))
+        self.assertEqual('member_1', 
+            self.leaderboard.leaders_in(key, 1)[0]['member'])
+
+        # Cached until it expires, even if the buckets change.
+        self.leaderboard.change_score_for('member_1', 1)
+        self.assertEqual(key, self.leaderboard.rolling_key('daily', 7))
+        self.assertEqual(7, self.leaderboard.score_for_in(key, 'member_1'))
+
+if __name__ == '__main__':
+    unittest.main()